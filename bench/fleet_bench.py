@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark ponta a ponta dos coletores contra uma frota simulada
+
+Sobe o simulador SSH (vrp_ssh_sim.py) com N equipamentos e o trapper emulado
+(trapper_sim.py), executa os coletores de scripts/ como o poller do Zabbix faria
+(um processo por item, com concorrencia limitada) e gera um relatorio JSON com:
+  - equipamentos/minuto, latencia por equipamento (p50/p95/p99)
+  - segundos de CPU (coletores + zabbix_sender), pico de RSS e de processos
+  - valores/segundo recebidos pelo trapper (processed/failed)
+
+Uso:
+  fleet_bench.py [--devices 100] [--collectors huawei_sfp,huawei_sw_sfp,huawei_bgp,huawei_health,datacom_sfp]
+                 [--mode collect|launch_discovery] [--concurrency 50] [--rounds 1]
+                 [--ports 24] [--peers 8] [--latency 0.05] [--jitter 0.05]
+                 [--base-port 21000] [--trapper-port 10152] [--timeout 120]
+                 [--output bench_result.json] [--label release-x]
+
+Comparacao entre versoes: rodar com os mesmos parametros em cada versao e comparar
+os JSON (campos "overall" e "collectors").
+"""
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCH_DIR), "scripts")
+
+# Modelo de equipamento simulado atendido por cada coletor
+COLLECTOR_MODELS = {
+    "huawei_sfp": ("ne",),
+    "huawei_health": ("ne",),
+    "huawei_bgp": ("ne", "s"),
+    "huawei_sw_sfp": ("s",),
+    "datacom_sfp": ("dmos",),
+}
+
+CONFIG = {
+    "devices": 100,
+    "collectors": ",".join(COLLECTOR_MODELS),
+    "mode": "collect",
+    "concurrency": 50,
+    "rounds": 1,
+    "ports": 24,
+    "peers": 8,
+    "latency": 0.05,
+    "jitter": 0.05,
+    "base_port": 21000,
+    "trapper_port": 10152,
+    "timeout": 120,
+    "output": "bench_result.json",
+    "label": "",
+}
+
+
+def parse_args(argv):
+    types = {k: type(v) for k, v in CONFIG.items()}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        name = arg[2:].replace("-", "_") if arg.startswith("--") else None
+        if name not in CONFIG or i + 1 >= len(argv):
+            print(f"ERRO: Argumento invalido: {arg}", file=sys.stderr)
+            sys.exit(1)
+        CONFIG[name] = types[name](argv[i + 1])
+        i += 2
+    unknown = [c for c in CONFIG["collectors"].split(",") if c not in COLLECTOR_MODELS]
+    if unknown:
+        print(f"ERRO: Coletor desconhecido: {','.join(unknown)}", file=sys.stderr)
+        sys.exit(1)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = (len(values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+# ---------------------------------------------------------------------------
+# Processos auxiliares (simulador e trapper)
+# ---------------------------------------------------------------------------
+
+def start_helper(args, ready_text, timeout=60):
+    """Inicia um processo auxiliar e aguarda a linha de pronto"""
+    proc = subprocess.Popen([sys.executable, *args], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        line = proc.stdout.readline()
+        if not line:
+            break
+        if ready_text in line:
+            threading.Thread(target=proc.stdout.read, daemon=True).start()
+            return proc
+    proc.kill()
+    raise RuntimeError(f"processo auxiliar nao iniciou: {' '.join(args)}")
+
+
+def stop_helper(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+# ---------------------------------------------------------------------------
+# Amostragem de processos (pico de processos e RSS da arvore do benchmark)
+# ---------------------------------------------------------------------------
+
+class TreeSampler(threading.Thread):
+    """Amostra /proc para medir pico de processos e RSS dos descendentes"""
+
+    def __init__(self, exclude, interval=0.2):
+        super().__init__(daemon=True)
+        self.exclude = set(exclude)
+        self.interval = interval
+        self.peak_processes = 0
+        self.peak_rss_kb = 0
+        self.stop_event = threading.Event()
+
+    def _snapshot(self):
+        parents = {}
+        rss = {}
+        page_kb = os.sysconf("SC_PAGE_SIZE") // 1024
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                parents[int(entry)] = int(fields[1])
+                rss[int(entry)] = int(fields[21]) * page_kb
+            except (OSError, IndexError, ValueError):
+                continue
+        root = os.getpid()
+        descendants = set()
+        changed = True
+        while changed:
+            changed = False
+            for pid, ppid in parents.items():
+                if pid not in descendants and pid not in self.exclude and (ppid == root or ppid in descendants):
+                    descendants.add(pid)
+                    changed = True
+        return len(descendants), sum(rss.get(pid, 0) for pid in descendants)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            count, total_rss = self._snapshot()
+            self.peak_processes = max(self.peak_processes, count)
+            self.peak_rss_kb = max(self.peak_rss_kb, total_rss)
+            self.stop_event.wait(self.interval)
+
+
+# ---------------------------------------------------------------------------
+# Execucao dos coletores
+# ---------------------------------------------------------------------------
+
+def run_collector(collector, device, env):
+    """Executa um coletor contra um equipamento e retorna o resultado medido"""
+    args = [sys.executable, os.path.join(SCRIPTS_DIR, f"{collector}.py"), CONFIG["mode"],
+            device["ip"], str(device["port"]), device["user"], device["password"], device["name"]]
+    started = time.monotonic()
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+    timer = threading.Timer(CONFIG["timeout"], proc.kill)
+    timer.start()
+    output = proc.stdout.read().decode("utf-8", "ignore")
+    _, status, usage = os.wait4(proc.pid, 0)
+    timer.cancel()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.monotonic() - started
+    if "SUCESSO" in output and "ERRO" not in output:
+        result = "success"
+    elif "PARCIAL" in output:
+        result = "partial"
+    else:
+        result = "error"
+    return {
+        "collector": collector,
+        "device": device["name"],
+        "seconds": elapsed,
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "max_rss_kb": usage.ru_maxrss,
+        "exit_code": proc.returncode,
+        "result": result,
+        "output_tail": output.strip().splitlines()[-1:] if result == "error" else [],
+    }
+
+
+def summarize(results, wall):
+    latencies = [r["seconds"] for r in results]
+    devices = len({r["device"] for r in results})
+    return {
+        "runs": len(results),
+        "devices": devices,
+        "success": sum(1 for r in results if r["result"] == "success"),
+        "partial": sum(1 for r in results if r["result"] == "partial"),
+        "error": sum(1 for r in results if r["result"] == "error"),
+        "devices_per_minute": round(len(results) / wall * 60, 2) if wall > 0 else 0.0,
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+        "latency_p99": round(percentile(latencies, 99), 3),
+        "latency_max": round(max(latencies, default=0.0), 3),
+        "cpu_seconds": round(sum(r["cpu_seconds"] for r in results), 3),
+        "max_rss_kb": max((r["max_rss_kb"] for r in results), default=0),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "-C", BENCH_DIR, "describe", "--always", "--dirty"],
+                              capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main():
+    parse_args(sys.argv[1:])
+    collectors = CONFIG["collectors"].split(",")
+    models = sorted({m for c in collectors for m in COLLECTOR_MODELS[c]})
+    inventory_path = f"/tmp/fleet_bench_inventory_{os.getpid()}.json"
+    report_path = f"/tmp/fleet_bench_trapper_{os.getpid()}.json"
+
+    try:
+        subprocess.run(["zabbix_sender", "-V"], capture_output=True)
+    except FileNotFoundError:
+        print("AVISO: zabbix_sender nao encontrado no PATH - os envios dos coletores falharao", file=sys.stderr)
+
+    resource.setrlimit(resource.RLIMIT_NOFILE, (resource.getrlimit(resource.RLIMIT_NOFILE)[1],) * 2)
+    sim = start_helper([os.path.join(BENCH_DIR, "vrp_ssh_sim.py"),
+                        "--devices", str(CONFIG["devices"]), "--models", ",".join(models),
+                        "--ports", str(CONFIG["ports"]), "--peers", str(CONFIG["peers"]),
+                        "--latency", str(CONFIG["latency"]), "--jitter", str(CONFIG["jitter"]),
+                        "--base-port", str(CONFIG["base_port"]), "--inventory", inventory_path], "SUCESSO")
+    trapper = start_helper([os.path.join(BENCH_DIR, "trapper_sim.py"),
+                            "--port", str(CONFIG["trapper_port"]), "--report", report_path,
+                            "--report-interval", "0"], "SUCESSO")
+    with open(inventory_path) as f:
+        inventory = json.load(f)
+
+    env = dict(os.environ, ZBX_SENDER_SERVER="127.0.0.1", ZBX_SENDER_PORT=str(CONFIG["trapper_port"]))
+    jobs = [(c, d) for _ in range(CONFIG["rounds"]) for c in collectors for d in inventory
+            if d["model"] in COLLECTOR_MODELS[c]]
+    print(f"Executando {len(jobs)} coletas ({','.join(collectors)}, modo {CONFIG['mode']}) "
+          f"contra {len(inventory)} equipamentos, concorrencia {CONFIG['concurrency']}...", flush=True)
+
+    sampler = TreeSampler(exclude=(sim.pid, trapper.pid))
+    usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.monotonic()
+    sampler.start()
+    with ThreadPoolExecutor(max_workers=CONFIG["concurrency"]) as pool:
+        results = list(pool.map(lambda job: run_collector(job[0], job[1], env), jobs))
+    wall = time.monotonic() - started
+    sampler.stop_event.set()
+    sampler.join()
+    usage_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    stop_helper(trapper)
+    stop_helper(sim)
+    with open(report_path) as f:
+        trapper_report = json.load(f)
+    for path in (inventory_path, report_path):
+        os.remove(path)
+
+    overall = summarize(results, wall)
+    overall.update({
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds_total": round((usage_after.ru_utime - usage_before.ru_utime)
+                                   + (usage_after.ru_stime - usage_before.ru_stime), 3),
+        "peak_processes": sampler.peak_processes,
+        "peak_tree_rss_kb": sampler.peak_rss_kb,
+        "values": trapper_report["values"],
+        "values_processed": trapper_report["processed"],
+        "values_failed": trapper_report["failed"],
+        "values_per_second": round(trapper_report["values"] / wall, 2) if wall > 0 else 0.0,
+        "sender_connections": trapper_report["connections"],
+        "batch_histogram": trapper_report["batch_histogram"],
+    })
+    output = {
+        "meta": {
+            "label": CONFIG["label"],
+            "revision": git_revision(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "params": {k: v for k, v in CONFIG.items() if k != "output"},
+        },
+        "overall": overall,
+        "collectors": {c: summarize([r for r in results if r["collector"] == c], wall) for c in collectors},
+        "errors": [r for r in results if r["result"] == "error"][:20],
+    }
+    with open(CONFIG["output"], "w") as f:
+        json.dump(output, f, indent=1)
+
+    print(f"Equipamentos/minuto: {overall['devices_per_minute']}  "
+          f"p50/p95/p99: {overall['latency_p50']}/{overall['latency_p95']}/{overall['latency_p99']}s")
+    print(f"CPU: {overall['cpu_seconds_total']}s  pico processos: {overall['peak_processes']}  "
+          f"pico RSS: {overall['peak_tree_rss_kb']} KB  valores/s: {overall['values_per_second']}")
+    print(f"SUCESSO: Relatorio gravado em {CONFIG['output']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
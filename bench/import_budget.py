@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Verificacao do custo de importacao (cold start) dos coletores via -X importtime
+
+Para cada script importa o modulo em um interpretador novo (melhor de N execucoes),
+soma o tempo cumulativo reportado pelo -X importtime e falha (codigo 1) quando:
+  - o tempo passa do orcamento do script (BUDGETS, em ms; --scale ajusta para
+    maquinas mais lentas), ou
+  - algum modulo pesado (paramiko, cryptography, ...) e carregado ja na importacao.
+
+Uso:
+  import_budget.py [--runs 5] [--scale 1.0] [--top 8] [script ...]
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+
+# Orcamento de importacao por script (ms, medido com interpretador e cache .pyc quentes)
+BUDGETS = {
+    "huawei_sfp": 60,
+    "huawei_sw_sfp": 60,
+    "huawei_bgp": 60,
+    "huawei_health": 80,
+    "datacom_sfp": 60,
+    "huawei_poll": 120,
+    "collector_client": 25,
+}
+
+# Modulos que so devem ser importados quando a coleta realmente abre SSH
+FORBIDDEN = ("paramiko", "cryptography", "nacl", "bcrypt", "cProfile", "pstats")
+
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(script):
+    """Retorna (total_us, [(cumulativo_us, modulo)], modulos) da importacao do script"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {script}"],
+        cwd=SCRIPTS_DIR, capture_output=True, text=True, timeout=60,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "falha")
+    total = 0
+    entries = []
+    modules = set()
+    for line in result.stderr.splitlines():
+        m = LINE_RE.match(line)
+        if not m:
+            continue
+        cumulative = int(m.group(2))
+        name = m.group(4)
+        modules.add(name)
+        entries.append((cumulative, name))
+        if name == script:
+            total = cumulative
+    entries.sort(reverse=True)
+    return total, entries, modules
+
+
+def main():
+    runs = 5
+    scale = 1.0
+    top = 8
+    scripts = []
+    argv = sys.argv[1:]
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--runs" and i + 1 < len(argv):
+            runs = int(argv[i + 1])
+            i += 2
+        elif argv[i] == "--scale" and i + 1 < len(argv):
+            scale = float(argv[i + 1])
+            i += 2
+        elif argv[i] == "--top" and i + 1 < len(argv):
+            top = int(argv[i + 1])
+            i += 2
+        else:
+            scripts.append(argv[i][:-3] if argv[i].endswith(".py") else argv[i])
+            i += 1
+    scripts = scripts or list(BUDGETS)
+
+    failures = 0
+    for script in scripts:
+        budget = BUDGETS.get(script, 60) * scale
+        try:
+            samples = [measure(script) for _ in range(max(1, runs))]
+        except Exception as e:
+            print(f"ERRO: {script} - {str(e)}")
+            failures += 1
+            continue
+        total, entries, modules = min(samples, key=lambda s: s[0])
+        ms = total / 1000.0
+        heavy = sorted(m for m in modules if m.split(".")[0] in FORBIDDEN)
+        if heavy:
+            print(f"ERRO: {script} importa modulos pesados na carga: {', '.join(heavy[:5])}")
+            failures += 1
+        elif ms > budget:
+            print(f"ERRO: {script} {ms:.1f} ms > orcamento {budget:.0f} ms")
+            failures += 1
+        else:
+            print(f"SUCESSO: {script} {ms:.1f} ms (orcamento {budget:.0f} ms)")
+        if heavy or ms > budget:
+            for cumulative, name in entries[1:top + 1]:
+                print(f"    {cumulative / 1000.0:8.1f} ms  {name}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
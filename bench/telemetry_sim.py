@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Publicador local de telemetria Huawei (gRPC dial-out) para testar o huawei_telemetry.py
+
+Faz o papel dos equipamentos: a cada --interval segundos cada equipamento publica
+um sensor de optica e um de BGP (conteudo JSON, envelope Telemetry em protobuf)
+no servico huawei_dialout.gRPCDataservice/dataPublish. Portas, lanes, peers e
+descricoes sao os mesmos do vrp_ssh_sim.py (mesmo --seed), entao os valores caem
+nas keys ja descobertas pelos coletores SSH do simulador.
+
+Layouts do conteudo (--layout):
+  data_str   JSON em Telemetry.data_str (padrao)
+  rows       JSON em cada TelemetryRowGPB.content
+  data_json  Telemetry inteira em JSON no serviceArgs.data_json
+
+--direct entrega as mensagens ao receptor no mesmo processo (sem grpcio), mede o
+tempo de decodificacao e envia um lote pelo zabbix_sender configurado.
+
+Uso:
+  telemetry_sim.py [--target 127.0.0.1:57400] [--devices 1] [--models ne,s] [--ports 24]
+                   [--peers 8] [--interval 10] [--count 0] [--layout data_str]
+                   [--seed 1] [--direct 0]
+
+Exemplo (receptor e publicador locais, hosts SIM-NE-00000 etc.):
+  python3 scripts/huawei_telemetry.py --addr 127.0.0.1 --port 57400
+  python3 bench/telemetry_sim.py --devices 3 --interval 10
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import vrp_ssh_sim  # noqa: E402
+
+CONFIG = {
+    "target": "127.0.0.1:57400",
+    "devices": 1,
+    "models": ["ne", "s"],
+    "ports": 24,
+    "peers": 8,
+    "interval": 10.0,
+    "count": 0,
+    "layout": "data_str",
+    "seed": 1,
+    "direct": 0,
+}
+
+OPTICAL_PATH = "huawei-devm:devm/ports/port/optical-module"
+BGP_PATH = "huawei-bgp:bgp/base-process/peers/peer"
+ENCODING_JSON = 1
+
+
+# --- protobuf (formato de fio) ------------------------------------------------
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def pb_int(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+def pb_bytes(number, value):
+    if isinstance(value, str):
+        value = value.encode()
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def telemetry(device, path, content, collection_id):
+    """Mensagem serviceArgs com a Telemetry do sensor no layout configurado"""
+    now_ms = int(time.time() * 1000)
+    document = json.dumps(content, separators=(",", ":"))
+    if CONFIG["layout"] == "data_json":
+        envelope = {"node_id_str": device.name, "subscription_id_str": "zabbix", "sensor_path": path,
+                    "collection_id": collection_id, "msg_timestamp": now_ms, "encoding": ENCODING_JSON,
+                    "data_str": document}
+        return pb_int(1, collection_id) + pb_bytes(4, json.dumps(envelope))
+    msg = (pb_bytes(1, device.name) + pb_bytes(2, "zabbix") + pb_bytes(3, path)
+           + pb_int(4, collection_id) + pb_int(5, now_ms) + pb_int(6, now_ms) + pb_int(11, ENCODING_JSON))
+    if CONFIG["layout"] == "rows":
+        row = pb_int(1, now_ms) + pb_bytes(11, document)
+        msg += pb_bytes(7, pb_bytes(1, row))
+    else:
+        msg += pb_bytes(14, document)
+    return pb_int(1, collection_id) + pb_bytes(2, msg)
+
+
+def optical_content(device):
+    ports = []
+    for interface in device.interfaces:
+        if not interface["up"]:
+            continue
+        module = {
+            "temperature": f"{device.noise(interface['temp'], 0.5):.0f}",
+            "voltage": f"{device.noise(interface['volt'], 0.01):.2f}",
+        }
+        if interface["lanes"] > 1:
+            module["lanes"] = {"lane": [{
+                "lane-id": lane + 1,
+                "rx-power": f"{device.noise(interface['rx'][lane], 0.3):.2f}",
+                "tx-power": f"{device.noise(interface['tx'][lane], 0.1):.2f}",
+                "bias-current": f"{device.noise(interface['bias'][lane], 0.5):.2f}",
+            } for lane in range(interface["lanes"])]}
+        else:
+            module.update({
+                "rx-power": f"{device.noise(interface['rx'][0], 0.3):.2f}",
+                "tx-power": f"{device.noise(interface['tx'][0], 0.1):.2f}",
+                "bias-current": f"{device.noise(interface['bias'][0], 0.5):.2f}",
+            })
+        ports.append({"name": interface["name"], "optical-module": module})
+    return {"devm": {"ports": {"port": ports}}}
+
+
+def bgp_content(device):
+    now = time.time()
+    peers = []
+    for peer in device.peers_v4 + device.peers_v6:
+        peers.append({
+            "address": peer["address"],
+            "description": peer["description"],
+            "state": peer["state"].lower(),
+            "received-total-routes": peer["received"],
+            "advertised-total-routes": peer["advertised"],
+            "up-time": int(now - peer["up_since"]) if peer["state"] == "Established" else 0,
+        })
+    return {"bgp": {"base-process": {"peers": {"peer": peers}}}}
+
+
+def messages(devices, collection_id):
+    for device in devices:
+        yield telemetry(device, OPTICAL_PATH, optical_content(device), collection_id)
+        yield telemetry(device, BGP_PATH, bgp_content(device), collection_id)
+
+
+def parse_args(argv):
+    """Argumentos no formato --nome valor"""
+    types = {k: type(v) for k, v in CONFIG.items() if k != "models"}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        name = arg[2:].replace("-", "_")
+        if not arg.startswith("--") or i + 1 >= len(argv) or name not in CONFIG:
+            print(f"ERRO: Argumento invalido: {arg}", file=sys.stderr)
+            sys.exit(1)
+        value = argv[i + 1]
+        if name == "models":
+            CONFIG[name] = [m.strip() for m in value.split(",") if m.strip()]
+        else:
+            CONFIG[name] = types[name](value)
+        i += 2
+    if CONFIG["layout"] not in ("data_str", "rows", "data_json"):
+        print(f"ERRO: Layout desconhecido: {CONFIG['layout']}", file=sys.stderr)
+        sys.exit(1)
+
+
+def build_devices():
+    vrp_ssh_sim.CONFIG.update({"ports": CONFIG["ports"], "peers": CONFIG["peers"], "seed": CONFIG["seed"]})
+    models = CONFIG["models"]
+    return [vrp_ssh_sim.Device(index, models[index % len(models)], "127.0.0.1", 0)
+            for index in range(CONFIG["devices"])]
+
+
+def run_direct(devices):
+    """Receptor no mesmo processo: mede a decodificacao e envia um lote"""
+    import huawei_telemetry
+
+    receiver = huawei_telemetry.Receiver()
+    rounds = CONFIG["count"] or 1
+    started = time.monotonic()
+    total = 0
+    for collection_id in range(1, rounds + 1):
+        for payload in messages(devices, collection_id):
+            total += receiver.handle(payload, "127.0.0.1")
+    decode = time.monotonic() - started
+    started = time.monotonic()
+    sent = receiver.flush()
+    print(f"SUCESSO: {rounds * len(devices) * 2} mensagens, {total} valores "
+          f"(decodificacao {decode * 1000:.1f} ms, envio de {sent} valores {(time.monotonic() - started) * 1000:.1f} ms)")
+    print("Contadores: " + json.dumps(receiver.counts))
+
+
+def run_grpc(devices):
+    import grpc
+
+    channel = grpc.insecure_channel(CONFIG["target"])
+    publish = channel.stream_stream("/huawei_dialout.gRPCDataservice/dataPublish")
+
+    def stream():
+        collection_id = 0
+        while not CONFIG["count"] or collection_id < CONFIG["count"]:
+            collection_id += 1
+            started = time.monotonic()
+            sent = 0
+            for payload in messages(devices, collection_id):
+                sent += 1
+                yield payload
+            print(f"Coleta {collection_id}: {sent} mensagens de {len(devices)} equipamentos", flush=True)
+            time.sleep(max(0.0, CONFIG["interval"] - (time.monotonic() - started)))
+
+    for _ in publish(stream()):
+        pass
+    channel.close()
+    print("SUCESSO: publicacao encerrada")
+
+
+def main():
+    parse_args(sys.argv[1:])
+    devices = build_devices()
+    try:
+        if CONFIG["direct"]:
+            run_direct(devices)
+        else:
+            run_grpc(devices)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Emulador local do trapper do Zabbix (protocolo ZBXD) para benchmarks de envio
+
+Recebe requisicoes "sender data" do zabbix_sender (ou de qualquer cliente ZBXD),
+registra cada valor com o horario de recebimento e responde como o proxy/server:
+  {"response":"success","info":"processed: N; failed: M; total: T; seconds spent: S"}
+
+Valores de chaves desconhecidas sao contados como failed quando ha uma lista de
+chaves conhecidas (--template e/ou --known-keys). Ao encerrar (Ctrl+C, SIGTERM ou
+--duration) imprime o resumo e grava o relatorio JSON (--report).
+
+Uso:
+  trapper_sim.py [--listen 127.0.0.1] [--port 10051] [--latency 0] [--fail-ratio 0]
+                 [--template "CWS - HUAWEI - SFP - SNMP.yaml"] [--known-keys chaves.txt]
+                 [--record /tmp/trapper_values.jsonl] [--report /tmp/trapper_report.json]
+                 [--duration 0] [--report-interval 10]
+
+Coletores apontados para o emulador:
+  ZBX_SENDER_PORT=10052 python3 scripts/huawei_sfp.py collect ...
+"""
+
+import json
+import random
+import re
+import signal
+import socketserver
+import struct
+import sys
+import threading
+import time
+import zlib
+
+CONFIG = {
+    "listen": "127.0.0.1",
+    "port": 10051,
+    "latency": 0.0,
+    "fail_ratio": 0.0,
+    "template": None,
+    "known_keys": None,
+    "record": None,
+    "report": None,
+    "duration": 0.0,
+    "report_interval": 10.0,
+}
+
+HEADER = b"ZBXD"
+FLAG_ZBXD = 0x01
+FLAG_COMPRESSED = 0x02
+FLAG_LARGE = 0x04
+
+# Limites superiores dos buckets do histograma de tamanho de lote
+BATCH_BUCKETS = (1, 10, 50, 100, 250, 1000)
+
+KNOWN_KEYS = []  # regex compiladas das chaves aceitas (vazio = aceita tudo)
+
+_lock = threading.Lock()
+_record_file = None
+STATS = {
+    "started": time.time(),
+    "first_value": None,
+    "last_value": None,
+    "connections": 0,
+    "requests": 0,
+    "values": 0,
+    "processed": 0,
+    "failed": 0,
+    "bytes": 0,
+    "protocol_errors": 0,
+    "batch_histogram": {},
+    "failed_keys": {},
+}
+
+
+# ---------------------------------------------------------------------------
+# Chaves conhecidas
+# ---------------------------------------------------------------------------
+
+def _key_regex(key):
+    """Converte chave de item/prototipo ({#MACRO} = qualquer valor) em regex"""
+    key = key.strip().strip("'\"")
+    parts = re.split(r"\{#[A-Z0-9_.]+\}", key)
+    return re.compile(".+".join(re.escape(p) for p in parts) + "$")
+
+
+def load_template_keys(path):
+    """Extrai as chaves dos itens/prototipos/LLD do tipo TRAP de um template YAML"""
+    keys = []
+    block_indent = None
+    block = {}
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines() + ["- uuid: fim"]
+    for line in lines:
+        m = re.match(r"^(\s*)- uuid:", line)
+        if m:
+            if block.get("type") == "TRAP" and block.get("key"):
+                keys.append(block["key"])
+            block_indent = len(m.group(1)) + 2
+            block = {}
+            continue
+        m = re.match(r"^(\s*)(type|key):\s*(.+)$", line)
+        if m and block_indent is not None and len(m.group(1)) == block_indent:
+            block[m.group(2)] = m.group(3).strip().strip("'\"")
+    return keys
+
+
+def load_known_keys():
+    keys = []
+    if CONFIG["template"]:
+        keys += load_template_keys(CONFIG["template"])
+    if CONFIG["known_keys"]:
+        with open(CONFIG["known_keys"], encoding="utf-8") as f:
+            keys += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    KNOWN_KEYS[:] = [_key_regex(k) for k in keys]
+    return keys
+
+
+def key_known(key):
+    if not KNOWN_KEYS:
+        return True
+    return any(pattern.match(key) for pattern in KNOWN_KEYS)
+
+
+# ---------------------------------------------------------------------------
+# Protocolo ZBXD
+# ---------------------------------------------------------------------------
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("conexao encerrada")
+        data += chunk
+    return data
+
+
+def read_packet(sock):
+    """Le um pacote ZBXD (com suporte a compressao e pacotes grandes)"""
+    header = _recv_exact(sock, 5)
+    if header[:4] != HEADER:
+        raise ValueError("cabecalho ZBXD invalido")
+    flags = header[4]
+    if flags & FLAG_LARGE:
+        datalen, reserved = struct.unpack("<QQ", _recv_exact(sock, 16))
+    else:
+        datalen, reserved = struct.unpack("<II", _recv_exact(sock, 8))
+    payload = _recv_exact(sock, datalen)
+    with _lock:
+        STATS["bytes"] += 5 + (16 if flags & FLAG_LARGE else 8) + datalen
+    if flags & FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+    return payload
+
+
+def write_packet(sock, payload):
+    sock.sendall(HEADER + struct.pack("<BII", FLAG_ZBXD, len(payload), 0) + payload)
+
+
+def _bucket(size):
+    for limit in BATCH_BUCKETS:
+        if size <= limit:
+            return f"<={limit}"
+    return f">{BATCH_BUCKETS[-1]}"
+
+
+def process_sender_data(data):
+    """Registra os valores e retorna (processed, failed)"""
+    received = time.time()
+    processed = failed = 0
+    records = []
+    failed_keys = []
+    for item in data:
+        key = str(item.get("key", ""))
+        ok = bool(item.get("host")) and key_known(key)
+        if ok and CONFIG["fail_ratio"] and random.random() < CONFIG["fail_ratio"]:
+            ok = False
+        if ok:
+            processed += 1
+        else:
+            failed += 1
+            failed_keys.append(key)
+        if _record_file is not None:
+            records.append(json.dumps({
+                "recv": round(received, 6),
+                "host": item.get("host"),
+                "key": key,
+                "value": item.get("value"),
+                "clock": item.get("clock"),
+                "ok": ok,
+            }, ensure_ascii=False))
+    with _lock:
+        STATS["requests"] += 1
+        STATS["values"] += len(data)
+        STATS["processed"] += processed
+        STATS["failed"] += failed
+        if data:
+            STATS["first_value"] = STATS["first_value"] or received
+            STATS["last_value"] = received
+        bucket = _bucket(len(data))
+        STATS["batch_histogram"][bucket] = STATS["batch_histogram"].get(bucket, 0) + 1
+        for key in failed_keys:
+            STATS["failed_keys"][key] = STATS["failed_keys"].get(key, 0) + 1
+        if records:
+            _record_file.write("\n".join(records) + "\n")
+    return processed, failed
+
+
+class TrapperHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        with _lock:
+            STATS["connections"] += 1
+        started = time.monotonic()
+        try:
+            request = json.loads(read_packet(self.request))
+        except Exception:
+            with _lock:
+                STATS["protocol_errors"] += 1
+            return
+        if CONFIG["latency"]:
+            time.sleep(CONFIG["latency"])
+        if request.get("request") != "sender data":
+            response = {"response": "failed", "info": f"unsupported request: {request.get('request')}"}
+        else:
+            data = request.get("data") or []
+            processed, failed = process_sender_data(data)
+            spent = time.monotonic() - started
+            response = {
+                "response": "success",
+                "info": f"processed: {processed}; failed: {failed}; total: {len(data)}; "
+                        f"seconds spent: {spent:.6f}",
+            }
+        try:
+            write_packet(self.request, json.dumps(response).encode())
+        except OSError:
+            pass
+
+
+class TrapperServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+# ---------------------------------------------------------------------------
+# Relatorio
+# ---------------------------------------------------------------------------
+
+def report():
+    with _lock:
+        stats = dict(STATS)
+        stats["batch_histogram"] = dict(STATS["batch_histogram"])
+        stats["failed_keys"] = dict(sorted(STATS["failed_keys"].items(), key=lambda kv: -kv[1])[:50])
+    window = 0.0
+    if stats["first_value"] and stats["last_value"]:
+        window = stats["last_value"] - stats["first_value"]
+    elapsed = time.time() - stats["started"]
+    stats["elapsed"] = round(elapsed, 3)
+    stats["values_per_second_wall"] = round(stats["values"] / elapsed, 2) if elapsed > 0 else 0.0
+    stats["values_per_second"] = round(stats["values"] / window, 2) if window > 0 else stats["values_per_second_wall"]
+    stats["mean_batch"] = round(stats["values"] / stats["requests"], 2) if stats["requests"] else 0.0
+    return stats
+
+
+def print_summary(stats):
+    print(f"Valores: {stats['values']} (processed {stats['processed']}, failed {stats['failed']}) "
+          f"em {stats['requests']} requisicoes / {stats['connections']} conexoes")
+    print(f"Taxa: {stats['values_per_second']} valores/s (janela de recebimento), "
+          f"{stats['values_per_second_wall']} valores/s (tempo total)")
+    print(f"Lote medio: {stats['mean_batch']}")
+    for bucket in [f"<={b}" for b in BATCH_BUCKETS] + [f">{BATCH_BUCKETS[-1]}"]:
+        count = stats["batch_histogram"].get(bucket, 0)
+        if count:
+            print(f"  lote {bucket:>7}: {count}")
+    if stats["failed_keys"]:
+        print("Chaves recusadas (top):")
+        for key, count in list(stats["failed_keys"].items())[:10]:
+            print(f"  {count:6d}  {key}")
+
+
+def parse_args(argv):
+    types = {k: type(v) for k, v in CONFIG.items() if v is not None}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        name = arg[2:].replace("-", "_") if arg.startswith("--") else None
+        if name not in CONFIG or i + 1 >= len(argv):
+            print(f"ERRO: Argumento invalido: {arg}", file=sys.stderr)
+            sys.exit(1)
+        CONFIG[name] = types.get(name, str)(argv[i + 1])
+        i += 2
+
+
+def main():
+    global _record_file
+    parse_args(sys.argv[1:])
+    keys = load_known_keys()
+    if CONFIG["record"]:
+        _record_file = open(CONFIG["record"], "a", encoding="utf-8")
+
+    server = TrapperServer((CONFIG["listen"], CONFIG["port"]), TrapperHandler)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.2}, daemon=True).start()
+    print(f"SUCESSO: Trapper emulado em {CONFIG['listen']}:{CONFIG['port']} "
+          f"({len(keys) or 'todas as'} chaves conhecidas)", flush=True)
+
+    deadline = time.time() + CONFIG["duration"] if CONFIG["duration"] else None
+    last_values = 0
+    last_report = time.time()
+    try:
+        while not stop.is_set():
+            stop.wait(0.5)
+            if deadline and time.time() >= deadline:
+                break
+            if CONFIG["report_interval"] and time.time() - last_report >= CONFIG["report_interval"]:
+                with _lock:
+                    values = STATS["values"]
+                rate = (values - last_values) / (time.time() - last_report)
+                print(f"Valores: {values} ({rate:.1f}/s)", flush=True)
+                last_values = values
+                last_report = time.time()
+    except KeyboardInterrupt:
+        pass
+    server.shutdown()
+    server.server_close()
+    if _record_file is not None:
+        _record_file.close()
+
+    stats = report()
+    print_summary(stats)
+    if CONFIG["report"]:
+        with open(CONFIG["report"], "w") as f:
+            json.dump(stats, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
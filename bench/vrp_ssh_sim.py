@@ -0,0 +1,1019 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulador SSH de equipamentos Huawei VRP e Datacom DmOS para testes de carga
+
+Sobe N equipamentos virtuais em localhost (uma porta por equipamento, ou um IP
+127.x.y.z por equipamento na mesma porta) que respondem aos comandos enviados
+pelos coletores de scripts/, com saidas geradas para a quantidade de portas e
+peers BGP configurada. Permite injetar latencia, limitar banda e limitar sessoes
+simultaneas por equipamento e canais simultaneos por sessao.
+
+Modelos:
+  ne    roteador NE (huawei_sfp, huawei_health, huawei_bgp)
+  s     switch S67xx (huawei_sw_sfp, huawei_bgp)
+  dmos  Datacom DmOS (datacom_sfp; CLI e subsistema NETCONF na mesma porta)
+
+Uso:
+  vrp_ssh_sim.py [--devices 100] [--models ne,s,dmos] [--ports 24] [--peers 8]
+                 [--base-port 20000] [--addr-mode port|ip] [--listen 127.0.0.1]
+                 [--latency 0.2] [--jitter 0.1] [--connect-delay 0] [--auth-delay 0]
+                 [--bandwidth 0] [--max-sessions 0] [--max-channels 0] [--down-ratio 0.1]
+                 [--user admin --password admin] [--seed 1]
+                 [--inventory /tmp/sim_inventory.json]
+
+Exemplo (coletor contra o equipamento 0):
+  python3 scripts/huawei_sw_sfp.py collect 127.0.0.1 20000 admin admin SIM-S-00000
+"""
+
+import json
+import random
+import re
+import resource
+import selectors
+import socket
+import sys
+import threading
+import time
+
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+import paramiko
+
+# Configuracao (preenchida por parse_args)
+CONFIG = {
+    "devices": 100,
+    "models": ["ne", "s", "dmos"],
+    "ports": 24,
+    "ratio_100g": 0.25,
+    "peers": 8,
+    "listen": "127.0.0.1",
+    "base_port": 20000,
+    "addr_mode": "port",
+    "latency": 0.0,
+    "jitter": 0.0,
+    "connect_delay": 0.0,
+    "auth_delay": 0.0,
+    "bandwidth": 0,
+    "max_sessions": 0,
+    "max_channels": 0,
+    "down_ratio": 0.1,
+    "user": None,
+    "password": None,
+    "seed": 1,
+    "inventory": None,
+}
+
+HOST_KEY = None
+STARTED = time.time()
+
+# Contadores globais (apenas para o resumo periodico)
+_stats_lock = threading.Lock()
+STATS = {"sessions": 0, "active": 0, "rejected": 0, "commands": 0, "bytes": 0}
+
+
+def _count(name, value=1):
+    with _stats_lock:
+        STATS[name] += value
+
+
+# ---------------------------------------------------------------------------
+# Equipamento virtual
+# ---------------------------------------------------------------------------
+
+class Device:
+    """Estado de um equipamento virtual (portas, peers e valores base)"""
+
+    def __init__(self, index, model, ip, port):
+        self.index = index
+        self.model = model
+        self.ip = ip
+        self.port = port
+        self.name = f"SIM-{model.upper()}-{index:05d}"
+        self.rng = random.Random(CONFIG["seed"] * 100003 + index)
+        self.sessions = 0
+        self.lock = threading.Lock()
+        self.interfaces = self._build_interfaces()
+        self.peers_v4 = self._build_peers(4)
+        self.peers_v6 = self._build_peers(6)
+
+    def _build_interfaces(self):
+        interfaces = []
+        n_100g = int(CONFIG["ports"] * CONFIG["ratio_100g"])
+        for i in range(CONFIG["ports"]):
+            multi = i < n_100g
+            if self.model == "dmos":
+                if_type = "hundred-gigabit-ethernet" if multi else "ten-gigabit-ethernet"
+                name = f"{if_type} 1/1/{i + 1}"
+            else:
+                name = f"100GE0/1/{i}" if multi else f"XGE0/0/{i + 1}"
+                if_type = None
+            interfaces.append({
+                "name": name,
+                "if_type": if_type,
+                "id": f"1/1/{i + 1}",
+                "alias": f"CLIENTE-{self.index:05d}-{i:03d}",
+                "up": self.rng.random() >= CONFIG["down_ratio"],
+                "lanes": 4 if multi else 1,
+                "temp": self.rng.uniform(28, 55),
+                "volt": self.rng.uniform(3.20, 3.40),
+                "bias": [self.rng.uniform(20, 75) for _ in range(4)],
+                "tx": [self.rng.uniform(-3, 2) for _ in range(4)],
+                "rx": [self.rng.uniform(-14, 1) for _ in range(4)],
+            })
+        return interfaces
+
+    def _build_peers(self, family):
+        peers = []
+        for i in range(CONFIG["peers"]):
+            if family == 6:
+                address = f"2001:DB8:{self.index:X}::{i + 1:X}"
+            else:
+                address = f"10.{(self.index >> 8) & 255}.{self.index & 255}.{i + 1}"
+            established = self.rng.random() >= 0.1
+            peers.append({
+                "address": address,
+                "as": 64512 + i,
+                "description": f"PEER-V{family}-{i:03d}",
+                "state": "Established" if established else self.rng.choice(["Idle", "Active", "Connect"]),
+                "up_since": STARTED - self.rng.randint(60, 90 * 86400),
+                "received": self.rng.randint(1, 900000) if established else 0,
+                "advertised": self.rng.randint(1, 5000) if established else 0,
+            })
+        return peers
+
+    def interface(self, name):
+        for interface in self.interfaces:
+            if interface["name"] == name:
+                return interface
+        return None
+
+    def noise(self, value, spread):
+        return value + random.uniform(-spread, spread)
+
+    @property
+    def prompt(self):
+        return f"{self.name}#" if self.model == "dmos" else f"<{self.name}>"
+
+
+# ---------------------------------------------------------------------------
+# Saidas dos comandos VRP
+# ---------------------------------------------------------------------------
+
+def _uptime(seconds):
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}d{hours:02d}h{minutes:02d}m"
+    return f"{hours:02d}h{minutes:02d}m{seconds:02d}s"
+
+
+def out_screen_length(dev, m):
+    return "Info: The configuration takes effect on the current user terminal interface only."
+
+
+def out_interface_description(dev, m):
+    lines = [
+        "PHY: Physical",
+        "*down: administratively down",
+        "^down: standby",
+        "(l): loopback",
+        "(s): spoofing",
+        "(b): BFD down",
+        "(e): ETHOAM down",
+        "(d): Dampening Suppressed",
+        "Interface                     PHY     Protocol Description",
+    ]
+    for interface in dev.interfaces:
+        phy = "up" if interface["up"] else "down"
+        lines.append(f"{interface['name']:<30}{phy:<8}{phy:<9}{interface['alias']}")
+    lines.append(f"{'MEth0/0/0':<30}{'up':<8}{'up':<9}GERENCIA")
+    lines.append(f"{'NULL0':<30}{'up':<8}{'up(s)':<9}")
+    return "\n".join(lines)
+
+
+def _lane_pairs(label, values):
+    first = f"{values[0]:.2f}|{values[1]:.2f}(Lane0|Lane1)"
+    second = f"{values[2]:.2f}|{values[3]:.2f}(Lane2|Lane3)"
+    return [f"   {label:<37}:{first}", f"   {'':<37} {second}"]
+
+
+def _transceiver_block(dev, interface):
+    multi = interface["lanes"] > 1
+    bias = [dev.noise(v, 0.5) for v in interface["bias"]]
+    tx = [dev.noise(v, 0.05) for v in interface["tx"]]
+    rx = [dev.noise(v, 0.2) for v in interface["rx"]]
+    lines = [
+        f"{interface['name']} transceiver information:",
+        "-------------------------------------------------------------",
+        " Common information:",
+        f"   {'Transceiver Type':<37}:{'100GBASE_LR4' if multi else '10GBASE_LR'}",
+        f"   {'Connector Type':<37}:LC",
+        f"   {'Wavelength(nm)':<37}:{'1295,1300,1304,1309' if multi else '1310'}",
+        f"   {'Transfer Distance(m)':<37}:10000(9um)",
+        f"   {'Digital Diagnostic Monitoring':<37}:YES",
+        f"   {'Vendor Name':<37}:HUAWEI",
+        f"   {'Vendor Part Number':<37}:{'02311KNQ' if multi else '02310QDJ'}",
+        "-------------------------------------------------------------",
+        " Diagnostic information:",
+        f"   {'Temperature(°C)':<37}:{dev.noise(interface['temp'], 0.3):.2f}",
+        f"   {'Temp High Threshold(°C)':<37}:75.00",
+        f"   {'Temp Low Threshold(°C)':<37}:-5.00",
+        f"   {'Voltage(V)':<37}:{dev.noise(interface['volt'], 0.01):.2f}",
+        f"   {'Volt High Threshold(V)':<37}:3.63",
+        f"   {'Volt Low Threshold(V)':<37}:2.97",
+    ]
+    if multi:
+        lines += _lane_pairs("Bias Current(mA)", bias)
+        lines.append(f"   {'Bias High Threshold(mA)':<37}:90.00")
+        lines += _lane_pairs("RX Power(dBM)", rx)
+        lines.append(f"   {'RX Power High Threshold(dBM)':<37}:4.50")
+        lines += _lane_pairs("TX Power(dBM)", tx)
+        lines.append(f"   {'TX Power High Threshold(dBM)':<37}:4.50")
+    else:
+        lines += [
+            f"   {'Bias Current(mA)':<37}:{bias[0]:.2f}",
+            f"   {'Bias High Threshold(mA)':<37}:90.00",
+            f"   {'RX Power(dBM)':<37}:{rx[0]:.2f}",
+            f"   {'RX Power High Threshold(dBM)':<37}:0.50",
+            f"   {'RX Power Low Threshold(dBM)':<37}:-14.40",
+            f"   {'TX Power(dBM)':<37}:{tx[0]:.2f}",
+            f"   {'TX Power High Threshold(dBM)':<37}:0.50",
+            f"   {'TX Power Low Threshold(dBM)':<37}:-8.20",
+        ]
+    lines.append("-------------------------------------------------------------")
+    return "\n".join(lines)
+
+
+def out_transceiver_all(dev, m):
+    return "\n\n".join(_transceiver_block(dev, i) for i in dev.interfaces if i["up"])
+
+
+def out_transceiver_interface(dev, m):
+    interface = dev.interface(m.group(2))
+    if interface is None:
+        return None
+    if not interface["up"]:
+        return "Info: The transceiver is absent."
+    return _transceiver_block(dev, interface)
+
+
+def out_optical_module(dev, m):
+    interface = dev.interface(m.group(1))
+    if interface is None:
+        return None
+    lines = [
+        f"{interface['name']} optical module extend information:",
+        "-------------------------------------------------------------",
+        f" {'Temperature(C)':<31}{dev.noise(interface['temp'], 0.3):.0f}",
+        f" {'Supply Voltage(V)':<31}{dev.noise(interface['volt'], 0.01):.2f}",
+    ]
+    for lane in range(interface["lanes"]):
+        lines += [
+            f" {f'Tx{lane} Bias(mA)':<31}{dev.noise(interface['bias'][lane], 0.5):.2f}",
+            f" {f'Tx{lane} Power(avg dBm)':<31}{dev.noise(interface['tx'][lane], 0.05):.2f}",
+            f" {f'Rx{lane} Power(avg dBm)':<31}{dev.noise(interface['rx'][lane], 0.2):.2f}",
+        ]
+    lines.append("-------------------------------------------------------------")
+    return "\n".join(lines)
+
+
+def _bgp_peers(dev, m):
+    return dev.peers_v6 if m.group(1) else dev.peers_v4
+
+
+def out_bgp_peer_verbose(dev, m):
+    lines = [
+        "",
+        f" BGP local router ID : 10.255.{(dev.index >> 8) & 255}.{dev.index & 255}",
+        " Local AS number : 64500",
+    ]
+    now = time.time()
+    address = m.group(2) if m.lastindex and m.lastindex >= 2 else None
+    for peer in _bgp_peers(dev, m):
+        if address and peer["address"].lower() != address.lower():
+            continue
+        established = peer["state"] == "Established"
+        state = f"{peer['state']}, Up for {_uptime(now - peer['up_since'])}" if established else peer["state"]
+        lines += [
+            "",
+            f" BGP Peer is {peer['address']},  remote AS {peer['as']}",
+            " Type: EBGP link",
+            f" Peer's description: \"{peer['description']}\"",
+            f" BGP version 4, Remote router ID {peer['address'] if ':' not in peer['address'] else '10.0.0.1'}",
+            " Update-group ID: 1",
+            f" BGP current state: {state}",
+            " BGP current event: KATimerExpired",
+            " BGP last state: OpenConfirm",
+            " BGP Peer Up count: 1",
+            f" Received total routes: {peer['received']}",
+            f" Received active routes total: {int(peer['received'] * 0.9)}",
+            f" Advertised total routes: {peer['advertised']}",
+            " Port: Local - 179        Remote - 53211",
+            " Configured: Connect-retry Time: 32 sec",
+            " Configured: Active Hold Time: 180 sec   Keepalive Time:60 sec",
+            " Received  : Active Hold Time: 180 sec",
+            " Negotiated: Active Hold Time: 180 sec   Keepalive Time:60 sec",
+            " Peer optional capabilities:",
+            " Peer supports bgp multi-protocol extension",
+            " Peer supports bgp route refresh capability",
+            " Peer supports bgp 4-byte-as capability",
+            " Address family IPv6 Unicast: advertised and received" if m.group(1) else
+            " Address family IPv4 Unicast: advertised and received",
+            " Received: Total 4123 messages",
+            "          Update messages                2001",
+            "          Keepalive messages             2120",
+            " Sent: Total 3980 messages",
+            "          Update messages                1870",
+            "          Keepalive messages             2108",
+            " Last keepalive received: 2024-01-01 00:00:00+00:00",
+            " Minimum route advertisement interval is 30 seconds",
+            " Optional capabilities:",
+            " Route refresh capability has been enabled",
+            " Peer Preferred Value: 0",
+            " Routing policy configured:",
+            " No import update filter list",
+            " No export update filter list",
+        ]
+    return "\n".join(lines)
+
+
+def out_bgp_peer_summary(dev, m):
+    peers = _bgp_peers(dev, m)
+    established = sum(1 for p in peers if p["state"] == "Established")
+    lines = [
+        "",
+        f" BGP local router ID : 10.255.{(dev.index >> 8) & 255}.{dev.index & 255}",
+        " Local AS number : 64500",
+        f" Total number of peers : {len(peers)}                 Peers in established state : {established}",
+        "",
+        "  Peer            V          AS  MsgRcvd  MsgSent  OutQ  Up/Down       State  PrefRcv",
+    ]
+    now = time.time()
+    for peer in peers:
+        updown = _uptime(now - peer["up_since"])
+        lines.append(f"  {peer['address']:<15} 4 {peer['as']:>11} {4123:>8} {3980:>8} {0:>5}  "
+                     f"{updown:<13} {peer['state']:<12} {peer['received']}")
+    return "\n".join(lines)
+
+
+def out_routing_statistics(dev, m):
+    total = sum(p["received"] for p in (dev.peers_v6 if m.group(1) == "ipv6" else dev.peers_v4))
+    return "\n".join([
+        "Summary Prefixes : %d" % (total + 120),
+        "Proto      total      active     added      deleted    freed",
+        "           routes     routes     routes     routes     routes",
+        f"DIRECT     64         64         64         0          0",
+        f"STATIC     12         12         12         0          0",
+        f"BGP        {total:<10} {total:<10} {total:<10} 0          0",
+        f"Total      {total + 120:<10} {total + 120:<10} {total + 120:<10} 0          0",
+    ])
+
+
+def out_bgp_routing_statistics(dev, m):
+    total = sum(p["received"] for p in _bgp_peers(dev, m))
+    return f"\n Total Number of Routes: {total}"
+
+
+def out_version(dev, m):
+    uptime = int(time.time() - STARTED) + 86400 * (dev.index % 300 + 1)
+    days, rest = divmod(uptime, 86400)
+    if dev.model == "s":
+        return "\n".join([
+            "Huawei Versatile Routing Platform Software",
+            "VRP (R) software, Version 5.170 (S6730 V200R019C10SPC500)",
+            "Copyright (C) 2000-2020 HUAWEI TECH Co., Ltd.",
+            f"HUAWEI S6730-H24X6C Routing Switch uptime is {days // 7} weeks, {days % 7} days, "
+            f"{rest // 3600} hours, {rest % 3600 // 60} minutes",
+            "",
+            "ES5D2T24Q000 0(Master) : uptime is 42 weeks, 3 days, 12 hours, 13 minutes",
+            "DDR             Memory Size   : 2048    M bytes",
+            "FLASH Total     Memory Size   : 1024    M bytes",
+            "BootROM         Version       : 0000.04f1",
+        ])
+    return "\n".join([
+        "Huawei Versatile Routing Platform Software",
+        "VRP (R) software, Version 8.180 (NE8000 V800R012C10SPC300)",
+        "Copyright (C) 2012-2020 Huawei Technologies Co., Ltd.",
+        f"HUAWEI NE8000 M8 uptime is {days} days, {rest // 3600} hours, {rest % 3600 // 60} minutes",
+        "Patch Version: V800R012SPH021",
+        "NE8000 M8 version information:",
+    ])
+
+
+def out_power(dev, m):
+    if dev.model == "s":
+        return "\n".join([
+            "Slot    PowerID  Online   Mode   State      Power(W)",
+            "----------------------------------------------------",
+            f"0       PWR1     Present  AC     Supply     {600:.2f}",
+            f"0       PWR2     Present  AC     Supply     {600:.2f}",
+        ])
+    return "\n".join([
+        "Slot  Present  Mode  State",
+        "--------------------------",
+        "17    Yes      DC    Normal",
+        "18    Yes      DC    Normal",
+    ])
+
+
+def out_power_manage(dev, m):
+    current = int(dev.noise(98000, 3000))
+    return "\n".join([
+        f"The current power consumption (mW)  : {current}",
+        f"The average power consumption (mW)  : {current - 1500}",
+        "The maximum power consumption (mW)  : 150000",
+    ])
+
+
+def out_fan(dev, m):
+    speed = int(dev.noise(45, 5))
+    if dev.model == "s":
+        lines = [
+            "Slot  FanID   Online    Status    Speed     Mode     Airflow         Auto Min-Speed",
+            "-----------------------------------------------------------------------------------",
+        ]
+        for fan in range(1, 5):
+            lines.append(f"0         {fan}   Present   Normal      {speed}%     Auto     Front-to-Back                -")
+        return "\n".join(lines)
+    return "\n".join([
+        "Slot  Present  Registered  Status  Speed",
+        "----------------------------------------",
+        f"FAN 1  Yes     Registered  Normal  [1]{speed}%  [2]{speed + 1}%",
+        f"FAN 2  Yes     Registered  Normal  [1]{speed}%  [2]{speed - 1}%",
+    ])
+
+
+def out_temperature_ipu(dev, m):
+    lines = []
+    for slot in (1, 2):
+        lines += [
+            f"Base-Board, Unit:C, Slot {slot}",
+            "PCB    I2C  ADDr  Chl  Status  Minor  Major  Fatal  Adjust  Offset  Temp(C)",
+            "-------------------------------------------------------------------------------",
+        ]
+        for chl in range(3):
+            temp = int(dev.noise(42 + chl * 3, 2))
+            lines.append(f"IPU    {slot + 1}    {72 + chl}    {chl}    NORMAL  78     88     95     0       0       {temp}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def out_cpu_usage(dev, m):
+    return f"CPU Usage Stat. Cycle: 60 (Second)\nSystem cpu use rate is : {int(dev.noise(20, 8))}%"
+
+
+def out_memory_usage(dev, m):
+    total = 16777216
+    pct = int(dev.noise(35, 3))
+    return "\n".join([
+        f"System Total Memory Is: {total} Kbytes",
+        f"Total Memory Used Is: {total * pct // 100} Kbytes",
+        f"Memory Using Percentage Is: {pct}%",
+    ])
+
+
+def out_power_supply(dev, m):
+    return "\n".join(["Total Power(W)", " Rated       2200", f" Real        {int(dev.noise(450, 20))}"])
+
+
+def out_health(dev, m):
+    return "\n".join([
+        "Slot     Card   Sub-Card   CPU Usage  Memory Usage(Used/Total)",
+        "----------------------------------------------------------------",
+        f"1        -      -          {int(dev.noise(20, 8))}%        35%    5800MB/16384MB",
+    ])
+
+
+VRP_COMMANDS = [
+    (r"screen-length 0 temporary", out_screen_length, None),
+    (r"display interface description", out_interface_description, None),
+    (r"display transceiver verbose", out_transceiver_all, "s"),
+    (r"display transceiver( verbose)? interface (\S+)", out_transceiver_interface, "s"),
+    (r"display optical-module extend information interface (\S+)", out_optical_module, "ne"),
+    (r"display bgp( ipv6)? peer verbose", out_bgp_peer_verbose, None),
+    (r"display bgp( ipv6)? peer (\S+) verbose", out_bgp_peer_verbose, None),
+    (r"display bgp( ipv6)? peer", out_bgp_peer_summary, None),
+    (r"display (ip|ipv6) routing-table statistics", out_routing_statistics, None),
+    (r"display bgp( ipv6)? routing-table statistics", out_bgp_routing_statistics, None),
+    (r"display version", out_version, None),
+    (r"display power", out_power, None),
+    (r"display power manage power-information", out_power_manage, "s"),
+    (r"display fan", out_fan, None),
+    (r"display temperature ipu", out_temperature_ipu, "ne"),
+    (r"display cpu-usage", out_cpu_usage, None),
+    (r"display memory-usage", out_memory_usage, None),
+    (r"display power-supply information", out_power_supply, "ne"),
+    (r"display health", out_health, "ne"),
+]
+VRP_COMMANDS = [(re.compile(p + r"$", re.IGNORECASE), f, model) for p, f, model in VRP_COMMANDS]
+
+VRP_ERROR = "              ^\nError: Unrecognized command found at '^' position."
+# Separador de pipes: "|" seguido de uma acao (o regex do include pode conter "|")
+PIPE_RE = re.compile(r"\s*\|\s*(?=(?:include|exclude|begin|count|no-more|i|e|b)\b)", re.IGNORECASE)
+
+
+def _apply_pipes(output, pipes):
+    """Filtros de saida do VRP (| include, | exclude, | begin, | count, | no-more)"""
+    for pipe in pipes:
+        parts = pipe.split(None, 1)
+        if not parts:
+            continue
+        action = parts[0].lower()
+        arg = parts[1] if len(parts) > 1 else ""
+        if action == "no-more":
+            continue
+        try:
+            pattern = re.compile(arg)
+        except re.error:
+            return VRP_ERROR
+        lines = output.split("\n")
+        if action in ("include", "i"):
+            output = "\n".join(line for line in lines if pattern.search(line))
+        elif action in ("exclude", "e"):
+            output = "\n".join(line for line in lines if not pattern.search(line))
+        elif action in ("begin", "b"):
+            for idx, line in enumerate(lines):
+                if pattern.search(line):
+                    output = "\n".join(lines[idx:])
+                    break
+            else:
+                output = ""
+        elif action == "count":
+            output = f"Total lines: {len([line for line in lines if line.strip()])}"
+        else:
+            return VRP_ERROR
+    return output
+
+
+def vrp_output(dev, command):
+    parts = [p.strip() for p in PIPE_RE.split(command)]
+    base = " ".join(parts[0].split())
+    for pattern, func, model in VRP_COMMANDS:
+        m = pattern.match(base)
+        if m and (model is None or model == dev.model):
+            output = func(dev, m)
+            if output is None:
+                return "Error: Wrong parameter found at '^' position."
+            return _apply_pipes(output, parts[1:])
+    return VRP_ERROR
+
+
+# ---------------------------------------------------------------------------
+# Saidas dos comandos DmOS
+# ---------------------------------------------------------------------------
+
+def dmos_records(dev):
+    recs = []
+    for interface in dev.interfaces:
+        if not interface["up"]:
+            continue
+        rec = {
+            "if-type": interface["if_type"],
+            "id": interface["id"],
+            "temperature": f"{dev.noise(interface['temp'], 0.3):.2f}",
+            "vcc-3v3": f"{dev.noise(interface['volt'], 0.01):.2f}",
+        }
+        for lane in range(interface["lanes"]):
+            rec[f"tx{lane + 1}-bias"] = f"{dev.noise(interface['bias'][lane], 0.5):.2f}"
+            rec[f"rx{lane + 1}-power"] = f"{dev.noise(interface['rx'][lane], 0.2):.2f}"
+            rec[f"tx{lane + 1}-power"] = f"{dev.noise(interface['tx'][lane], 0.05):.2f}"
+        # Inventario e limiares que o equipamento tambem devolve (nao usados pelo coletor)
+        multi = interface["lanes"] > 1
+        rec.update({
+            "vendor-name": "DATACOM",
+            "part-number": "QSFP28-100G-LR4" if multi else "SFP+-10G-LR",
+            "serial-number": f"DC{dev.index:05d}{interface['id'].replace('/', '')}",
+            "wavelength": "1310",
+            "connector": "lc",
+            "ddm-supported": "true",
+            "temperature-high-alarm": "75.00",
+            "temperature-low-alarm": "-5.00",
+            "vcc-high-alarm": "3.63",
+            "vcc-low-alarm": "2.97",
+            "rx-power-high-alarm": "4.50" if multi else "0.50",
+            "rx-power-low-alarm": "-14.40",
+            "tx-power-high-alarm": "4.50" if multi else "0.50",
+            "tx-power-low-alarm": "-6.50",
+        })
+        recs.append(rec)
+    return recs
+
+
+def out_dmos_transceivers(dev):
+    recs = dmos_records(dev)
+    return json.dumps({
+        "data": {
+            "dmos-base:status": {
+                "interface": {"dmos-transceivers:transceivers": recs}
+            }
+        }
+    }, indent=2)
+
+
+NS_NETCONF = "urn:ietf:params:xml:ns:netconf:base:1.0"
+DMOS_NS = {
+    "dmos-base": "http://sim.datacom/ns/dmos-base",
+    "dmos-transceivers": "http://sim.datacom/ns/dmos-transceivers",
+}
+NETCONF_HELLO = (
+    f'<?xml version="1.0" encoding="UTF-8"?><hello xmlns="{NS_NETCONF}"><capabilities>'
+    '<capability>urn:ietf:params:netconf:base:1.0</capability>'
+    '<capability>urn:ietf:params:netconf:base:1.1</capability>'
+    + "".join(f"<capability>{ns}?module={module}&amp;revision=2023-01-01</capability>"
+              for module, ns in DMOS_NS.items())
+    + '</capabilities><session-id>{session}</session-id></hello>'
+)
+NETCONF_ERROR = (f'<rpc-reply message-id="{{mid}}" xmlns="{NS_NETCONF}"><rpc-error>'
+                 '<error-type>protocol</error-type><error-tag>operation-failed</error-tag>'
+                 '<error-severity>error</error-severity><error-message>{message}</error-message>'
+                 '</rpc-error></rpc-reply>')
+
+
+def dmos_output(dev, command):
+    base = " ".join(command.split())
+    if base == "show interface transceivers | display json":
+        return out_dmos_transceivers(dev)
+    if base in ("paginate false", "terminal length 0"):
+        return ""
+    return "syntax error: unknown command"
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def dmos_netconf_reply(dev, message):
+    """Resposta a uma <rpc> NETCONF; retorna (xml, encerrar_sessao)"""
+    try:
+        rpc = ET.fromstring(message)
+    except ET.ParseError:
+        return NETCONF_ERROR.format(mid="", message="malformed message"), False
+    mid = escape(rpc.get("message-id", ""), {'"': "&quot;"})
+    operation = _local(rpc[0].tag) if len(rpc) else ""
+    if operation == "close-session":
+        return f'<rpc-reply message-id="{mid}" xmlns="{NS_NETCONF}"><ok/></rpc-reply>', True
+    if operation != "get":
+        return NETCONF_ERROR.format(mid=mid, message=f"operation {operation} not supported"), False
+    # Filtro subtree: so o container dos namespaces anunciados e as folhas pedidas
+    selected = None
+    for element in rpc.iter():
+        if _local(element.tag) == "transceivers":
+            if element.tag != f"{{{DMOS_NS['dmos-transceivers']}}}transceivers":
+                return f'<rpc-reply message-id="{mid}" xmlns="{NS_NETCONF}"><data/></rpc-reply>', False
+            selected = {_local(child.tag) for child in element} or None
+    base_ns, transceivers_ns = DMOS_NS["dmos-base"], DMOS_NS["dmos-transceivers"]
+    entries = []
+    for rec in dmos_records(dev):
+        leaves = "".join(f"<{k}>{escape(str(v))}</{k}>" for k, v in rec.items()
+                         if selected is None or k in selected or k in ("if-type", "id"))
+        entries.append(f'<transceivers xmlns="{transceivers_ns}">{leaves}</transceivers>')
+    return (f'<rpc-reply message-id="{mid}" xmlns="{NS_NETCONF}"><data>'
+            f'<status xmlns="{base_ns}"><interface>{"".join(entries)}</interface></status>'
+            f'</data></rpc-reply>'), False
+
+
+def run_commands(dev, payload):
+    """Executa um payload de exec (varias linhas e/ou separadas por ';')"""
+    commands = []
+    for line in payload.replace("\r", "").split("\n"):
+        commands += [c.strip() for c in line.split(";") if c.strip()]
+    if dev.model == "dmos":
+        return "\n".join(dmos_output(dev, c) for c in commands)
+    chunks = []
+    for command in commands:
+        chunks.append(f"{dev.prompt}{command}\n{vrp_output(dev, command)}\n")
+    chunks.append(dev.prompt)
+    return "".join(chunks)
+
+
+# ---------------------------------------------------------------------------
+# Servidor SSH
+# ---------------------------------------------------------------------------
+
+class SimServer(paramiko.ServerInterface):
+    def __init__(self, dev):
+        self.dev = dev
+        self.requests = []
+        self.event = threading.Event()
+        self.channels = 0
+        self.lock = threading.Lock()
+
+    def release_channel(self):
+        with self.lock:
+            self.channels -= 1
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if CONFIG["auth_delay"]:
+            time.sleep(CONFIG["auth_delay"])
+        if CONFIG["user"] is not None and username != CONFIG["user"]:
+            return paramiko.AUTH_FAILED
+        if CONFIG["password"] is not None and password != CONFIG["password"]:
+            return paramiko.AUTH_FAILED
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            with self.lock:
+                if CONFIG["max_channels"] and self.channels >= CONFIG["max_channels"]:
+                    return paramiko.OPEN_FAILED_RESOURCE_SHORTAGE
+                self.channels += 1
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        text = command.decode("utf-8", "ignore") if isinstance(command, bytes) else command
+        threading.Thread(target=serve_exec, args=(self.dev, channel, text, self), daemon=True).start()
+        return True
+
+    def check_channel_subsystem_request(self, channel, name):
+        if name != "netconf" or self.dev.model != "dmos":
+            return False
+        threading.Thread(target=serve_netconf, args=(self.dev, channel, self), daemon=True).start()
+        return True
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        threading.Thread(target=serve_shell, args=(self.dev, channel, self), daemon=True).start()
+        return True
+
+
+def _delay():
+    if CONFIG["latency"] or CONFIG["jitter"]:
+        time.sleep(max(0.0, CONFIG["latency"] + random.uniform(0, CONFIG["jitter"])))
+
+
+def _send(channel, text):
+    """Envia a saida respeitando o limite de banda (bytes/s)"""
+    data = text.encode("utf-8")
+    _count("bytes", len(data))
+    bandwidth = CONFIG["bandwidth"]
+    if not bandwidth:
+        channel.sendall(data)
+        return
+    chunk = max(512, bandwidth // 20)
+    for offset in range(0, len(data), chunk):
+        channel.sendall(data[offset:offset + chunk])
+        time.sleep(len(data[offset:offset + chunk]) / bandwidth)
+
+
+def serve_exec(dev, channel, payload, server):
+    try:
+        _count("commands")
+        _delay()
+        _send(channel, run_commands(dev, payload))
+        channel.send_exit_status(0)
+    except Exception:
+        pass
+    finally:
+        channel.close()
+        server.release_channel()
+
+
+def serve_shell(dev, channel, server):
+    """Sessao interativa com prompt (VTY)"""
+    try:
+        if dev.model == "dmos":
+            _send(channel, f"\r\nWelcome to the DmOS CLI\r\n{dev.prompt}")
+        else:
+            _send(channel, "\r\nInfo: The max number of VTY users is 21, the number of current VTY users"
+                           " online is 1.\r\n\r\n" + dev.prompt)
+        buffer = b""
+        while True:
+            data = channel.recv(4096)
+            if not data:
+                break
+            buffer += data
+            while b"\n" in buffer or b"\r" in buffer:
+                idx = min(i for i in (buffer.find(b"\n"), buffer.find(b"\r")) if i >= 0)
+                line = buffer[:idx].decode("utf-8", "ignore").strip()
+                buffer = buffer[idx + 1:].lstrip(b"\r\n")
+                if line in ("quit", "exit", "logout"):
+                    return
+                if line:
+                    _count("commands")
+                    _delay()
+                    output = dmos_output(dev, line) if dev.model == "dmos" else vrp_output(dev, line)
+                    _send(channel, line + "\r\n" + output.replace("\n", "\r\n") + "\r\n" + dev.prompt)
+                else:
+                    _send(channel, "\r\n" + dev.prompt)
+    except Exception:
+        pass
+    finally:
+        channel.close()
+        server.release_channel()
+
+
+def serve_netconf(dev, channel, server):
+    """Subsistema NETCONF (]]>]]> ou chunked se o cliente anunciar base:1.1)"""
+    buffer = b""
+    chunked = False
+
+    def read_message():
+        nonlocal buffer
+        if not chunked:
+            while b"]]>]]>" not in buffer:
+                data = channel.recv(65536)
+                if not data:
+                    return None
+                buffer += data
+            message, buffer = buffer.split(b"]]>]]>", 1)
+            return message.decode("utf-8", "ignore")
+        parts = []
+        while True:
+            header = re.match(rb"\s*\n#(\d+|#)\n", buffer)
+            if header is None:
+                data = channel.recv(65536)
+                if not data:
+                    return None
+                buffer += data
+                continue
+            if header.group(1) == b"#":
+                buffer = buffer[header.end():]
+                return b"".join(parts).decode("utf-8", "ignore")
+            end = header.end() + int(header.group(1))
+            while len(buffer) < end:
+                data = channel.recv(65536)
+                if not data:
+                    return None
+                buffer += data
+            parts.append(buffer[header.end():end])
+            buffer = buffer[end:]
+
+    def send_message(xml):
+        if chunked:
+            _send(channel, f"\n#{len(xml.encode('utf-8'))}\n{xml}\n##\n")
+        else:
+            _send(channel, xml + "]]>]]>")
+
+    try:
+        send_message(NETCONF_HELLO.format(session=threading.get_ident() % 100000))
+        hello = read_message()
+        if hello is None:
+            return
+        chunked = "urn:ietf:params:netconf:base:1.1" in hello
+        while True:
+            message = read_message()
+            if message is None:
+                break
+            _count("commands")
+            _delay()
+            reply, close = dmos_netconf_reply(dev, message)
+            send_message(reply)
+            if close:
+                break
+    except Exception:
+        pass
+    finally:
+        channel.close()
+        server.release_channel()
+
+
+def handle_connection(dev, sock):
+    with dev.lock:
+        if CONFIG["max_sessions"] and dev.sessions >= CONFIG["max_sessions"]:
+            _count("rejected")
+            sock.close()
+            return
+        dev.sessions += 1
+    _count("sessions")
+    _count("active")
+    transport = None
+    try:
+        if CONFIG["connect_delay"]:
+            time.sleep(CONFIG["connect_delay"])
+        transport = paramiko.Transport(sock)
+        transport.add_server_key(HOST_KEY)
+        transport.start_server(server=SimServer(dev))
+        while transport.is_active():
+            time.sleep(0.2)
+    except Exception:
+        pass
+    finally:
+        if transport is not None:
+            transport.close()
+        with dev.lock:
+            dev.sessions -= 1
+        _count("active", -1)
+
+
+# ---------------------------------------------------------------------------
+# Inicializacao
+# ---------------------------------------------------------------------------
+
+def build_fleet():
+    devices = []
+    models = CONFIG["models"]
+    for index in range(CONFIG["devices"]):
+        model = models[index % len(models)]
+        if CONFIG["addr_mode"] == "ip":
+            # 127.a.b.c com c em 1..254 (127.0.0.0/8 inteiro e loopback no Linux)
+            ip = f"127.{1 + index // (254 * 256)}.{index // 254 % 256}.{index % 254 + 1}"
+            port = CONFIG["base_port"]
+        else:
+            ip = CONFIG["listen"]
+            port = CONFIG["base_port"] + index
+        devices.append(Device(index, model, ip, port))
+    return devices
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def write_inventory(devices, path):
+    inventory = [{
+        "name": d.name,
+        "ip": d.ip,
+        "port": d.port,
+        "model": d.model,
+        "user": CONFIG["user"] or "admin",
+        "password": CONFIG["password"] or "admin",
+        "ports": CONFIG["ports"],
+        "peers": CONFIG["peers"],
+    } for d in devices]
+    with open(path, "w") as f:
+        json.dump(inventory, f, indent=1)
+
+
+def parse_args(argv):
+    """Argumentos no formato --nome valor"""
+    types = {k: type(v) for k, v in CONFIG.items() if v is not None and k != "models"}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if not arg.startswith("--") or i + 1 >= len(argv):
+            print(f"ERRO: Argumento invalido: {arg}", file=sys.stderr)
+            sys.exit(1)
+        name = arg[2:].replace("-", "_")
+        if name in CONFIG:
+            value = argv[i + 1]
+            if name == "models":
+                CONFIG[name] = [m.strip() for m in value.split(",") if m.strip()]
+            elif name in types:
+                CONFIG[name] = types[name](value)
+            else:
+                CONFIG[name] = value
+        else:
+            print(f"ERRO: Opcao desconhecida: {arg}", file=sys.stderr)
+            sys.exit(1)
+        i += 2
+    for model in CONFIG["models"]:
+        if model not in ("ne", "s", "dmos"):
+            print(f"ERRO: Modelo desconhecido: {model}", file=sys.stderr)
+            sys.exit(1)
+
+
+def main():
+    global HOST_KEY
+    parse_args(sys.argv[1:])
+    raise_fd_limit()
+    HOST_KEY = paramiko.RSAKey.generate(2048)
+    devices = build_fleet()
+
+    selector = selectors.DefaultSelector()
+    for dev in devices:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((dev.ip, dev.port))
+        listener.listen(128)
+        listener.setblocking(False)
+        selector.register(listener, selectors.EVENT_READ, dev)
+
+    if CONFIG["inventory"]:
+        write_inventory(devices, CONFIG["inventory"])
+    print(f"SUCESSO: {len(devices)} equipamentos simulados "
+          f"({','.join(CONFIG['models'])}) a partir de {devices[0].ip}:{devices[0].port}", flush=True)
+
+    last_report = time.time()
+    try:
+        while True:
+            for key, _ in selector.select(timeout=1.0):
+                try:
+                    sock, _ = key.fileobj.accept()
+                except OSError:
+                    continue
+                sock.setblocking(True)
+                threading.Thread(target=handle_connection, args=(key.data, sock), daemon=True).start()
+            if time.time() - last_report >= 10:
+                last_report = time.time()
+                with _stats_lock:
+                    print(f"Sessoes: {STATS['sessions']} (ativas {STATS['active']}, rejeitadas {STATS['rejected']}) "
+                          f"comandos: {STATS['commands']} bytes: {STATS['bytes']}", flush=True)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
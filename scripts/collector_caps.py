@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de capacidades por equipamento (quais comandos funcionam)
+
+Em vez de tentar as variantes de um comando (ex.: "display transceiver verbose
+interface X" e depois "display transceiver interface X") em toda interface e em
+toda execucao, choose() testa as variantes uma unica vez e grava a que funcionou.
+Quando todas sao recusadas como comando desconhecido o comando fica marcado como
+sem suporte e deixa de ser executado.
+
+Estado por host em COLLECTOR_CAPS_DIR (padrao /var/lib/zabbix/collector_caps),
+invalidado quando a saida normalizada do "display version" muda (atualizacao de
+software ou troca de equipamento) ou apos COLLECTOR_CAPS_TTL segundos (padrao 7 dias).
+O arquivo e compartilhado pelos coletores do host (huawei_sw_sfp, huawei_bgp): save()
+rele o arquivo e grava por cima dele so o que a execucao aprendeu.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+
+import collector_replay
+
+CAPS_DIR = os.environ.get("COLLECTOR_CAPS_DIR", "/var/lib/zabbix/collector_caps")
+TTL = int(os.environ.get("COLLECTOR_CAPS_TTL", str(7 * 86400)))
+
+# Respostas do VRP para comando ou parametro nao suportado
+ERROR_RE = re.compile(r"^\s*Error:\s*(Unrecognized command|Wrong parameter|Incomplete command|"
+                      r"Too many parameters|Ambiguous command)", re.M)
+UNRECOGNIZED_RE = re.compile(r"^\s*Error:\s*Unrecognized command", re.M)
+UPTIME_RE = re.compile(r"\s*uptime is.*$", re.M)
+
+# Estado da execucao corrente (uma execucao por processo)
+_hostname = None
+_state = {"version": None, "time": 0, "caps": {}}
+_dirty = False
+_touched = set()  # ("caps" | "values", nome) aprendidos nesta execucao
+_reset = None  # horario da invalidacao feita nesta execucao
+
+
+def _file(hostname):
+    safe = "".join(c if c.isalnum() or c in "-._" else "_" for c in hostname)
+    return os.path.join(CAPS_DIR, f"{safe}.json")
+
+
+def version_signature(output):
+    """Assinatura do 'display version' sem os campos que mudam a cada execucao (uptime)"""
+    lines = [UPTIME_RE.sub("", line).strip() for line in (output or "").splitlines()]
+    relevant = [line for line in lines if "version" in line.lower() or line.startswith("HUAWEI")]
+    if not relevant:
+        return None
+    return hashlib.sha1("\n".join(relevant).encode()).hexdigest()[:16]
+
+
+def begin(hostname, version_output=None):
+    """Carrega as capacidades do host; descarta se a versao mudou ou o TTL expirou"""
+    global _hostname, _state, _dirty, _reset
+    _hostname = hostname
+    _dirty = False
+    _touched.clear()
+    _reset = None
+    _state = {"version": None, "time": 0, "caps": {}}
+    if not hostname or collector_replay.replaying():
+        _hostname = None
+        return
+    try:
+        with open(_file(hostname)) as f:
+            _state = json.load(f)
+    except (OSError, ValueError):
+        pass
+    validate(version_output)
+
+
+def validate(version_output):
+    """Descarta as capacidades se o display version mudou (ou o TTL expirou)"""
+    global _state, _dirty, _reset
+    signature = version_signature(version_output)
+    if (signature and signature != _state.get("version")) or time.time() - _state.get("time", 0) > TTL:
+        _state = {"version": signature or _state.get("version"), "time": time.time(), "caps": {}}
+        _touched.clear()
+        _reset = _state["time"]
+        _dirty = True
+
+
+def is_error(output):
+    return bool(ERROR_RE.search(output or ""))
+
+
+def command(name, candidates):
+    """Variante aprendida (ou a primeira); None se nenhuma e suportada"""
+    learned = _state["caps"].get(name)
+    if learned == "":
+        return None
+    return learned if learned in candidates else candidates[0]
+
+
+def choose(name, candidates, run, **fields):
+    """Executa a variante aprendida ou testa as demais; retorna a saida ou None
+
+    candidates sao modelos formatados com fields (ex.: "... interface {ifname}") e
+    run(comando) devolve a saida do equipamento (excecao = falha de execucao).
+    """
+    global _dirty
+    learned = _state["caps"].get(name)
+    if learned == "":
+        return None
+    order = list(candidates)
+    if learned in order:
+        order.remove(learned)
+        order.insert(0, learned)
+    unsupported = True
+    for template in order:
+        try:
+            output = run(template.format(**fields))
+        except Exception:
+            unsupported = False  # falha de conexao nao prova falta de suporte
+            continue
+        if is_error(output):
+            # Parametro recusado (ex.: interface) nao invalida o comando
+            unsupported = unsupported and bool(UNRECOGNIZED_RE.search(output))
+            continue
+        if template != learned:
+            _state["caps"][name] = template
+            _touched.add(("caps", name))
+            _dirty = True
+        return output
+    if unsupported:
+        _state["caps"][name] = ""
+        _touched.add(("caps", name))
+        _dirty = True
+    return None
+
+
+def value(name):
+    """Dado auxiliar aprendido para o host (ex.: bytes da saida sem filtro)"""
+    return _state.get("values", {}).get(name)
+
+
+def set_value(name, data):
+    global _dirty
+    values = _state.setdefault("values", {})
+    if values.get(name) != data:
+        values[name] = data
+        _touched.add(("values", name))
+        _dirty = True
+
+
+def _merged(path):
+    """Arquivo atual do host com as entradas aprendidas nesta execucao por cima
+
+    Outro coletor do mesmo host pode ter gravado depois do begin(); so a
+    invalidacao feita aqui (versao nova ou TTL) descarta o que esta no arquivo,
+    e apenas se ele for anterior a ela.
+    """
+    try:
+        with open(path) as f:
+            current = json.load(f)
+    except (OSError, ValueError):
+        current = None
+    if not isinstance(current, dict) or (_reset is not None and current.get("time", 0) < _reset):
+        return _state
+    for section, name in _touched:
+        current.setdefault(section, {})[name] = _state[section][name]
+    return current
+
+
+def save():
+    """Grava as capacidades do host se algo foi aprendido nesta execucao"""
+    global _dirty, _state
+    if not _hostname or not _dirty:
+        return
+    path = _file(_hostname)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CAPS_DIR, exist_ok=True)
+        _state = _merged(path)
+        with open(tmp, "w") as f:
+            json.dump(_state, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    _dirty = False
+    _touched.clear()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cliente minimo do servidor de coletores (collector_server.py)
+
+Instalado em externalscripts com o nome de cada coletor (huawei_sfp.py, ...). So usa
+a biblioteca padrao: entrega argv, ambiente e stdin/stdout/stderr ao servidor pelo
+socket Unix e sai com o codigo de retorno do coletor. Se o servidor nao estiver no
+ar (ou estiver no limite de processos), executa o coletor diretamente.
+
+Uso:
+  huawei_sfp.py collect 192.168.1.1 22 admin senha HOSTNAME
+  collector_client.py huawei_sfp collect 192.168.1.1 22 admin senha HOSTNAME
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+
+SOCKET_PATH = os.environ.get("COLLECTOR_SERVER_SOCKET", "/run/zabbix/collector_server.sock")
+COLLECTOR_DIR = os.environ.get("COLLECTOR_DIR", "/usr/lib/zabbix/collectors")
+
+
+def run_direct(script, args):
+    """Fallback: executa o coletor em um interpretador novo"""
+    path = os.path.join(COLLECTOR_DIR, f"{script}.py")
+    if not os.path.exists(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{script}.py")
+    os.execv(sys.executable, [sys.executable, path, *args])
+
+
+def run_server(script, args):
+    """Executa via servidor; retorna o codigo de saida ou None se indisponivel"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(SOCKET_PATH)
+        payload = json.dumps({
+            "script": script,
+            "argv": args,
+            "env": dict(os.environ),
+            "cwd": os.getcwd(),
+        }).encode()
+        message = struct.pack("!I", len(payload)) + payload
+        sent = socket.send_fds(sock, [message], [0, 1, 2])
+        if sent < len(message):
+            sock.sendall(message[sent:])
+    except OSError:
+        sock.close()
+        return None
+
+    reply = b""
+    while not reply.endswith(b"\n"):
+        chunk = sock.recv(64)
+        if not chunk:
+            break
+        reply += chunk
+    sock.close()
+    reply = reply.strip()
+    if reply == b"busy":
+        return None
+    if not reply:
+        print("ERRO: Servidor de coletores encerrou sem codigo de retorno", file=sys.stderr)
+        return 1
+    return int(reply)
+
+
+def main():
+    script = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+    if script.startswith("collector_client"):
+        if not args:
+            print("Uso: collector_client.py <coletor> [argumentos...]", file=sys.stderr)
+            return 1
+        script, args = args[0], args[1:]
+    if script.endswith(".py"):
+        script = script[:-3]
+
+    code = run_server(script, args)
+    if code is None:
+        run_direct(script, args)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
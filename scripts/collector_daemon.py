@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Daemon de coleta alimentado pelo inventario do proprio proxy
+
+Em vez de um item EXTERNAL por coletor (que prende um poller do proxy durante toda
+a coleta SSH), o item vira TRAPPER com a mesma key, ex.:
+  huawei_sw_sfp.py["collect", {HOST.CONN}, {$SSH_PORT}, {$SSH_USER}, {$SSH_PASS}, {HOST.NAME}]
+O daemon le do banco de configuracao do proxy (ZBX_PROXY_DB) os hosts monitorados,
+as interfaces, as macros (host, templates e globais) e esses itens trapper; resolve
+os parametros, agenda cada coleta e envia a saida do coletor (SUCESSO/ERRO/...) para
+o proprio item via trapper.
+
+Intervalo por item: macro {$COLLECTOR_INTERVAL:"<coletor>"} ou {$COLLECTOR_INTERVAL}
+(segundos ou sufixo s/m/h, padrao 5m). A primeira execucao de cada item e espalhada
+dentro do intervalo.
+
+O inventario e relido a cada COLLECTOR_DAEMON_REFRESH segundos (padrao 60), somente
+quando a revisao muda (assinatura das linhas de configuracao lidas); so os itens
+novos, removidos ou alterados sao reagendados. Alternativa ao banco: --inventory com
+um JSON exportado:
+  {"hosts": [{"host": "SW1", "conn": "10.0.0.1",
+              "macros": {"{$SSH_USER}": "admin", ...}, "items": ["huawei_sfp.py[...]"]}]}
+
+As coletas rodam via collector_client.py (servidor residente quando disponivel),
+no maximo COLLECTOR_DAEMON_MAX simultaneas (padrao 100) e COLLECTOR_DAEMON_TIMEOUT
+segundos cada (padrao 120).
+
+Uso:
+  collector_daemon.py [--db arquivo] [--inventory arquivo.json] [--once] [--dry-run]
+"""
+
+import hashlib
+import heapq
+import json
+import logging
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import zbx_sender
+
+DB_PATH = os.environ.get("ZBX_PROXY_DB", "/var/lib/zabbix/zabbix_proxy.db")
+COLLECTOR_DIR = os.environ.get("COLLECTOR_DIR", os.path.dirname(os.path.abspath(__file__)))
+REFRESH = int(os.environ.get("COLLECTOR_DAEMON_REFRESH", "60"))
+MAX_RUNNING = int(os.environ.get("COLLECTOR_DAEMON_MAX", "100"))
+TIMEOUT = int(os.environ.get("COLLECTOR_DAEMON_TIMEOUT", "120"))
+DEFAULT_INTERVAL = 300
+
+COLLECTORS = ("huawei_sfp", "huawei_sw_sfp", "huawei_bgp", "huawei_health", "datacom_sfp", "huawei_poll")
+ITEM_TYPE_TRAPPER = 2
+KEY_RE = re.compile(r"^(%s)\.py\[(.*)\]$" % "|".join(COLLECTORS), re.S)
+MACRO_RE = re.compile(r"\{\$[A-Z0-9_.]+(?::[^}]*)?\}|\{HOST\.(?:CONN|IP|DNS|HOST|NAME)\}")
+
+# Consultas ao banco do proxy (somente leitura)
+QUERY_HOSTS = "SELECT hostid, host, name FROM hosts WHERE status = 0"
+QUERY_ITEMS = (
+    "SELECT hostid, key_, interfaceid FROM items WHERE type = ? AND status = 0 "
+    "AND (key_ LIKE '%.py[%')"
+)
+QUERY_INTERFACES = "SELECT interfaceid, hostid, main, type, useip, ip, dns FROM interface"
+QUERY_HOSTMACROS = "SELECT hostid, macro, value, type FROM hostmacro"
+QUERY_TEMPLATES = "SELECT hostid, templateid FROM hosts_templates"
+QUERY_GLOBALMACROS = "SELECT macro, value, type FROM globalmacro"
+MACRO_TYPE_VAULT = 2
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+
+def parse_interval(value, default=DEFAULT_INTERVAL):
+    """'300', '5m', '1h' -> segundos"""
+    match = re.match(r"^\s*(\d+)\s*([smhd]?)\s*$", str(value or ""))
+    if not match:
+        return default
+    seconds = int(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+    return seconds or default
+
+
+def parse_key_params(params):
+    """Parametros de uma key Zabbix (com ou sem aspas, separados por virgula)"""
+    result = []
+    i = 0
+    while True:
+        while i < len(params) and params[i] == " ":
+            i += 1
+        if i < len(params) and params[i] == '"':
+            i += 1
+            value = []
+            while i < len(params) and params[i] != '"':
+                if params[i] == "\\" and i + 1 < len(params) and params[i + 1] == '"':
+                    i += 1
+                value.append(params[i])
+                i += 1
+            i += 1
+            result.append("".join(value))
+            comma = params.find(",", i)
+        else:
+            comma = params.find(",", i)
+            result.append(params[i:] if comma == -1 else params[i:comma])
+            result[-1] = result[-1].strip()
+        if comma == -1:
+            return result
+        i = comma + 1
+
+
+def _macro_name(macro):
+    """Normaliza {$NOME:"ctx"} / {$NOME:ctx} para (NOME, ctx)"""
+    body = macro[2:-1]
+    name, _, context = body.partition(":")
+    return name, context.strip().strip('"')
+
+
+def resolve_macro(macro, macros):
+    """Valor da macro de usuario (com contexto, se houver, e fallback sem contexto)"""
+    name, context = _macro_name(macro)
+    if context and (name, context) in macros:
+        return macros[(name, context)]
+    return macros.get((name, ""))
+
+
+def expand(value, host, macros):
+    def replace(match):
+        token = match.group(0)
+        if token.startswith("{HOST."):
+            field = token[6:-1]
+            if field in ("CONN", "IP", "DNS"):
+                return host.get("conn") or token
+            return host["host"] if field == "HOST" else host.get("name") or host["host"]
+        resolved = resolve_macro(token, macros)
+        return token if resolved is None else resolved
+    return MACRO_RE.sub(replace, value)
+
+
+def build_jobs(hosts):
+    """Converte o inventario em jobs {(host, key): job}"""
+    jobs = {}
+    for host in hosts:
+        macros = {}
+        for macro, value in (host.get("macros") or {}).items():
+            macros[_macro_name(macro)] = value
+        for key in host.get("items") or []:
+            match = KEY_RE.match(key)
+            if not match:
+                continue
+            script = match.group(1)
+            args = [expand(param, host, macros) for param in parse_key_params(match.group(2))]
+            unresolved = [a for a in args if MACRO_RE.search(a)]
+            interval = parse_interval(
+                resolve_macro('{$COLLECTOR_INTERVAL:"%s"}' % script, macros))
+            jobs[(host["host"], key)] = {
+                "host": host["host"],
+                "key": key,
+                "script": script,
+                "args": args,
+                "interval": interval,
+                "unresolved": unresolved,
+            }
+    return jobs
+
+
+def load_db(path):
+    """Inventario do banco do proxy: lista de hosts com conn, macros e itens"""
+    import sqlite3
+
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+    try:
+        hosts = {}
+        for hostid, host, name in conn.execute(QUERY_HOSTS):
+            hosts[hostid] = {"host": host, "name": name or host, "macros": {}, "items": []}
+        templates = {}
+        for hostid, templateid in conn.execute(QUERY_TEMPLATES):
+            templates.setdefault(hostid, []).append(templateid)
+        macros = {}
+        for hostid, macro, value, mtype in conn.execute(QUERY_HOSTMACROS):
+            if mtype != MACRO_TYPE_VAULT:
+                macros.setdefault(hostid, {})[macro] = value
+        global_macros = {macro: value for macro, value, mtype in conn.execute(QUERY_GLOBALMACROS)
+                         if mtype != MACRO_TYPE_VAULT}
+        interfaces = {}
+        main = {}
+        for interfaceid, hostid, is_main, itype, useip, ip, dns in conn.execute(QUERY_INTERFACES):
+            address = ip if useip else dns
+            interfaces[interfaceid] = address
+            # Interface principal: agente (1) tem preferencia, depois SNMP e demais
+            rank = (0 if is_main else 1, 0 if itype == 1 else itype)
+            if hostid not in main or rank < main[hostid][0]:
+                main[hostid] = (rank, address)
+        for hostid, key, interfaceid in conn.execute(QUERY_ITEMS, (ITEM_TYPE_TRAPPER,)):
+            if hostid in hosts:
+                hosts[hostid]["items"].append(key)
+                if interfaceid in interfaces:
+                    hosts[hostid]["conn"] = interfaces[interfaceid]
+    finally:
+        conn.close()
+
+    def template_macros(hostid, seen):
+        # Macros dos templates (recursivo); a mais proxima do host vence
+        result = {}
+        for templateid in templates.get(hostid, []):
+            if templateid in seen:
+                continue
+            seen.add(templateid)
+            for macro, value in template_macros(templateid, seen).items():
+                result.setdefault(macro, value)
+            for macro, value in macros.get(templateid, {}).items():
+                result[macro] = value
+        return result
+
+    inventory = []
+    for hostid, host in hosts.items():
+        if not host["items"]:
+            continue
+        resolved = dict(global_macros)
+        resolved.update(template_macros(hostid, set()))
+        resolved.update(macros.get(hostid, {}))
+        host["macros"] = resolved
+        host.setdefault("conn", main.get(hostid, (None, ""))[1])
+        inventory.append(host)
+    return inventory
+
+
+def load_file(path):
+    with open(path) as f:
+        data = json.load(f)
+    return data.get("hosts", []) if isinstance(data, dict) else data
+
+
+def revision(inventory):
+    """Assinatura do inventario (muda quando host, interface, macro ou item muda)"""
+    return hashlib.sha1(json.dumps(inventory, sort_keys=True).encode()).hexdigest()
+
+
+class Scheduler:
+    """Agenda dos jobs (heap por horario) e controle das coletas em execucao"""
+
+    def __init__(self, dry_run=False):
+        self.jobs = {}
+        self.heap = []  # (horario, ident, geracao); entradas de geracao antiga sao descartadas
+        self.generation = {}  # ident -> geracao da configuracao corrente do job
+        self.sequence = 0
+        self.running = {}  # (host, key) -> (processo, arquivo de saida, inicio)
+        self.results = []
+        self.dry_run = dry_run
+
+    def update(self, jobs):
+        """Aplica o inventario novo; retorna (novos, removidos, alterados)"""
+        now = time.time()
+        added = removed = changed = 0
+        for ident in list(self.jobs):
+            if ident not in jobs:
+                del self.jobs[ident]
+                self.generation.pop(ident, None)
+                removed += 1
+        for ident, job in jobs.items():
+            old = self.jobs.get(ident)
+            if old == job:
+                continue
+            if old is None:
+                added += 1
+            else:
+                changed += 1
+            self.jobs[ident] = job
+            self.sequence += 1
+            generation = self.generation[ident] = self.sequence
+            if job["unresolved"]:
+                logging.warning(f"{job['host']} {job['key']}: macros sem valor {', '.join(job['unresolved'])}")
+            # Espalha a primeira execucao dentro do intervalo (deterministico por item)
+            offset = int(hashlib.md5("\t".join(ident).encode()).hexdigest(), 16) % job["interval"]
+            heapq.heappush(self.heap, (now + offset, ident, generation))
+        return added, removed, changed
+
+    def start_due(self, now):
+        while self.heap and self.heap[0][0] <= now and len(self.running) < MAX_RUNNING:
+            due, ident, generation = heapq.heappop(self.heap)
+            job = self.jobs.get(ident)
+            if job is None or self.generation.get(ident) != generation:
+                continue  # removido ou alterado (a entrada da configuracao nova segue no heap)
+            interval = job["interval"]
+            # Atrasado (limite de simultaneas ou inventario novo): sem rajada de recuperacao
+            following = due + interval
+            heapq.heappush(self.heap, (following if following > now else now + interval, ident, generation))
+            if ident in self.running:
+                logging.warning(f"{job['host']} {job['script']}: execucao anterior ainda em andamento")
+                continue
+            self.start(ident, job)
+
+    def start(self, ident, job):
+        if self.dry_run:
+            print(f"{job['host']} {job['script']} {' '.join(job['args'][:2])} ... a cada {job['interval']}s")
+            return
+        output = tempfile.TemporaryFile()
+        command = [sys.executable, os.path.join(COLLECTOR_DIR, "collector_client.py"), job["script"], *job["args"]]
+        try:
+            proc = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=output,
+                                    stderr=subprocess.STDOUT, cwd=COLLECTOR_DIR)
+        except OSError as e:
+            output.close()
+            self.results.append(zbx_sender.format_line(job["host"], job["key"], f"ERRO: {e}"))
+            return
+        self.running[ident] = (proc, output, time.monotonic())
+
+    def reap(self):
+        for ident, (proc, output, started) in list(self.running.items()):
+            code = proc.poll()
+            if code is None:
+                if time.monotonic() - started < TIMEOUT:
+                    continue
+                proc.kill()
+                proc.wait()
+                text = f"ERRO: Timeout de {TIMEOUT}s na coleta"
+            else:
+                output.seek(0)
+                text = output.read().decode("utf-8", "replace").strip() or f"codigo de saida {code}"
+            output.close()
+            del self.running[ident]
+            self.results.append(zbx_sender.format_line(ident[0], ident[1], text[-65000:]))
+
+    def flush_results(self):
+        if not self.results:
+            return
+        lines, self.results = self.results, []
+        zbx_sender.send_lines(lines, timeout=10)
+
+    def next_wake(self, now):
+        if self.running:
+            return 0.2
+        if not self.heap:
+            return 1.0
+        return min(1.0, max(0.05, self.heap[0][0] - now))
+
+    def stop(self):
+        """Encerra as coletas em andamento, com um resultado de erro para cada uma"""
+        for ident, (proc, output, _) in self.running.items():
+            proc.kill()
+            proc.wait()
+            output.close()
+            self.results.append(zbx_sender.format_line(ident[0], ident[1], "ERRO: Coleta interrompida (daemon encerrado)"))
+        self.running.clear()
+
+
+def main():
+    db_path = DB_PATH
+    inventory_file = None
+    once = "--once" in sys.argv
+    dry_run = "--dry-run" in sys.argv
+    argv = sys.argv[1:]
+    for i, arg in enumerate(argv):
+        if arg == "--db" and i + 1 < len(argv):
+            db_path = argv[i + 1]
+        elif arg == "--inventory" and i + 1 < len(argv):
+            inventory_file = argv[i + 1]
+
+    scheduler = Scheduler(dry_run=dry_run)
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    current = None
+    next_refresh = 0.0
+
+    try:
+        while not stop:
+            now = time.time()
+            if now >= next_refresh:
+                next_refresh = now + REFRESH
+                try:
+                    inventory = load_file(inventory_file) if inventory_file else load_db(db_path)
+                except Exception as e:
+                    logging.warning(f"Falha ao ler o inventario: {e}")
+                    inventory = None
+                if inventory is not None:
+                    rev = revision(inventory)
+                    if rev != current:
+                        current = rev
+                        added, removed, changed = scheduler.update(build_jobs(inventory))
+                        logging.info(f"Inventario {rev[:12]}: {len(inventory)} hosts, {len(scheduler.jobs)} itens "
+                                     f"(+{added} -{removed} ~{changed})")
+                if once:
+                    # Executa todos os itens uma vez, sem esperar o horario agendado
+                    scheduler.heap = [(0, ident, job["interval"]) for ident, job in scheduler.jobs.items()]
+                    heapq.heapify(scheduler.heap)
+            scheduler.reap()
+            scheduler.start_due(now)
+            scheduler.flush_results()
+            if once and not scheduler.running and (not scheduler.heap or scheduler.heap[0][0] > now):
+                break
+            time.sleep(scheduler.next_wake(time.time()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.reap()
+        scheduler.stop()
+        scheduler.flush_results()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filtros de saida do VRP (| include) gerados a partir dos campos lidos pelos parsers
+
+Saidas grandes (display bgp peer verbose, display interface description, display
+transceiver ... interface X) sao filtradas no proprio equipamento: so as linhas que
+os parsers dos coletores usam atravessam o link. Se o equipamento recusar o filtro,
+a variante sem filtro e aprendida em collector_caps e usada dai em diante.
+
+Bytes antes/depois: na primeira execucao em que a variante com filtro funciona (e
+apos invalidar o cache de capacidades) o comando sem filtro roda uma vez para medir
+a saida completa. O tamanho fica em collector_caps por comando completo (cada
+interface do transceiver tem o seu) e cada execucao registra em collector_stats o
+par sem filtro/com filtro (resumo do debug e collector.bytes.unfiltered[<script>]).
+
+COLLECTOR_VRP_FILTERS=0 desliga os filtros.
+"""
+
+import os
+
+import collector_caps
+import collector_stats
+
+ENABLED = os.environ.get("COLLECTOR_VRP_FILTERS", "1") != "0"
+
+BGP_PEER = "include BGP Peer is|BGP current state|total routes|Peer's description"
+TRANSCEIVER = "include transceiver information|Temperature|Voltage|Bias Current|RX Power|TX Power|Lane"
+
+# Inicio do comando -> filtro (linhas lidas pelos parsers de huawei_sw_sfp e huawei_bgp)
+FILTERS = {
+    "display bgp peer verbose": BGP_PEER,
+    "display bgp ipv6 peer verbose": BGP_PEER,
+    "display interface description": "include GE|Ethernet",
+    "display transceiver verbose interface ": TRANSCEIVER,
+    "display transceiver interface ": TRANSCEIVER,
+}
+
+
+def _match(command):
+    """Prefixo de FILTERS que corresponde ao comando (None sem filtro)"""
+    head = command.split(" | ", 1)[0]
+    for prefix in FILTERS:
+        if head == prefix.strip() or (prefix.endswith(" ") and head.startswith(prefix)):
+            return prefix
+    return None
+
+
+def filtered(command):
+    """Comando com o filtro inserido antes dos demais pipes (ex.: | no-more)"""
+    prefix = _match(command)
+    if not ENABLED or prefix is None:
+        return command
+    head, sep, rest = command.partition(" | ")
+    return f"{head} | {FILTERS[prefix]}{sep}{rest}"
+
+
+def command(full):
+    """Variante a executar agora (com filtro, a menos que o equipamento o recuse)"""
+    prefix = _match(full)
+    if not ENABLED or prefix is None:
+        return full
+    template = collector_caps.command(f"filter:{prefix}", ("{filtered}", "{full}"))
+    return (template or "{full}").format(filtered=filtered(full), full=full)
+
+
+def run(full, execute):
+    """Executa o comando com filtro (ou sem, se recusado); execute(comando) -> saida"""
+    prefix = _match(full)
+    if not ENABLED or prefix is None:
+        return execute(full)
+    name = f"filter:{prefix}"
+    variant = filtered(full)
+    executed = []
+
+    def tracked(command):
+        output = execute(command)
+        executed.append(command)
+        return output
+
+    output = collector_caps.choose(name, ("{filtered}", "{full}"), tracked, filtered=variant, full=full)
+    if output is None:
+        return execute(full)
+    if executed[-1] != variant:
+        return output  # sem filtro nesta execucao: nada a comparar
+    before = collector_caps.value(f"bytes:{full}")
+    if before is None:
+        # Medicao unica da saida completa deste comando (referencia do antes/depois)
+        try:
+            before = len(execute(full))
+            collector_caps.set_value(f"bytes:{full}", before)
+        except Exception:
+            before = None
+    stats = collector_stats.current()
+    if stats is not None and before is not None:
+        stats.add_filtered(variant, before, len(output))
+    return output
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Endpoint HTTP local com os ultimos resultados dos coletores por host
+
+Cada execucao de coletor grava o que enviou (ou imprimiu no modo JSON) em
+COLLECTOR_RESULTS_DIR (collector_output). Este servidor le esses arquivos e
+responde, a partir da memoria, um documento por host para itens mestre HTTP agent
+do Zabbix; leitores simultaneos nao disparam novos logins nos equipamentos. Um
+arquivo so e relido quando muda (mtime).
+
+  GET /hosts                    {"hosts": ["RTR-01", ...]}
+  GET /host/<host>              valores e LLDs de todos os coletores do host
+  GET /host/<host>/<coletor>    resultado de um coletor
+
+  {"host": "RTR-01", "time": <agora>,
+   "scripts": {"huawei_bgp": {"clock": <epoch da coleta>, "age": <segundos>, "values": 77}, ...},
+   "lld": {...}, "values": {"bgpAdvRoutes[...]": "2042", ...}}
+
+Com a mesma key em mais de um coletor (ex.: huawei_poll e huawei_sfp) vale a
+coleta mais recente.
+
+Escuta somente em COLLECTOR_HTTP_ADDR:COLLECTOR_HTTP_PORT (padrao 127.0.0.1:10080).
+
+Uso:
+  collector_http.py [--addr endereco] [--port porta]
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import collector_output
+
+ADDR = os.environ.get("COLLECTOR_HTTP_ADDR", "127.0.0.1")
+PORT = int(os.environ.get("COLLECTOR_HTTP_PORT", "10080"))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+# caminho -> (mtime, documento)
+_cache = {}
+_lock = threading.Lock()
+
+
+def _load(path):
+    """Documento do arquivo de resultado (memoria enquanto o mtime nao muda)"""
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        with _lock:
+            _cache.pop(path, None)
+        return None
+    with _lock:
+        entry = _cache.get(path)
+    if entry and entry[0] == mtime:
+        return entry[1]
+    try:
+        with open(path) as f:
+            doc = json.load(f)
+    except (OSError, ValueError):
+        return entry[1] if entry else None
+    with _lock:
+        _cache[path] = (mtime, doc)
+    return doc
+
+
+def hosts():
+    try:
+        names = os.listdir(collector_output.RESULTS_DIR)
+    except OSError:
+        return []
+    result = []
+    for name in sorted(names):
+        docs = results(name)
+        if docs:
+            result.append(docs[0]["host"])
+    return result
+
+
+def results(safe_host):
+    """Resultados de cada coletor do host (diretorio ja normalizado)"""
+    directory = os.path.join(collector_output.RESULTS_DIR, safe_host)
+    try:
+        files = sorted(f for f in os.listdir(directory) if f.endswith(".json"))
+    except OSError:
+        return []
+    docs = [_load(os.path.join(directory, f)) for f in files]
+    return [doc for doc in docs if doc]
+
+
+def host_document(hostname, script=None):
+    """Documento do host (ou de um coletor); None se nao ha resultado"""
+    docs = results(collector_output.safe_name(hostname))
+    if script:
+        docs = [doc for doc in docs if doc.get("script") == script]
+    if not docs:
+        return None
+    now = time.time()
+    doc = {"host": hostname, "time": int(now), "scripts": {}, "lld": {}, "values": {}}
+    # Mais antigo primeiro: a coleta mais recente prevalece nas keys repetidas
+    for item in sorted(docs, key=lambda d: d.get("clock", 0)):
+        clock = item.get("clock", 0)
+        doc["scripts"][item.get("script", "")] = {"clock": clock, "age": max(0, int(now - clock)),
+                                                  "values": len(item.get("values") or {})}
+        doc["lld"].update(item.get("lld") or {})
+        doc["values"].update(item.get("values") or {})
+    return doc
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parts = [unquote(p) for p in urlsplit(self.path).path.split("/") if p]
+        if parts == ["hosts"]:
+            self.reply(200, {"hosts": hosts()})
+        elif len(parts) in (2, 3) and parts[0] == "host":
+            doc = host_document(*parts[1:])
+            if doc is None:
+                self.reply(404, {"error": f"Sem resultados para {'/'.join(parts[1:])}"})
+            else:
+                self.reply(200, doc)
+        else:
+            self.reply(404, {"error": "Use /hosts, /host/<host> ou /host/<host>/<coletor>"})
+
+    def reply(self, status, doc):
+        body = json.dumps(doc, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def main():
+    addr, port = ADDR, PORT
+    argv = sys.argv[1:]
+    for i, arg in enumerate(argv):
+        if arg == "--addr" and i + 1 < len(argv):
+            addr = argv[i + 1]
+        elif arg == "--port" and i + 1 < len(argv):
+            port = int(argv[i + 1])
+    server = ThreadingHTTPServer((addr, port), Handler)
+    server.daemon_threads = True
+    logging.info(f"Resultados de {collector_output.RESULTS_DIR} em http://{addr}:{port}/host/<host>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
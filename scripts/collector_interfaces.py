@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Regras de selecao de interfaces dos coletores
+
+Cada coletor escolhe de quais interfaces le o transceiver antes de executar os
+comandos por interface. O padrao de cada coletor (RULE_* em cada script) pode ser
+substituido por regras em COLLECTOR_IF_RULES (JSON, padrao
+/etc/zabbix/interface_rules.json):
+
+  {
+    "default":   {...},
+    "scripts":   {"huawei_sw_sfp": {...}},
+    "templates": {"CWS - HUAWEI - SFP - SNMP": {...}},
+    "hosts":     {"SW-CORE-01": {...}}
+  }
+
+Campos de uma regra (regex com re.search; ausentes = sem filtro):
+  name / exclude_name        nome da interface
+  alias / exclude_alias      descricao
+  module / exclude_module    tipo da porta (prefixo do nome: 100GE, XGE, GigabitEthernet...)
+  phy                        lista de estados PHY aceitos (ex.: ["up"])
+  require_alias              true para ignorar interfaces sem descricao
+
+Precedencia (cada nivel sobrescreve so os campos que define): padrao do coletor,
+default, scripts, templates do host (banco do proxy, collector_items) e hosts. As
+regras sao compiladas uma vez por host/coletor.
+"""
+
+import json
+import os
+import re
+
+import collector_items
+
+RULES_FILE = os.environ.get("COLLECTOR_IF_RULES", "/etc/zabbix/interface_rules.json")
+PATTERN_FIELDS = ("name", "exclude_name", "alias", "exclude_alias", "module", "exclude_module")
+MODULE_RE = re.compile(r"^([A-Za-z0-9-]*?[A-Za-z-])(?=\d|\s|$)")
+
+_config = None
+_compiled = {}
+
+
+def _load():
+    global _config
+    if _config is None:
+        try:
+            with open(RULES_FILE) as f:
+                _config = json.load(f)
+        except FileNotFoundError:
+            _config = {}
+        except (OSError, ValueError) as e:
+            print(f"AVISO: Regras de interface ignoradas ({RULES_FILE}) - {str(e)}")
+            _config = {}
+    return _config
+
+
+def module_of(ifname):
+    """Tipo da porta a partir do nome (100GE0/1/0 -> 100GE, ten-gigabit-ethernet 1/1/1 -> ten-gigabit-ethernet)"""
+    match = MODULE_RE.match(ifname)
+    return match.group(1) if match else ifname
+
+
+def rule_for(hostname, script, default=None):
+    """Regra compilada do host/coletor"""
+    ident = (hostname, script, json.dumps(default, sort_keys=True))
+    if ident in _compiled:
+        return _compiled[ident]
+    config = _load()
+    rule = dict(default or {})
+    rule.update(config.get("default") or {})
+    rule.update((config.get("scripts") or {}).get(script) or {})
+    templates = config.get("templates") or {}
+    if templates:
+        for template in collector_items.templates(hostname):
+            rule.update(templates.get(template) or {})
+    rule.update((config.get("hosts") or {}).get(hostname) or {})
+
+    compiled = {field: re.compile(rule[field]) for field in PATTERN_FIELDS if rule.get(field)}
+    if rule.get("phy"):
+        compiled["phy"] = {state.lower() for state in rule["phy"]}
+    compiled["require_alias"] = bool(rule.get("require_alias"))
+    _compiled[ident] = compiled
+    return compiled
+
+
+def matches(rule, ifname, alias="", phy=None):
+    """True se a interface passa pela regra"""
+    alias = alias or ""
+    if rule["require_alias"] and not alias:
+        return False
+    if "phy" in rule and (phy or "").lower() not in rule["phy"]:
+        return False
+    for field, value in (("name", ifname), ("alias", alias), ("module", module_of(ifname))):
+        include = rule.get(field)
+        if include is not None and not include.search(value):
+            return False
+        exclude = rule.get(f"exclude_{field}")
+        if exclude is not None and exclude.search(value):
+            return False
+    return True
+
+
+def select(hostname, script, rows, default=None):
+    """Filtra (ifname, phy, alias) pela regra; retorna {ifname: alias} na ordem original"""
+    rule = rule_for(hostname, script, default)
+    return {ifname: alias for ifname, phy, alias in rows if matches(rule, ifname, alias, phy)}
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Itens ativos de cada host, lidos do banco de configuracao local do proxy
+
+Consulta somente leitura ao SQLite do proxy (tabelas items/hosts, ZBX_PROXY_DB,
+padrao /var/lib/zabbix/zabbix_proxy.db): keys dos itens trapper habilitados do
+host, incluindo regras de LLD e itens descobertos (prototipos ficam de fora). O
+resultado fica em cache por COLLECTOR_ITEMS_TTL segundos (padrao 300) em
+COLLECTOR_ITEMS_DIR (tmpfs, padrao /tmp/collector_items).
+
+Os coletores usam wants()/wants_prefix()/wants_param() para nao executar comandos
+nem interpretar saidas sem item correspondente, e zbx_sender descarta valores de
+keys inexistentes. Sem banco, host desconhecido ou COLLECTOR_ITEMS=0 nada e podado
+(retorno None). templates() lista os templates do host (regras de interface).
+"""
+
+import json
+import os
+import time
+
+import collector_replay
+
+DB_PATH = os.environ.get("ZBX_PROXY_DB", "/var/lib/zabbix/zabbix_proxy.db")
+CACHE_DIR = os.environ.get("COLLECTOR_ITEMS_DIR", "/tmp/collector_items")
+TTL = int(os.environ.get("COLLECTOR_ITEMS_TTL", "300"))
+ENABLED = os.environ.get("COLLECTOR_ITEMS", "1") != "0"
+
+ITEM_TYPE_TRAPPER = 2
+
+QUERY = (
+    "SELECT i.key_ FROM items i JOIN hosts h ON h.hostid = i.hostid "
+    "WHERE h.host = ? AND h.status = 0 AND i.status = 0 AND i.type = ? AND i.flags <> 2"
+)
+# Esquemas sem a coluna flags
+QUERY_NO_FLAGS = (
+    "SELECT i.key_ FROM items i JOIN hosts h ON h.hostid = i.hostid "
+    "WHERE h.host = ? AND h.status = 0 AND i.status = 0 AND i.type = ?"
+)
+# Templates vinculados ao host (recursivo)
+QUERY_TEMPLATES = (
+    "WITH RECURSIVE tpl(id) AS ("
+    "SELECT ht.templateid FROM hosts_templates ht JOIN hosts h ON h.hostid = ht.hostid WHERE h.host = ? "
+    "UNION SELECT ht.templateid FROM hosts_templates ht JOIN tpl ON ht.hostid = tpl.id) "
+    "SELECT h.host FROM hosts h JOIN tpl ON h.hostid = tpl.id"
+)
+
+# hostname -> set de keys ou None (memoria do processo)
+_keys = {}
+_params = {}
+_templates = {}
+
+
+def _cache_file(hostname):
+    safe = "".join(c if c.isalnum() or c in "-._" else "_" for c in hostname)
+    return os.path.join(CACHE_DIR, f"{safe}.json")
+
+
+def _execute(queries, params):
+    """Primeira coluna da primeira consulta aceita pelo esquema (None sem banco)"""
+    if not os.path.exists(DB_PATH):
+        return None
+    import sqlite3
+
+    try:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, timeout=1)
+    except sqlite3.Error:
+        return None
+    try:
+        for query in queries:
+            try:
+                return [row[0] for row in conn.execute(query, params).fetchall()]
+            except sqlite3.OperationalError:
+                continue
+    except sqlite3.Error:
+        pass
+    finally:
+        conn.close()
+    return None
+
+
+def _query(hostname):
+    """Keys do host no banco do proxy (None se o banco ou o host nao estao disponiveis)"""
+    return _execute((QUERY, QUERY_NO_FLAGS), (hostname, ITEM_TYPE_TRAPPER)) or None
+
+
+def active_keys(hostname):
+    """Conjunto de keys ativas do host, ou None quando nao ha informacao para podar"""
+    if not ENABLED or not hostname or collector_replay.replaying():
+        return None
+    if hostname in _keys:
+        return _keys[hostname]
+    path = _cache_file(hostname)
+    keys = None
+    try:
+        if time.time() - os.path.getmtime(path) < TTL:
+            with open(path) as f:
+                keys = json.load(f)
+            _keys[hostname] = set(keys) if keys else None
+            return _keys[hostname]
+    except (OSError, ValueError):
+        pass
+    keys = _query(hostname)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+            json.dump(keys, f)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+    except OSError:
+        pass
+    _keys[hostname] = set(keys) if keys else None
+    return _keys[hostname]
+
+
+def reset():
+    """Descarta o que esta em memoria (processos de longa duracao, ex.: huawei_telemetry)"""
+    _keys.clear()
+    _params.clear()
+    _templates.clear()
+
+
+def wants(hostname, key):
+    """True se o host tem item ativo para a key (ou se nao ha informacao)"""
+    keys = active_keys(hostname)
+    return keys is None or key in keys
+
+
+def wants_prefix(hostname, *prefixes):
+    """True se alguma key ativa do host comeca com um dos prefixos (ou sem informacao)"""
+    keys = active_keys(hostname)
+    if keys is None:
+        return True
+    return any(key.startswith(prefixes) for key in keys)
+
+
+def wants_param(hostname, param):
+    """True se alguma key ativa do host tem param como primeiro parametro (ex.: interface)"""
+    keys = active_keys(hostname)
+    if keys is None:
+        return True
+    if hostname not in _params:
+        params = set()
+        for key in keys:
+            start = key.find("[")
+            if start != -1 and key.endswith("]"):
+                params.add(key[start + 1:-1].split(",", 1)[0].strip('"'))
+        _params[hostname] = params
+    return param in _params[hostname]
+
+
+def templates(hostname):
+    """Nomes dos templates vinculados ao host (lista vazia sem banco)"""
+    if not ENABLED or not hostname:
+        return []
+    if hostname not in _templates:
+        _templates[hostname] = _execute((QUERY_TEMPLATES,), (hostname,)) or []
+    return _templates[hostname]
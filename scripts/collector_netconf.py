@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sessoes NETCONF (RFC 6241/6242) mantidas entre execucoes dos coletores
+
+Em vez de abrir uma sessao SSH por execucao e interpretar a saida renderizada da
+CLI, o coletor envia um <get> com filtro subtree so dos campos que le. A sessao
+fica aberta no processo residente (collector_netconf.py serve, socket Unix
+COLLECTOR_NETCONF_SOCKET, padrao /run/zabbix/collector_netconf.sock), com keepalive
+SSH, e e reaproveitada pelas execucoes seguintes do mesmo equipamento/usuario;
+sessoes sem uso por COLLECTOR_NETCONF_IDLE segundos (padrao 900) sao encerradas.
+Sem o processo residente, get() abre e fecha a sessao na propria execucao.
+
+Enquadramento: ]]>]]> (base:1.0) ou chunked (base:1.1, quando os dois lados
+anunciam). Os namespaces do filtro sao escritos como {modulo} e resolvidos pelo
+"?module=" das capacidades do hello, com fallback para os informados pelo coletor.
+
+Uso:
+  collector_netconf.py serve [--socket caminho]
+"""
+
+import json
+import logging
+import os
+import re
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from xml.sax.saxutils import escape, unescape
+
+import collector_replay
+import collector_ssh
+import collector_stats
+
+SOCKET_PATH = os.environ.get("COLLECTOR_NETCONF_SOCKET", "/run/zabbix/collector_netconf.sock")
+IDLE = int(os.environ.get("COLLECTOR_NETCONF_IDLE", "900"))
+KEEPALIVE = 30
+
+BASE_10 = "urn:ietf:params:netconf:base:1.0"
+BASE_11 = "urn:ietf:params:netconf:base:1.1"
+NS_NETCONF = "urn:ietf:params:xml:ns:netconf:base:1.0"
+EOM = b"]]>]]>"
+HELLO = (f'<?xml version="1.0" encoding="UTF-8"?><hello xmlns="{NS_NETCONF}"><capabilities>'
+         f'<capability>{BASE_10}</capability><capability>{BASE_11}</capability>'
+         f'</capabilities></hello>')
+CAPABILITY_RE = re.compile(r"<(?:\w+:)?capability>\s*([^<]+?)\s*</(?:\w+:)?capability>")
+MODULE_RE = re.compile(r"\{([A-Za-z][A-Za-z0-9_.-]*)\}")
+ERROR_RE = re.compile(r"<(?:\w+:)?error-message[^>]*>([^<]*)<", re.S)
+
+
+class NetconfError(Exception):
+    pass
+
+
+class Session:
+    """Sessao NETCONF sobre o subsistema "netconf" de uma sessao SSH"""
+
+    def __init__(self, ip, port, user, password, timeout=10):
+        self.transport = collector_ssh.open_transport(ip, port, user, password, timeout=timeout)
+        try:
+            self.transport.set_keepalive(KEEPALIVE)
+            self.channel = self.transport.open_session(timeout=timeout)
+            self.channel.settimeout(timeout)
+            self.channel.invoke_subsystem("netconf")
+            self.buffer = b""
+            self.chunked = False
+            self.message_id = 0
+            self._send(HELLO)
+            self.capabilities = [unescape(c) for c in CAPABILITY_RE.findall(self._read())]
+        except Exception:
+            self.transport.close()
+            raise
+        self.chunked = BASE_11 in self.capabilities and BASE_11 in HELLO
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def _send(self, xml):
+        data = xml.encode("utf-8")
+        if self.chunked:
+            self.channel.sendall(b"\n#%d\n" % len(data) + data + b"\n##\n")
+        else:
+            self.channel.sendall(data + EOM)
+
+    def _recv(self):
+        data = self.channel.recv(65536)
+        if not data:
+            raise NetconfError("sessao NETCONF encerrada pelo equipamento")
+        self.buffer += data
+
+    def _read(self):
+        """Proxima mensagem completa (]]>]]> ou chunked)"""
+        if not self.chunked:
+            while EOM not in self.buffer:
+                self._recv()
+            message, self.buffer = self.buffer.split(EOM, 1)
+            return message.decode("utf-8", "replace")
+        parts = []
+        while True:
+            while not re.match(rb"\s*\n#(\d+|#)\n", self.buffer):
+                self._recv()
+            header = re.match(rb"\s*\n#(\d+|#)\n", self.buffer)
+            if header.group(1) == b"#":
+                self.buffer = self.buffer[header.end():]
+                return b"".join(parts).decode("utf-8", "replace")
+            size = int(header.group(1))
+            while len(self.buffer) < header.end() + size:
+                self._recv()
+            parts.append(self.buffer[header.end():header.end() + size])
+            self.buffer = self.buffer[header.end() + size:]
+
+    def namespace(self, module):
+        """Namespace anunciado no hello para o modulo YANG (None se ausente)"""
+        for capability in self.capabilities:
+            uri, _, query = capability.partition("?")
+            if re.search(rf"(^|&)module={re.escape(module)}(&|$)", query):
+                return uri
+        return None
+
+    def rpc(self, body, timeout=30):
+        """Executa uma <rpc> e devolve o <rpc-reply> (NetconfError em <rpc-error>)"""
+        self.message_id += 1
+        self.channel.settimeout(timeout)
+        self._send(f'<?xml version="1.0" encoding="UTF-8"?>'
+                   f'<rpc message-id="{self.message_id}" xmlns="{NS_NETCONF}">{body}</rpc>')
+        reply = self._read()
+        self.last_used = time.monotonic()
+        if re.search(r"<(?:\w+:)?rpc-error\b", reply):
+            error = ERROR_RE.search(reply)
+            raise NetconfError(error.group(1).strip() if error else "rpc-error")
+        return reply
+
+    def get(self, subtree, namespaces=None, timeout=30):
+        """<get> com filtro subtree; {modulo} no filtro vira o namespace do modulo"""
+        def resolve(match):
+            uri = self.namespace(match.group(1)) or (namespaces or {}).get(match.group(1))
+            if uri is None:
+                raise NetconfError(f"namespace do modulo {match.group(1)} desconhecido")
+            return escape(uri, {'"': "&quot;"})
+        return self.rpc(f'<get><filter type="subtree">{MODULE_RE.sub(resolve, subtree)}</filter></get>', timeout)
+
+    def active(self):
+        return self.transport.is_active() and not self.channel.closed
+
+    def close(self):
+        try:
+            if self.active():
+                self.rpc("<close-session/>", timeout=5)
+        except Exception:
+            pass
+        self.transport.close()
+
+
+# --- processo residente --------------------------------------------------------
+
+_sessions = {}  # (ip, porta, usuario, senha) -> Session
+_sessions_lock = threading.Lock()
+
+
+def _session(ip, port, user, password):
+    """Sessao aberta do equipamento (cria se nao houver); retorna (sessao, reaproveitada)"""
+    key = (ip, str(port), user, password)
+    with _sessions_lock:
+        session = _sessions.get(key)
+    if session is not None and session.active():
+        return session, True
+    session = Session(ip, port, user, password)
+    with _sessions_lock:
+        old = _sessions.get(key)
+        _sessions[key] = session
+    if old is not None:
+        old.close()
+    logging.info(f"Sessao NETCONF aberta: {user}@{ip}:{port} ({'1.1' if session.chunked else '1.0'})")
+    return session, False
+
+
+def _drop(ip, port, user, password, session):
+    key = (ip, str(port), user, password)
+    with _sessions_lock:
+        if _sessions.get(key) is session:
+            del _sessions[key]
+    session.close()
+
+
+def handle_request(request):
+    """Executa o <get> na sessao mantida (nova tentativa com sessao nova se a antiga caiu)"""
+    args = (request["ip"], request["port"], request["user"], request["password"])
+    for attempt in (1, 2):
+        session, reused = _session(*args)
+        try:
+            with session.lock:
+                reply = session.get(request["subtree"], request.get("namespaces"), request.get("timeout", 30))
+            return {"reply": reply, "reused": reused}
+        except NetconfError as e:
+            if session.active():
+                return {"error": str(e)}
+            _drop(*args, session)
+            if not reused or attempt == 2:
+                return {"error": str(e)}
+        except Exception as e:
+            _drop(*args, session)
+            if not reused or attempt == 2:
+                return {"error": str(e)}
+    return {"error": "falha na sessao NETCONF"}
+
+
+def _read_message(sock):
+    header = b""
+    while len(header) < 4:
+        chunk = sock.recv(4 - len(header))
+        if not chunk:
+            raise ConnectionError("conexao encerrada")
+        header += chunk
+    size = struct.unpack("!I", header)[0]
+    payload = b""
+    while len(payload) < size:
+        chunk = sock.recv(min(65536, size - len(payload)))
+        if not chunk:
+            raise ConnectionError("mensagem incompleta")
+        payload += chunk
+    return json.loads(payload)
+
+
+def _write_message(sock, message):
+    payload = json.dumps(message).encode()
+    sock.sendall(struct.pack("!I", len(payload)) + payload)
+
+
+class Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            request = _read_message(self.request)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Requisicao recusada: {e}")
+            return
+        try:
+            reply = handle_request(request)
+        except Exception as e:
+            reply = {"error": str(e)}
+        try:
+            _write_message(self.request, reply)
+        except OSError:
+            pass
+
+
+def sweep():
+    """Encerra as sessoes sem uso ha mais de IDLE segundos (ou que cairam)"""
+    now = time.monotonic()
+    with _sessions_lock:
+        idle = [(key, s) for key, s in _sessions.items() if now - s.last_used > IDLE or not s.active()]
+        for key, _ in idle:
+            del _sessions[key]
+    for (ip, port, user, _), session in idle:
+        session.close()
+        logging.info(f"Sessao NETCONF encerrada: {user}@{ip}:{port}")
+
+
+def serve(path):
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    os.chmod(path, 0o600)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logging.info(f"Sessoes NETCONF em {path} (encerradas apos {IDLE}s sem uso)")
+    try:
+        while True:
+            time.sleep(30)
+            sweep()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        with _sessions_lock:
+            sessions = list(_sessions.values())
+            _sessions.clear()
+        for session in sessions:
+            session.close()
+    return 0
+
+
+# --- cliente (coletores) -------------------------------------------------------
+
+def _via_server(request, timeout):
+    """Resposta do processo residente, ou None se ele nao estiver no ar"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout + 15)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        sock.close()
+        return None
+    try:
+        _write_message(sock, request)
+        return _read_message(sock)
+    finally:
+        sock.close()
+
+
+def get(ip, port, user, password, subtree, namespaces=None, name="get", timeout=30):
+    """<get> com filtro subtree pela sessao mantida (ou sessao propria); devolve o XML"""
+    def fetch():
+        request = {"ip": ip, "port": port, "user": user, "password": password,
+                   "subtree": subtree, "namespaces": namespaces or {}, "timeout": timeout}
+        response = _via_server(request, timeout)
+        if response is None:
+            session = Session(ip, port, user, password)
+            try:
+                return session.get(subtree, namespaces, timeout)
+            finally:
+                session.close()
+        if "error" in response:
+            raise NetconfError(response["error"])
+        return response["reply"]
+
+    t0 = time.monotonic()
+    reply = collector_replay.capture("netconf", name, fetch)
+    stats = collector_stats.current()
+    if stats is not None:
+        stats.add_command(f"netconf {name}", time.monotonic() - t0, len(reply.encode("utf-8")))
+    return reply
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "serve":
+        print("Uso: collector_netconf.py serve [--socket caminho]", file=sys.stderr)
+        return 1
+    path = SOCKET_PATH
+    if len(sys.argv) > 3 and sys.argv[2] == "--socket":
+        path = sys.argv[3]
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    return serve(path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Saida JSON dos coletores para item mestre EXTERNAL (sem zabbix_sender)
+
+Ativacao:
+  - argumento extra "json" no fim da linha de comando (removido do argv antes do
+    coletor validar os parametros; pode vir antes de "profile")
+  - variavel de ambiente COLLECTOR_OUTPUT=json (todos os coletores)
+
+No modo JSON nenhum zabbix_sender e executado: os envios do coletor (valores,
+LLDs e auto-monitoramento collector.*) sao acumulados (zbx_sender.defer) e o
+stdout passa a ser um unico documento, valor do item mestre:
+
+  {"host": "<hostname>", "clock": <epoch>,
+   "lld": {"discovery_gbic": [{"{#IFNAME}": ...}, ...], ...},
+   "values": {"temp[100GE0/1/0]": "31", ...},
+   "messages": ["SUCESSO: ...", ...]}
+
+Itens dependentes usam JSONPath ($.values['<key>']) e as regras de LLD
+dependentes $.lld.<key>. As mensagens normais do coletor (stdout/stderr) vao
+em "messages"; o codigo de saida e preservado.
+
+Sem itens trapper no host o filtro de keys ativas (collector_items) nao se
+aplica e fica desligado nesse modo.
+
+Nos dois modos o resultado da execucao (valores e LLDs enviados ou impressos, com
+o horario da coleta) fica em COLLECTOR_RESULTS_DIR (tmpfs, padrao
+/tmp/collector_results/<host>/<coletor>.json), servido pelo collector_http.py.
+Execucoes sem nenhum valor alem do auto-monitoramento nao sobrescrevem o ultimo
+resultado. COLLECTOR_RESULTS=0 desliga.
+"""
+
+import io
+import json
+import os
+import sys
+import time
+
+import collector_items
+import collector_profile
+import collector_replay
+import zbx_sender
+
+ARGV_FLAG = "json"
+RESULTS = os.environ.get("COLLECTOR_RESULTS", "1") != "0"
+RESULTS_DIR = os.environ.get("COLLECTOR_RESULTS_DIR", "/tmp/collector_results")
+
+
+def _take_argv_flag():
+    """Remove o argumento extra 'json' (depois do hostname, argv[6]), se presente"""
+    for index in range(len(sys.argv) - 1, 6, -1):
+        if sys.argv[index].lower() == ARGV_FLAG:
+            del sys.argv[index]
+            return True
+    return False
+
+
+def enabled():
+    forced = _take_argv_flag()
+    return forced or os.environ.get("COLLECTOR_OUTPUT", "").lower() == ARGV_FLAG
+
+
+def document(hostname, lines, messages):
+    """Monta o documento do item mestre a partir das linhas -i acumuladas"""
+    lld = {}
+    values = {}
+    for line in lines:
+        fields = zbx_sender.split_line(line)
+        if not fields:
+            continue
+        key = zbx_sender._unquote(fields[1])
+        value = zbx_sender._unquote(fields[2])
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, dict) and isinstance(parsed.get("data"), list):
+            lld[key] = parsed["data"]
+        else:
+            values[key] = value
+    return {"host": hostname, "clock": int(time.time()), "lld": lld, "values": values,
+            "messages": messages}
+
+
+def safe_name(name):
+    return "".join(c if c.isalnum() or c in "-._" else "_" for c in name) or "_"
+
+
+def save_results(hostname, script, lines):
+    """Grava o resultado da execucao para o collector_http.py (escrita atomica)"""
+    if not RESULTS or not hostname or collector_replay.replaying():
+        return
+    doc = document(hostname, lines, [])
+    if not doc["lld"] and all(key.startswith("collector.") for key in doc["values"]):
+        return
+    del doc["messages"]
+    doc["script"] = script
+    directory = os.path.join(RESULTS_DIR, safe_name(hostname))
+    path = os.path.join(directory, f"{script}.json")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+            json.dump(doc, f, separators=(",", ":"))
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+    except OSError:
+        pass
+
+
+def run(main, script):
+    """Executa main() do coletor; no modo JSON imprime o documento em vez de enviar"""
+    hostname = sys.argv[6] if len(sys.argv) > 6 else ""
+    if not enabled():
+        try:
+            return collector_profile.run(main, script)
+        finally:
+            save_results(hostname, script, zbx_sender.sent_lines())
+
+    collector_items.ENABLED = False
+    stdout, stderr = sys.stdout, sys.stderr
+    captured = io.StringIO()
+    code = 0
+    zbx_sender.defer()
+    try:
+        sys.stdout = sys.stderr = captured
+        result = collector_profile.run(main, script)
+        code = result if isinstance(result, int) else 0
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code)
+            code = 1
+    except Exception as e:
+        print(f"ERRO: Falha na execucao - {str(e)}")
+        code = 1
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+    lines = zbx_sender.take_deferred()
+    save_results(hostname, script, lines)
+    messages = [line for line in captured.getvalue().splitlines() if line.strip()]
+    print(json.dumps(document(hostname, lines, messages), separators=(",", ":")))
+    sys.stdout.flush()
+    if code:
+        sys.exit(code)
+    return code
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profiling opcional (cProfile) das execucoes dos coletores
+
+Ativacao, sem alterar o template:
+  - variavel de ambiente COLLECTOR_PROFILE=1 (todos os coletores) ou
+    COLLECTOR_PROFILE=huawei_sw_sfp,SW-CORE-01 (apenas scripts/hosts listados)
+  - arquivo de controle /tmp/collector_profiles/ENABLE (mesmo formato, vazio = todos),
+    util para ligar/desligar sem reiniciar o proxy
+  - argumento extra "profile" no fim da linha de comando (removido do argv
+    antes do coletor validar os parametros)
+
+Cada execucao gera <dir>/<script>__<host>__<timestamp>_<pid>.prof no tmpfs /tmp.
+Apenas os PROFILE_KEEP arquivos mais recentes sao mantidos.
+
+Agregacao:
+  collector_profile.py top [script|host] [limite] [cumulative|tottime]
+  collector_profile.py list
+  collector_profile.py clean
+"""
+
+import glob
+import os
+import re
+import sys
+import time
+
+PROFILE_DIR = os.environ.get("COLLECTOR_PROFILE_DIR", "/tmp/collector_profiles")
+PROFILE_KEEP = int(os.environ.get("COLLECTOR_PROFILE_KEEP", "200"))
+ENABLE_FILE = os.path.join(PROFILE_DIR, "ENABLE")
+ARGV_FLAG = "profile"
+
+
+def _selection():
+    """Retorna a selecao configurada (None = desativado, set vazio = todos)"""
+    value = os.environ.get("COLLECTOR_PROFILE")
+    if value is None and os.path.exists(ENABLE_FILE):
+        try:
+            with open(ENABLE_FILE) as f:
+                value = f.read()
+        except OSError:
+            value = ""
+    if value is None:
+        return None
+    value = value.strip()
+    if value.lower() in ("0", "false", "no", "off"):
+        return None
+    if value.lower() in ("", "1", "true", "yes", "on", "all"):
+        return set()
+    return {v.strip() for v in value.split(",") if v.strip()}
+
+
+def _take_argv_flag():
+    """Remove o argumento extra 'profile' do argv, se presente"""
+    if len(sys.argv) > 1 and sys.argv[-1].lower() == ARGV_FLAG:
+        sys.argv.pop()
+        return True
+    return False
+
+
+def _safe(name):
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name or "unknown")[:64]
+
+
+def _prune():
+    """Mantem apenas os PROFILE_KEEP perfis mais recentes"""
+    files = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.prof")), key=os.path.getmtime)
+    for path in files[:max(0, len(files) - PROFILE_KEEP)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def run(main, script):
+    """Executa main() do coletor, com cProfile quando o profiling estiver ativo"""
+    forced = _take_argv_flag()
+    selection = set() if forced else _selection()
+    # argv[6] e o hostname no Zabbix em todos os coletores
+    hostname = sys.argv[6] if len(sys.argv) > 6 else ""
+    if selection is None or (selection and script not in selection and hostname not in selection):
+        return main()
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return main()
+    finally:
+        profiler.disable()
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(PROFILE_DIR, f"{script}__{_safe(hostname)}__{stamp}_{os.getpid()}.prof")
+            profiler.dump_stats(path)
+            _prune()
+        except Exception as e:
+            print(f"ERRO: Falha ao gravar profile - {str(e)}", file=sys.stderr)
+
+
+def profile_files(match=None):
+    files = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.prof")), key=os.path.getmtime)
+    if match:
+        files = [f for f in files if match in os.path.basename(f).split("__")[:2]]
+    return files
+
+
+def cmd_top(match=None, limit=30, sort="cumulative"):
+    """Agrega os perfis (todos ou de um script/host) e mostra as funcoes mais caras"""
+    files = profile_files(match)
+    if not files:
+        print(f"ERRO: Nenhum profile encontrado em {PROFILE_DIR}", file=sys.stderr)
+        return 1
+    import pstats
+
+    stats = pstats.Stats(files[0])
+    for path in files[1:]:
+        try:
+            stats.add(path)
+        except Exception as e:
+            print(f"ERRO: Profile invalido {path} - {str(e)}", file=sys.stderr)
+    print(f"Perfis agregados: {len(files)} ({match or 'todos'})")
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return 0
+
+
+def cmd_list():
+    listed = 0
+    for path in profile_files():
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            continue  # removido pela retencao de uma execucao concorrente
+        print(f"{size:9d}  {os.path.basename(path)}")
+        listed += 1
+    print(f"Total: {listed} perfis (limite {PROFILE_KEEP})")
+    return 0
+
+
+def cmd_clean():
+    removed = 0
+    for path in profile_files():
+        try:
+            os.remove(path)
+        except OSError:
+            continue  # ja removido pela retencao de uma execucao concorrente
+        removed += 1
+    print(f"SUCESSO: {removed} perfis removidos")
+    return 0
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: collector_profile.py <top|list|clean> [script|host] [limite] [cumulative|tottime]", file=sys.stderr)
+        return 1
+    action = sys.argv[1]
+    if action == "top":
+        args = sys.argv[2:]
+        match = None
+        limit = 30
+        sort = "cumulative"
+        for arg in args:
+            if arg.isdigit():
+                limit = int(arg)
+            elif arg in ("cumulative", "tottime", "calls", "ncalls"):
+                sort = arg
+            else:
+                match = arg
+        return cmd_top(match, limit, sort)
+    if action == "list":
+        return cmd_list()
+    if action == "clean":
+        return cmd_clean()
+    print("ERRO: Acao desconhecida. Use top, list ou clean.", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gravacao e replay da saida bruta dos equipamentos (SSH e SNMP)
+
+Gravacao (opcional): cada comando executado pelos coletores e gravado com horario
+e duracao em um arquivo gzip por execucao:
+  <COLLECTOR_RECORD_DIR>/<script>__<host>__<data>_<pid>.jsonl.gz
+O diretorio funciona como anel: ao passar de COLLECTOR_RECORD_MAX_MB as gravacoes
+mais antigas sao removidas. Senha (e comunidade SNMP) nao sao gravadas.
+
+  COLLECTOR_RECORD=1                           grava todas as execucoes
+  COLLECTOR_RECORD=huawei_sw_sfp,SW-CORE-01    apenas scripts/hosts listados
+  echo SW-CORE-01 > <dir>/ENABLE               liga sem reiniciar o proxy
+
+Replay: o coletor le as saidas gravadas em vez de abrir SSH/SNMP e envia os valores
+para um sink local (arquivo no formato do zabbix_sender -i), sem carregar os roteadores:
+  COLLECTOR_REPLAY=1             ultima gravacao do mesmo script/host (argv normal)
+  COLLECTOR_REPLAY=<arquivo>     gravacao especifica
+  COLLECTOR_REPLAY_SINK=<arq>    destino dos valores (padrao /tmp/collector_replay_sink.txt;
+                                 "zabbix" envia de fato via zabbix_sender; o sink e o
+                                 collector_sink.sh, com os argumentos do zabbix_sender)
+
+Uso:
+  collector_replay.py list [script|host]
+  collector_replay.py show <arquivo>
+  collector_replay.py run <arquivo> [--repeat N] [--sink arquivo]
+"""
+
+import glob
+import gzip
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+RECORD_DIR = os.environ.get("COLLECTOR_RECORD_DIR", "/var/lib/zabbix/collector_records")
+RECORD_MAX_MB = float(os.environ.get("COLLECTOR_RECORD_MAX_MB", "256"))
+ENABLE_FILE = os.path.join(RECORD_DIR, "ENABLE")
+DEFAULT_SINK = "/tmp/collector_replay_sink.txt"
+
+# Posicoes do argv com credenciais (mascaradas na gravacao)
+SECRET_ARGS = {5}
+SECRET_ARGS_BY_SCRIPT = {"datacom_sfp": {5, 7}}
+
+_lock = threading.Lock()
+_state = None  # configuracao da execucao corrente (resolvida no primeiro uso)
+
+
+class ReplayTransport:
+    """Substitui o paramiko.Transport durante o replay"""
+
+    def __init__(self, ip):
+        self.ip = ip
+
+    def is_active(self):
+        return True
+
+    def close(self):
+        pass
+
+
+def _safe(name):
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name or "unknown")[:64]
+
+
+def _selected(value, script, hostname):
+    """Avalia a selecao 1/all ou lista de scripts/hosts"""
+    if value is None:
+        return False
+    value = value.strip()
+    if value.lower() in ("0", "false", "no", "off"):
+        return False
+    if value.lower() in ("", "1", "true", "yes", "on", "all"):
+        return True
+    selection = {v.strip() for v in value.split(",") if v.strip()}
+    return script in selection or hostname in selection
+
+
+def _script_and_host():
+    script = os.path.basename(sys.argv[0]) if sys.argv else ""
+    script = script[:-3] if script.endswith(".py") else script
+    # argv[6] e o hostname no Zabbix em todos os coletores
+    hostname = sys.argv[6] if len(sys.argv) > 6 else ""
+    return script, hostname
+
+
+def _state_get():
+    global _state
+    if _state is not None:
+        return _state
+    script, hostname = _script_and_host()
+    state = {"mode": None, "script": script, "host": hostname}
+
+    replay = os.environ.get("COLLECTOR_REPLAY")
+    if replay and replay.lower() not in ("0", "false", "no", "off"):
+        path = replay if os.path.isfile(replay) else latest_recording(script, hostname)
+        state["mode"] = "replay"
+        state["path"] = path
+        state["outputs"] = load_outputs(path) if path else {}
+    else:
+        value = os.environ.get("COLLECTOR_RECORD")
+        if value is None and os.path.exists(ENABLE_FILE):
+            try:
+                with open(ENABLE_FILE) as f:
+                    value = f.read()
+            except OSError:
+                value = ""
+        if _selected(value, script, hostname):
+            state["mode"] = "record"
+            state["path"] = None
+    _state = state
+    return state
+
+
+def replaying():
+    return _state_get()["mode"] == "replay"
+
+
+def recording():
+    return _state_get()["mode"] == "record"
+
+
+def sink():
+    """Arquivo de destino dos valores em replay (None = zabbix_sender normal)"""
+    if not replaying():
+        return None
+    target = os.environ.get("COLLECTOR_REPLAY_SINK", DEFAULT_SINK)
+    return None if target.lower() == "zabbix" else target
+
+
+# ---------------------------------------------------------------------------
+# Gravacao
+# ---------------------------------------------------------------------------
+
+def _write(path, entry):
+    # Cada registro e um membro gzip independente: o arquivo continua legivel
+    # mesmo que o coletor seja encerrado no meio (timeout do Zabbix)
+    data = gzip.compress((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def _masked_argv(script):
+    secret = SECRET_ARGS_BY_SCRIPT.get(script, SECRET_ARGS)
+    return [("***" if i in secret else arg) for i, arg in enumerate(sys.argv[1:], start=1)]
+
+
+def _open_recording(state):
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(RECORD_DIR, f"{state['script']}__{_safe(state['host'])}__{stamp}_{os.getpid()}.jsonl.gz")
+    _write(path, {
+        "type": "run",
+        "script": state["script"],
+        "host": state["host"],
+        "argv": _masked_argv(state["script"]),
+        "started": time.time(),
+    })
+    state["path"] = path
+    prune()
+    return path
+
+
+def record(kind, command, output, seconds=0.0):
+    """Grava a saida de um comando (bytes ou texto) se a gravacao estiver ativa"""
+    state = _state_get()
+    if state["mode"] != "record":
+        return
+    entry = {"type": kind, "command": command, "ts": time.time(), "seconds": round(seconds, 6)}
+    if isinstance(output, bytes):
+        entry["output"] = output.decode("latin1")  # 1 byte -> 1 caractere, reversivel
+    else:
+        entry["text"] = output
+    try:
+        with _lock:
+            path = state["path"] or _open_recording(state)
+            _write(path, entry)
+    except Exception as e:
+        print(f"ERRO: Falha ao gravar saida - {str(e)}", file=sys.stderr)
+        state["mode"] = None
+
+
+def prune():
+    """Mantem o diretorio de gravacoes abaixo de COLLECTOR_RECORD_MAX_MB"""
+    files = sorted(glob.glob(os.path.join(RECORD_DIR, "*.jsonl.gz")), key=os.path.getmtime)
+    sizes = {path: os.path.getsize(path) for path in files}
+    total = sum(sizes.values())
+    limit = RECORD_MAX_MB * 1024 * 1024
+    for path in files[:-1]:
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= sizes[path]
+        except OSError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+def read_recording(path):
+    """Le os registros de uma gravacao (tolerante a arquivo truncado)"""
+    entries = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+    except (EOFError, OSError, ValueError):
+        pass
+    return entries
+
+
+def load_outputs(path):
+    """(tipo, comando) -> fila de saidas, na ordem em que foram gravadas"""
+    outputs = {}
+    for entry in read_recording(path):
+        if entry.get("type") == "run":
+            continue
+        if "output" in entry:
+            value = entry["output"].encode("latin1")
+        else:
+            value = entry.get("text", "")
+        outputs.setdefault((entry["type"], entry["command"]), deque()).append(value)
+    return outputs
+
+
+def replay(kind, command):
+    """Saida gravada para o comando; a ultima ocorrencia e repetida se houver mais chamadas"""
+    state = _state_get()
+    if not state.get("path"):
+        raise Exception(f"Nenhuma gravacao encontrada para {state['script']}/{state['host']}")
+    queue = state["outputs"].get((kind, command))
+    if not queue:
+        raise Exception(f"Comando nao gravado: {command}")
+    return queue.popleft() if len(queue) > 1 else queue[0]
+
+
+def capture(kind, command, fetch):
+    """Executa fetch() gravando a saida, ou devolve a saida gravada em modo replay"""
+    if replaying():
+        return replay(kind, command)
+    t0 = time.monotonic()
+    output = fetch()
+    record(kind, command, output, time.monotonic() - t0)
+    return output
+
+
+def recordings(match=None):
+    files = sorted(glob.glob(os.path.join(RECORD_DIR, "*.jsonl.gz")), key=os.path.getmtime)
+    if match:
+        files = [f for f in files if match in os.path.basename(f).split("__")[:2]]
+    return files
+
+
+def latest_recording(script, hostname):
+    files = [f for f in recordings(script) if os.path.basename(f).split("__")[1] == _safe(hostname)]
+    return files[-1] if files else None
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def cmd_list(match=None):
+    files = recordings(match)
+    for path in files:
+        print(f"{os.path.getsize(path):9d}  {os.path.basename(path)}")
+    total = sum(os.path.getsize(p) for p in files)
+    print(f"Gravacoes: {len(files)} ({total / 1024 / 1024:.1f} MB) em {RECORD_DIR}")
+    return 0
+
+
+def cmd_show(path):
+    entries = read_recording(path)
+    if not entries:
+        print(f"ERRO: Gravacao vazia ou invalida: {path}", file=sys.stderr)
+        return 1
+    for entry in entries:
+        if entry.get("type") == "run":
+            print(f"{entry['script']} {' '.join(entry.get('argv', []))}")
+            continue
+        size = len(entry.get("output", entry.get("text", "")))
+        print(f"  {entry['type']:4s} {entry.get('seconds', 0):7.3f}s {size:8d}B  {entry['command'][:100]}")
+    return 0
+
+
+def cmd_run(path, repeat=1, sink_path=None):
+    """Reexecuta o coletor da gravacao (mesmo argv, senha mascarada) em modo replay"""
+    entries = read_recording(path)
+    header = entries[0] if entries and entries[0].get("type") == "run" else None
+    if header is None:
+        print(f"ERRO: Gravacao sem cabecalho: {path}", file=sys.stderr)
+        return 1
+    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{header['script']}.py")
+    env = dict(os.environ)
+    env["COLLECTOR_REPLAY"] = os.path.abspath(path)
+    env["COLLECTOR_REPLAY_SINK"] = sink_path or DEFAULT_SINK
+    env.pop("COLLECTOR_RECORD", None)
+    elapsed = []
+    code = 0
+    for _ in range(max(1, repeat)):
+        t0 = time.monotonic()
+        result = subprocess.run([sys.executable, script_path, *header["argv"]], env=env,
+                                capture_output=repeat > 1, text=True)
+        elapsed.append(time.monotonic() - t0)
+        code = code or result.returncode
+    elapsed.sort()
+    print(f"Replay {header['script']} {header['host']}: {len(elapsed)} execucoes, "
+          f"min {elapsed[0]:.3f}s, mediana {elapsed[len(elapsed) // 2]:.3f}s, max {elapsed[-1]:.3f}s")
+    print(f"Valores gravados em {env['COLLECTOR_REPLAY_SINK']}")
+    return code
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip().split("Uso:")[1].rstrip(), file=sys.stderr)
+        return 1
+    command = sys.argv[1]
+    if command == "list":
+        return cmd_list(sys.argv[2] if len(sys.argv) > 2 else None)
+    if command == "show" and len(sys.argv) > 2:
+        return cmd_show(sys.argv[2])
+    if command == "run" and len(sys.argv) > 2:
+        repeat = 1
+        sink_path = None
+        args = sys.argv[3:]
+        for i in range(0, len(args) - 1, 2):
+            if args[i] == "--repeat":
+                repeat = int(args[i + 1])
+            elif args[i] == "--sink":
+                sink_path = args[i + 1]
+        return cmd_run(sys.argv[2], repeat, sink_path)
+    print(f"ERRO: Comando invalido: {command}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
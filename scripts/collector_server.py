@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor residente (forkserver) para os coletores executados como EXTERNAL check
+
+Mantem paramiko/cryptography e os modulos dos coletores ja importados. Cada execucao
+chega por um socket Unix a partir do cliente collector_client.py (instalado em
+externalscripts com o nome de cada coletor): o cliente envia argv/ambiente e seus
+descritores stdin/stdout/stderr (SCM_RIGHTS); o servidor faz fork, o filho executa
+o main() do coletor escrevendo direto no stdout do cliente e o codigo de saida
+volta pelo socket. Se o cliente morrer (timeout do Zabbix), o filho e encerrado.
+
+Uso:
+  collector_server.py [--socket /run/zabbix/collector_server.sock]
+                      [--dir /usr/lib/zabbix/collectors] [--max-children 300]
+"""
+
+import importlib
+import json
+import logging
+import os
+import selectors
+import signal
+import socket
+import struct
+import sys
+import time
+
+SOCKET_PATH = os.environ.get("COLLECTOR_SERVER_SOCKET", "/run/zabbix/collector_server.sock")
+COLLECTOR_DIR = os.environ.get("COLLECTOR_DIR", os.path.dirname(os.path.abspath(__file__)))
+MAX_CHILDREN = 300
+
+# Coletores pre-carregados (demais scripts do diretorio sao executados via runpy)
+COLLECTORS = ("huawei_sfp", "huawei_sw_sfp", "huawei_bgp", "huawei_health", "datacom_sfp", "huawei_poll")
+HEAVY_MODULES = ("paramiko", "cryptography", "json", "re", "subprocess", "sqlite3")
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+# mtime dos modulos carregados no servidor (para recarregar no filho se mudarem)
+_loaded = {}
+# pid do filho -> conexao do cliente
+_children = {}
+
+
+def preload():
+    """Importa dependencias pesadas e os coletores uma unica vez"""
+    sys.path.insert(0, COLLECTOR_DIR)
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logging.warning(f"Modulo {name} nao carregado: {e}")
+    for name in COLLECTORS:
+        path = os.path.join(COLLECTOR_DIR, f"{name}.py")
+        if not os.path.exists(path):
+            continue
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logging.warning(f"Coletor {name} nao carregado: {e}")
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if name != "__main__" and path and os.path.dirname(os.path.abspath(path)) == COLLECTOR_DIR:
+            _loaded[name] = os.path.getmtime(path)
+    logging.info(f"Modulos pre-carregados: {', '.join(sorted(_loaded))}")
+
+
+def _refresh_modules():
+    """No filho: recarrega modulos do diretorio de coletores alterados em disco"""
+    for name, mtime in _loaded.items():
+        module = sys.modules.get(name)
+        try:
+            if module is not None and os.path.getmtime(module.__file__) != mtime:
+                importlib.reload(module)
+        except Exception:
+            pass
+
+
+def _read_request(conn):
+    """Le <tamanho><json> e os descritores enviados junto (stdin, stdout, stderr)"""
+    msg, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+    if len(msg) < 4 or len(fds) != 3:
+        for fd in fds:
+            os.close(fd)
+        raise ValueError("requisicao invalida")
+    size = struct.unpack("!I", msg[:4])[0]
+    payload = msg[4:]
+    while len(payload) < size:
+        chunk = conn.recv(size - len(payload))
+        if not chunk:
+            raise ValueError("requisicao incompleta")
+        payload += chunk
+    return json.loads(payload), fds
+
+
+def run_child(request, fds, listener):
+    """Executado no processo filho: assume os descritores do cliente e roda o coletor"""
+    code = 1
+    try:
+        listener.close()
+        os.setpgid(0, 0)
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        os.environ.clear()
+        os.environ.update(request.get("env") or {})
+        try:
+            os.chdir(request.get("cwd") or "/")
+        except OSError:
+            pass
+        _refresh_modules()
+
+        script = request["script"]
+        name = script[:-3] if script.endswith(".py") else script
+        sys.argv = [os.path.join(COLLECTOR_DIR, f"{name}.py")] + list(request.get("argv") or [])
+        module = sys.modules.get(name)
+        if module is not None and hasattr(module, "main"):
+            import collector_output
+            result = collector_output.run(module.main, name)
+        else:
+            import runpy
+            runpy.run_path(sys.argv[0], run_name="__main__")
+            result = 0
+        code = result if isinstance(result, int) else 0
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        print(f"ERRO: Falha na execucao do processo - {str(e)}", file=sys.stderr)
+        code = 1
+    finally:
+        try:
+            # os._exit nao executa atexit: grava aqui os valores pendentes do spool
+            import collector_spool
+            collector_spool.flush()
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        os._exit(code)
+
+
+def _finish(pid, code):
+    conn = _children.pop(pid, None)
+    if conn is None:
+        return
+    try:
+        conn.sendall(f"{code}\n".encode())
+    except OSError:
+        pass
+    conn.close()
+
+
+def reap(selector):
+    while _children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        conn = _children.get(pid)
+        if conn is not None and conn.fileno() >= 0:
+            try:
+                selector.unregister(conn)
+            except KeyError:
+                pass  # ja removida em handle_client_closed
+        _finish(pid, os.waitstatus_to_exitcode(status))
+
+
+def handle_accept(listener, selector):
+    conn, _ = listener.accept()
+    conn.settimeout(5)
+    try:
+        request, fds = _read_request(conn)
+    except Exception as e:
+        logging.warning(f"Requisicao recusada: {e}")
+        conn.close()
+        return
+    if len(_children) >= MAX_CHILDREN:
+        for fd in fds:
+            os.close(fd)
+        conn.sendall(b"busy\n")
+        conn.close()
+        return
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        selector.close()
+        for other in _children.values():
+            other.close()
+        conn.close()
+        run_child(request, fds, listener)
+    for fd in fds:
+        os.close(fd)
+    conn.setblocking(False)
+    _children[pid] = conn
+    selector.register(conn, selectors.EVENT_READ, pid)
+
+
+def handle_client_closed(conn, pid, selector):
+    """Cliente encerrou antes do fim (ex.: timeout do Zabbix) - encerra o filho"""
+    try:
+        if conn.recv(1):
+            return
+    except BlockingIOError:
+        return
+    except OSError:
+        pass
+    selector.unregister(conn)
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def parse_args(argv):
+    global SOCKET_PATH, COLLECTOR_DIR, MAX_CHILDREN
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--socket" and i + 1 < len(argv):
+            SOCKET_PATH = argv[i + 1]
+        elif argv[i] == "--dir" and i + 1 < len(argv):
+            COLLECTOR_DIR = os.path.abspath(argv[i + 1])
+        elif argv[i] == "--max-children" and i + 1 < len(argv):
+            MAX_CHILDREN = int(argv[i + 1])
+        else:
+            print("Uso: collector_server.py [--socket caminho] [--dir diretorio] [--max-children N]", file=sys.stderr)
+            sys.exit(1)
+        i += 2
+
+
+def main():
+    parse_args(sys.argv[1:])
+    started = time.monotonic()
+    preload()
+
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(SOCKET_PATH)
+    os.chmod(SOCKET_PATH, 0o600)
+    listener.listen(512)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ, None)
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    logging.info(f"Servidor de coletores pronto em {SOCKET_PATH} ({time.monotonic() - started:.2f}s de carga)")
+
+    try:
+        while not stop:
+            for key, _ in selector.select(timeout=0.05):
+                if key.data is None:
+                    try:
+                        handle_accept(listener, selector)
+                    except OSError as e:
+                        logging.warning(f"Falha ao aceitar conexao: {e}")
+                else:
+                    handle_client_closed(key.fileobj, key.data, selector)
+            reap(selector)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        if os.path.exists(SOCKET_PATH):
+            os.unlink(SOCKET_PATH)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
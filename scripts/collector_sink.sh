@@ -0,0 +1,26 @@
+#!/bin/sh
+# Sink local do replay (collector_replay.py): aceita os argumentos do zabbix_sender
+# e acrescenta as linhas "<host> <key> <value>" ao arquivo informado.
+# Uso: collector_sink.sh <arquivo> [-z server -p port] (-s host -k key -o value | -i -)
+
+out="$1"
+shift
+host=""; key=""; value=""; from_stdin=""
+while [ $# -gt 1 ]; do
+    case "$1" in
+        -s) host="$2" ;;
+        -k) key="$2" ;;
+        -o) value="$2" ;;
+        -i) from_stdin=1 ;;
+    esac
+    shift 2
+done
+
+if [ -n "$from_stdin" ]; then
+    n=$(grep . | tee -a "$out" | wc -l)
+else
+    printf '%s %s %s\n' "$host" "$key" "$value" >> "$out"
+    n=1
+fi
+echo "Response from \"sink:$out\": \"processed: $n; failed: 0; total: $n; seconds spent: 0.000000\""
+echo "sent: $n; skipped: 0; total: $n"
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Spool em disco dos valores que nao chegaram ao trapper
+
+Quando o zabbix_sender falha sem resposta do trapper (proxy reiniciando ou
+sobrecarregado) os coletores entregam as linhas a add(), que guarda cada valor com
+o clock/ns original. No fim da execucao flush() grava um segmento por processo em
+COLLECTOR_SPOOL_DIR (volume persistente, padrao /var/lib/zabbix/spool) com um
+unico fsync; acima de COLLECTOR_SPOOL_MAX_MB (padrao 64) os segmentos mais antigos
+sao descartados.
+
+drain (cron a cada minuto, pelo collector-cron, que carrega o ambiente do container
+gravado em /etc/zabbix/collector.env) reenvia os segmentos em ordem com zabbix_sender -T -N,
+em blocos de CHUNK linhas e no maximo COLLECTOR_SPOOL_RATE valores/s. Se o trapper
+continua fora, o restante fica para a proxima execucao.
+
+Uso:
+  collector_spool.py drain [--rate N]
+  collector_spool.py status
+"""
+
+import atexit
+import fcntl
+import os
+import subprocess
+import sys
+import time
+
+SPOOL_DIR = os.environ.get("COLLECTOR_SPOOL_DIR", "/var/lib/zabbix/spool")
+MAX_BYTES = int(float(os.environ.get("COLLECTOR_SPOOL_MAX_MB", "64")) * 1024 * 1024)
+RATE = int(os.environ.get("COLLECTOR_SPOOL_RATE", "500"))
+ENABLED = os.environ.get("COLLECTOR_SPOOL", "1") != "0"
+CHUNK = 250
+FLUSH_LINES = 5000
+DRAIN_SECONDS = 50
+
+# Linhas "<host> <key> <clock> <ns> <value>" aguardando flush
+_pending = []
+_atexit = False
+
+
+def add(lines, clock_ns=None):
+    """Guarda linhas no formato do zabbix_sender -i com o clock/ns informado (ou agora)"""
+    global _atexit
+    if not ENABLED:
+        return
+    import zbx_sender
+
+    clock, ns = divmod(clock_ns or time.time_ns(), 1000000000)
+    for line in lines:
+        fields = zbx_sender.split_line(line)
+        if fields:
+            _pending.append(f"{fields[0]} {fields[1]} {clock} {ns} {fields[2]}")
+    if not _atexit:
+        # Execucao direta; no servidor residente o filho chama flush() antes de os._exit
+        atexit.register(flush)
+        _atexit = True
+    if len(_pending) >= FLUSH_LINES:
+        flush()
+
+
+def segments():
+    """Segmentos do spool, do mais antigo ao mais recente"""
+    try:
+        return sorted(os.path.join(SPOOL_DIR, n) for n in os.listdir(SPOOL_DIR) if n.endswith(".seg"))
+    except OSError:
+        return []
+
+
+def flush():
+    """Grava as linhas pendentes em um novo segmento (um fsync por segmento)"""
+    if not _pending:
+        return 0
+    lines = list(_pending)
+    del _pending[:]
+    path = os.path.join(SPOOL_DIR, f"{time.time_ns():020d}_{os.getpid()}.seg")
+    try:
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+        _enforce_cap()
+    except OSError as e:
+        print(f"ERRO: Falha ao gravar spool - {str(e)}", file=sys.stderr)
+        return 0
+    return len(lines)
+
+
+def _enforce_cap():
+    files = segments()
+    sizes = {}
+    for path in files:
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError:
+            sizes[path] = 0
+    total = sum(sizes.values())
+    for path in files:
+        if total <= MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= sizes[path]
+
+
+def _send_chunk(lines):
+    """True se o trapper respondeu (mesmo com valores recusados); False se fora"""
+    import zbx_sender
+
+    try:
+        result = subprocess.run([*zbx_sender.sender_command(), "-T", "-N", "-i", "-"],
+                                input="\n".join(lines), capture_output=True, timeout=30, text=True)
+    except Exception:
+        return False
+    return not zbx_sender.trapper_unreachable(result)
+
+
+def _rewrite(path, lines):
+    with open(f"{path}.tmp", "w") as f:
+        f.write("\n".join(lines) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+
+def drain(rate=RATE):
+    """Reenvia os segmentos em ordem; retorna (valores enviados, valores restantes)"""
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    lock = open(os.path.join(SPOOL_DIR, ".lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    sent = 0
+    started = time.monotonic()
+    try:
+        for path in segments():
+            with open(path) as f:
+                lines = [line for line in f.read().splitlines() if line]
+            done = 0
+            while done < len(lines):
+                chunk = lines[done:done + CHUNK]
+                if time.monotonic() - started > DRAIN_SECONDS or not _send_chunk(chunk):
+                    if done:
+                        _rewrite(path, lines[done:])
+                    return sent, count()
+                done += len(chunk)
+                sent += len(chunk)
+                # Limite de taxa: no maximo rate valores por segundo
+                wait = sent / float(rate) - (time.monotonic() - started)
+                if wait > 0:
+                    time.sleep(wait)
+            os.remove(path)
+        return sent, 0
+    finally:
+        lock.close()
+
+
+def count():
+    """Quantidade de valores no spool"""
+    total = 0
+    for path in segments():
+        try:
+            with open(path) as f:
+                total += sum(1 for line in f if line.strip())
+        except OSError:
+            pass
+    return total
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("drain", "status"):
+        print("Uso: collector_spool.py <drain [--rate N]|status>", file=sys.stderr)
+        return 1
+    if sys.argv[1] == "status":
+        files = segments()
+        size = sum(os.path.getsize(p) for p in files if os.path.exists(p))
+        print(f"{len(files)} segmentos, {count()} valores, {size / 1024.0:.1f} KB em {SPOOL_DIR}")
+        return 0
+    rate = RATE
+    if "--rate" in sys.argv:
+        idx = sys.argv.index("--rate")
+        if idx + 1 < len(sys.argv):
+            rate = max(1, int(sys.argv[idx + 1]))
+    result = drain(rate)
+    if result is None:
+        print("AVISO: drain ja em execucao")
+        return 0
+    sent, remaining = result
+    if remaining:
+        print(f"PARCIAL: {sent} valores reenviados, {remaining} aguardando o trapper")
+        return 1
+    if sent:
+        print(f"SUCESSO: {sent} valores reenviados do spool")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Camada SSH compartilhada pelos coletores
+
+Abre a sessao em duas etapas (TCP + handshake e autenticacao) para que o tempo de
+connect e de auth sejam medidos separadamente em collector_stats, e executa comandos
+em canais exec registrando duracao e bytes de cada comando.
+
+paramiko so e importado ao abrir a primeira sessao: caminhos que terminam antes
+(uso incorreto, macro nao resolvida) nao pagam o custo de importacao.
+
+exec_parallel executa comandos independentes em varios canais simultaneos da
+mesma sessao autenticada (COLLECTOR_SSH_CHANNELS, padrao 4). Quando o equipamento
+recusa um canal adicional, a concorrencia e reduzida ate o limite aceito.
+
+Com gravacao ativa (collector_replay) a saida de cada comando e gravada; em modo
+replay nenhuma conexao e aberta e as saidas vem da gravacao.
+
+Dentro de shared_session() (coletor combinado huawei_poll) open_transport devolve
+sempre a mesma sessao autenticada do equipamento, close() dos coletores e ignorado
+e comandos repetidos entre os dominios sao executados uma unica vez.
+"""
+
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import collector_replay
+import collector_stats
+
+MAX_CHANNELS = int(os.environ.get("COLLECTOR_SSH_CHANNELS", "4"))
+
+# Sessao compartilhada corrente: {"key": (ip, port, user), "transport", "outputs": {comando: bytes}}
+_shared = None
+
+
+class _RefusedChannelFilter(logging.Filter):
+    """Omite o log do paramiko para canais recusados (tratados em exec_parallel)"""
+
+    def filter(self, record):
+        return "open FAILED" not in record.getMessage()
+
+
+logging.getLogger("paramiko.transport").addFilter(_RefusedChannelFilter())
+
+
+class _SharedTransport:
+    """Sessao compartilhada entregue aos coletores: close() so no fim de shared_session()"""
+
+    def __init__(self, transport):
+        self._transport = transport
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._transport, name)
+
+
+@contextmanager
+def shared_session():
+    """Uma unica sessao SSH (e saidas reaproveitadas) para todos os coletores do bloco"""
+    global _shared
+    _shared = {"key": None, "transport": None, "outputs": {}}
+    try:
+        yield
+    finally:
+        if _shared["transport"] is not None:
+            _shared["transport"].close()
+        _shared = None
+
+
+def open_transport(ip, port, user, password, timeout=10, banner_timeout=None):
+    """Conecta e autentica, retornando um paramiko.Transport pronto para exec"""
+    if collector_replay.replaying():
+        return collector_replay.ReplayTransport(ip)
+    if _shared is None:
+        return _open_transport(ip, port, user, password, timeout, banner_timeout)
+    key = (ip, str(port), user)
+    transport = _shared["transport"]
+    if _shared["key"] != key or transport is None or not transport.is_active():
+        if transport is not None:
+            transport.close()
+        _shared["transport"] = None
+        _shared["transport"] = _open_transport(ip, port, user, password, timeout, banner_timeout)
+        _shared["key"] = key
+    return _SharedTransport(_shared["transport"])
+
+
+def _open_transport(ip, port, user, password, timeout, banner_timeout):
+    import paramiko
+
+    with collector_stats.stage("connect"):
+        sock = socket.create_connection((ip, int(port)), timeout=timeout)
+        transport = paramiko.Transport(sock)
+        if banner_timeout:
+            transport.banner_timeout = banner_timeout
+        try:
+            transport.start_client(timeout=timeout)
+        except Exception:
+            transport.close()
+            raise
+    with collector_stats.stage("auth"):
+        try:
+            transport.auth_password(user, password)
+        except Exception:
+            transport.close()
+            raise
+    return transport
+
+
+def _run_channel(transport, command, timeout, with_stderr):
+    channel = transport.open_session(timeout=timeout)
+    try:
+        channel.settimeout(timeout)
+        channel.exec_command(command)
+        stdout = channel.makefile("rb", -1).read()
+        stderr = channel.makefile_stderr("rb", -1).read() if with_stderr else b""
+    finally:
+        channel.close()
+    return stdout, stderr
+
+
+def exec_command(transport, command, timeout=None, with_stderr=False):
+    """Executa um comando em um canal exec e retorna a saida bruta (bytes)"""
+    if _shared is not None and command in _shared["outputs"] and not with_stderr:
+        return _shared["outputs"][command]
+    t0 = time.monotonic()
+    if collector_replay.replaying():
+        stdout, stderr = collector_replay.replay("ssh", command), b""
+    else:
+        stdout, stderr = _run_channel(transport, command, timeout, with_stderr)
+        collector_replay.record("ssh", command, stdout, time.monotonic() - t0)
+    stats = collector_stats.current()
+    if stats is not None:
+        stats.add_command(command, time.monotonic() - t0, len(stdout))
+    if _shared is not None:
+        _shared["outputs"][command] = stdout
+    if with_stderr:
+        return stdout, stderr
+    return stdout
+
+
+def exec_parallel(transport, commands, timeout=None, max_channels=None):
+    """Executa comandos independentes em canais simultaneos da mesma sessao
+
+    commands: dict nome -> comando. Retorna (resultados, erros), ambos indexados pelo
+    nome: saida bruta (bytes) dos comandos concluidos e a excecao dos que falharam.
+    """
+    if _shared is not None:
+        # Comandos ja executados na sessao compartilhada por outro dominio
+        done = {name: _shared["outputs"][command] for name, command in commands.items()
+                if command in _shared["outputs"]}
+        if done:
+            results, errors = exec_parallel(transport, {name: command for name, command in commands.items()
+                                                        if name not in done}, timeout, max_channels)
+            results.update(done)
+            return results, errors
+    if not commands:
+        return {}, {}
+    if collector_replay.replaying():
+        results = {}
+        errors = {}
+        for name, command in commands.items():
+            try:
+                results[name] = exec_command(transport, command, timeout=timeout)
+            except Exception as e:
+                errors[name] = e
+        return results, errors
+
+    import paramiko
+
+    pending = queue.Queue()
+    for name, command in commands.items():
+        pending.put((name, command))
+    results = {}
+    errors = {}
+    refused = set()
+    timings = {}  # nome -> segundos
+    lock = threading.Lock()
+    workers = max(1, min(max_channels or MAX_CHANNELS, len(commands)))
+    active = [workers]
+
+    def worker():
+        while True:
+            with lock:
+                try:
+                    name, command = pending.get_nowait()
+                except queue.Empty:
+                    active[0] -= 1
+                    return
+            t0 = time.monotonic()
+            try:
+                stdout, _ = _run_channel(transport, command, timeout, False)
+            except paramiko.ChannelException as e:
+                # Canal recusado (limite de sessoes do equipamento): devolve o comando
+                # e encerra este worker; o ultimo worker tenta mais uma vez sozinho
+                with lock:
+                    if active[0] > 1:
+                        active[0] -= 1
+                        pending.put((name, command))
+                        return
+                    if name not in refused:
+                        refused.add(name)
+                        pending.put((name, command))
+                    else:
+                        errors[name] = e
+                continue
+            except Exception as e:
+                with lock:
+                    errors[name] = e
+                continue
+            with lock:
+                results[name] = stdout
+                timings[name] = time.monotonic() - t0
+
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers - 1)]
+    for thread in threads:
+        thread.start()
+    worker()
+    for thread in threads:
+        thread.join()
+
+    stats = collector_stats.current()
+    if stats is not None:
+        # Tempo de parede na etapa command; duracao individual em cada comando
+        for name, seconds in timings.items():
+            stats.add_command(commands[name], seconds, len(results[name]), charge=False)
+        stats.add_stage_time("command", time.monotonic() - t0)
+    for name, seconds in timings.items():
+        collector_replay.record("ssh", commands[name], results[name], seconds)
+    if _shared is not None:
+        _shared["outputs"].update((commands[name], output) for name, output in results.items())
+    return results, errors
+
+
+def run_command(ip, port, user, password, command, timeout=10, command_timeout=None, banner_timeout=None):
+    """Abre uma sessao, executa um unico comando e fecha a sessao"""
+    transport = open_transport(ip, port, user, password, timeout=timeout, banner_timeout=banner_timeout)
+    try:
+        return exec_command(transport, command, timeout=command_timeout)
+    finally:
+        transport.close()
+
+
+def decode_output(raw):
+    """Decodifica saida do equipamento (utf-8 com fallback para latin1)"""
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("latin1")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentacao por etapa dos coletores SSH
+
+Cada execucao de coletor mede as etapas connect, auth, command, parse, lld e send,
+alem de bytes recebidos do equipamento e quantidade de valores enviados. No fim da
+execucao os numeros sao enviados como itens trapper de auto-monitoramento do proprio
+host, em um lote proprio depois dos dados (collector.values conta os valores
+aceitos pelo trapper).
+
+Itens enviados (script = nome do coletor sem .py):
+  collector.time[<script>,<etapa>]   segundos gastos em cada etapa
+  collector.time[<script>,total]     tempo total da execucao
+  collector.command.max[<script>]    comando mais lento (segundos)
+  collector.commands[<script>]       quantidade de comandos executados
+  collector.bytes[<script>]          bytes recebidos do equipamento
+  collector.bytes.unfiltered[<script>]  bytes estimados sem os filtros VRP (collector_filters)
+  collector.values[<script>]         valores enviados ao Zabbix
+  collector.skipped[<script>]        valores nao enviados (key marcada como inexistente)
+  benchmark_discovery                tempo total (apenas coletores SFP em launch_discovery)
+"""
+
+import time
+from contextlib import contextmanager
+
+import zbx_sender
+
+STAGES = ("connect", "auth", "command", "parse", "lld", "send")
+
+# Estatisticas da execucao corrente (uma execucao por processo)
+_current = None
+
+
+class RunStats:
+    """Acumula tempos por etapa, bytes e valores de uma execucao"""
+
+    def __init__(self, hostname, script, benchmark_key=None):
+        self.hostname = hostname
+        self.script = script
+        self.benchmark_key = benchmark_key
+        self.started = time.monotonic()
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.commands = []  # (comando, segundos, bytes)
+        self.bytes_in = 0
+        self.values = 0
+        self.skipped = 0  # valores de keys marcadas como inexistentes (zbx_sender)
+        self.filtered = []  # (comando, bytes sem filtro, bytes com filtro)
+        self._stack = []  # [nome, tempo gasto em etapas internas]
+
+    @contextmanager
+    def stage(self, name):
+        """Mede uma etapa - o tempo de etapas internas e descontado da externa"""
+        frame = [name, 0.0]
+        self._stack.append(frame)
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            spent = time.monotonic() - t0
+            self._stack.pop()
+            self._charge(name, spent - frame[1], spent)
+
+    def _charge(self, name, own, spent):
+        self.stages[name] = self.stages.get(name, 0.0) + own
+        if self._stack:
+            self._stack[-1][1] += spent
+
+    def add_command(self, command, seconds, nbytes, charge=True):
+        self.commands.append((command, seconds, nbytes))
+        self.bytes_in += nbytes
+        if charge:
+            self._charge("command", seconds, seconds)
+
+    def add_stage_time(self, name, seconds):
+        """Soma tempo de parede a uma etapa (ex.: comandos em canais paralelos)"""
+        self._charge(name, seconds, seconds)
+
+    def add_filtered(self, command, before, after):
+        """Registra o tamanho da saida com e sem o filtro VRP"""
+        self.filtered.append((command, before, after))
+
+    def add_values(self, count=1):
+        self.values += count
+
+    def add_skipped(self, count=1):
+        self.skipped += count
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def items(self):
+        """Retorna lista (key, value) dos itens de auto-monitoramento"""
+        total = self.elapsed()
+        items = [(f"collector.time[{self.script},{name}]", f"{self.stages[name]:.3f}") for name in STAGES]
+        items.append((f"collector.time[{self.script},total]", f"{total:.3f}"))
+        slowest = max((c[1] for c in self.commands), default=0.0)
+        items.append((f"collector.command.max[{self.script}]", f"{slowest:.3f}"))
+        items.append((f"collector.commands[{self.script}]", str(len(self.commands))))
+        items.append((f"collector.bytes[{self.script}]", str(self.bytes_in)))
+        if self.filtered:
+            saved = sum(before - after for _, before, after in self.filtered)
+            items.append((f"collector.bytes.unfiltered[{self.script}]", str(self.bytes_in + saved)))
+        items.append((f"collector.values[{self.script}]", str(self.values)))
+        items.append((f"collector.skipped[{self.script}]", str(self.skipped)))
+        if self.benchmark_key:
+            items.append((self.benchmark_key, f"{total:.3f}"))
+        return items
+
+    def summary(self):
+        """Resumo textual para modo debug"""
+        parts = [f"{name}={self.stages[name]:.2f}s" for name in STAGES]
+        lines = [f"Etapas: {' '.join(parts)} total={self.elapsed():.2f}s "
+                 f"bytes={self.bytes_in} valores={self.values} ignorados={self.skipped}"]
+        for command, seconds, nbytes in self.commands:
+            lines.append(f"  {seconds:6.2f}s {nbytes:8d}B  {command}")
+        for command, before, after in self.filtered:
+            lines.append(f"  filtro VRP: {before:8d}B -> {after:8d}B  {command}")
+        return "\n".join(lines)
+
+
+def begin(hostname, script, benchmark_key=None):
+    """Inicia as estatisticas da execucao corrente"""
+    global _current
+    _current = RunStats(hostname, script, benchmark_key)
+    return _current
+
+
+def resume(run):
+    """Volta a uma execucao iniciada antes (coleta combinada, apos os dominios)"""
+    global _current
+    _current = run
+
+
+def current():
+    """Estatisticas da execucao corrente (None se o coletor nao iniciou)"""
+    return _current
+
+
+@contextmanager
+def stage(name):
+    """Atalho para medir uma etapa na execucao corrente - no-op sem begin()"""
+    if _current is None:
+        yield
+    else:
+        with _current.stage(name):
+            yield
+
+
+def add_values(count=1):
+    if _current is not None:
+        _current.add_values(count)
+
+
+def add_skipped(count=1):
+    if _current is not None:
+        _current.add_skipped(count)
+
+
+def trapper_lines():
+    """Linhas no formato do zabbix_sender -i para anexar ao lote de dados"""
+    if _current is None:
+        return []
+    return [zbx_sender.format_line(_current.hostname, key, value) for key, value in _current.items()]
+
+
+def finish(extra_lines=None):
+    """Envia os itens de auto-monitoramento (e linhas extras) em um unico lote"""
+    lines = list(extra_lines or []) + trapper_lines()
+    if not lines:
+        return False
+    return zbx_sender.send_lines(lines)
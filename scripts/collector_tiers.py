@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Classes de metricas com intervalos proprios dentro de cada execucao dos coletores
+
+  slow    ambiente (display power, display fan, power-supply)     COLLECTOR_TIER_SLOW (padrao 1800 s)
+  fast    demais comandos (versao, temperatura, optica, BGP,      toda execucao
+          CPU/memoria)
+
+A saida de um comando slow fica em COLLECTOR_TIER_DIR (tmpfs, padrao
+/tmp/collector_tiers/<host>.json) com o horario da leitura. Enquanto o intervalo
+da classe nao vence, os coletores usam a saida em cache: os parsers rodam e os
+valores sao reenviados normalmente, mas o comando nao e executado. O display
+version fica em fast: o uptime (reboot) e a validacao de collector_caps
+(atualizacao de software) precisam da saida lida na execucao.
+
+COLLECTOR_TIERS=0 executa todos os comandos em toda execucao.
+"""
+
+import json
+import os
+import time
+
+import collector_caps
+import collector_replay
+
+ENABLED = os.environ.get("COLLECTOR_TIERS", "1") != "0"
+TIER_DIR = os.environ.get("COLLECTOR_TIER_DIR", "/tmp/collector_tiers")
+INTERVALS = {
+    "slow": int(os.environ.get("COLLECTOR_TIER_SLOW", "1800")),
+}
+
+# Comando (sem pipes) -> classe; comandos ausentes sao fast
+CLASSES = {
+    "display power": "slow",
+    "display power manage power-information": "slow",
+    "display power-supply information": "slow",
+    "display fan": "slow",
+}
+
+# Estado da execucao corrente (uma execucao por processo)
+_hostname = None
+_outputs = {}
+_dirty = False
+
+
+def _file(hostname):
+    safe = "".join(c if c.isalnum() or c in "-._" else "_" for c in hostname)
+    return os.path.join(TIER_DIR, f"{safe}.json")
+
+
+def _head(command):
+    return command.split(" | ", 1)[0].strip()
+
+
+def tier(command):
+    """Classe do comando (slow ou fast)"""
+    return CLASSES.get(_head(command), "fast")
+
+
+def begin(hostname):
+    """Carrega as saidas em cache do host"""
+    global _hostname, _outputs, _dirty
+    _hostname = None
+    _outputs = {}
+    _dirty = False
+    if not ENABLED or not hostname or collector_replay.replaying():
+        return
+    _hostname = hostname
+    try:
+        with open(_file(hostname)) as f:
+            _outputs = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+
+def cached(command):
+    """Saida em cache ainda dentro do intervalo da classe (None: executar o comando)"""
+    if _hostname is None or tier(command) == "fast":
+        return None
+    entry = _outputs.get(_head(command))
+    if not entry:
+        return None
+    age = time.time() - entry["time"]
+    if age >= INTERVALS[tier(command)] or age < 0:
+        return None
+    return entry["output"]
+
+
+def store(command, output):
+    """Guarda a saida recem-lida de um comando slow"""
+    global _dirty
+    if _hostname is None or tier(command) == "fast" or not output or collector_caps.is_error(output):
+        return
+    _outputs[_head(command)] = {"time": time.time(), "output": output}
+    _dirty = True
+
+
+def save():
+    """Grava as saidas lidas nesta execucao (escrita atomica)"""
+    global _dirty
+    if _hostname is None or not _dirty:
+        return
+    path = _file(_hostname)
+    try:
+        os.makedirs(TIER_DIR, exist_ok=True)
+        with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+            json.dump(_outputs, f)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+    except OSError:
+        pass
+    _dirty = False
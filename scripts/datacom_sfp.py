@@ -4,8 +4,8 @@
 Datacom SFP collector - inclui descoberta de alias via SNMP
 
 Usage:
-  datacom_sfp.py launch_discovery <host> <ssh_port> <ssh_user> <ssh_pass> <zbx_host> [<snmp_community>]
-  datacom_sfp.py collect        <host> <ssh_port> <ssh_user> <ssh_pass> <zbx_host> [<snmp_community>]
+  datacom_sfp.py launch_discovery <host> <ssh_port> <ssh_user> <ssh_pass> <zbx_host> [<snmp_community>] [netconf]
+  datacom_sfp.py collect        <host> <ssh_port> <ssh_user> <ssh_pass> <zbx_host> [<snmp_community>] [netconf]
 
 Este script:
 - SSH para coletar JSON de transceivers
@@ -13,13 +13,25 @@ Este script:
 - Gera payload JSON de discovery (lanes) e discovery (temp/volt)
 - Envia via zabbix_sender discovery e valores de temp, voltage, rx, tx, current
 - OTIMIZADO: launch_discovery agora executa discovery + coleta em uma unica operacao
+
+Modo NETCONF (argumento extra "netconf" ou DATACOM_NETCONF=1): os transceivers vem
+de um <get> com filtro subtree so das folhas usadas abaixo, na porta
+DATACOM_NETCONF_PORT (padrao 830), pela sessao mantida do collector_netconf.py.
+Se o NETCONF falhar, a coleta segue pela CLI.
 """
+import os
 import sys
 import json
 import re
 import subprocess
 from typing import List, Dict
-import paramiko
+
+import collector_output
+import collector_replay
+import collector_ssh
+import collector_stats
+import fleet_state
+import zbx_sender
 
 DEFAULT_SSH_PORT = 22
 DEFAULT_SNMP_COMM = 'public'
@@ -31,23 +43,61 @@ CMD_LIST = "show interface transceivers | display json"
 TRAPPER_LANES = 'gbicDiscovery'
 TRAPPER_TEMPVOLT = 'discovery_gbic_temp_volt'
 
+NETCONF = os.environ.get('DATACOM_NETCONF', '0') == '1'
+NETCONF_PORT = int(os.environ.get('DATACOM_NETCONF_PORT', '830'))
+# Usados se o equipamento nao anunciar os modulos no hello
+NETCONF_NAMESPACES = {
+    'dmos-base': os.environ.get('DATACOM_NS_BASE', 'urn:dmos:dmos-base'),
+    'dmos-transceivers': os.environ.get('DATACOM_NS_TRANSCEIVERS', 'urn:dmos:dmos-transceivers'),
+}
+NETCONF_LEAVES = ['if-type', 'id', 'if-index', 'temperature', 'vcc-3v3'] + [
+    leaf.format(lane) for lane in range(1, 5) for leaf in ('tx{}-bias', 'rx{}-power', 'tx{}-power')]
+NETCONF_FILTER = ('<status xmlns="{dmos-base}"><interface><transceivers xmlns="{dmos-transceivers}">'
+                  + ''.join(f'<{leaf}/>' for leaf in NETCONF_LEAVES)
+                  + '</transceivers></interface></status>')
+
 def ssh_run(host: str, port: int, user: str, pwd: str, cmd: str) -> str:
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    client.connect(hostname=host, port=port, username=user, password=pwd, timeout=10)
-    _, stdout, _ = client.exec_command(cmd)
-    output = stdout.read().decode('utf-8', errors='ignore')
-    client.close()
-    return output
+    raw = collector_ssh.run_command(host, port, user, pwd, cmd, timeout=10)
+    return raw.decode('utf-8', errors='ignore')
+
+
+def netconf_records(host: str, user: str, pwd: str) -> List[Dict]:
+    """Transceivers via NETCONF, nos mesmos registros da saida | display json"""
+    import xml.etree.ElementTree as ET
+
+    import collector_netconf
+
+    reply = collector_netconf.get(host, NETCONF_PORT, user, pwd, NETCONF_FILTER,
+                                  NETCONF_NAMESPACES, name='dmos-transceivers')
+    with collector_stats.stage("parse"):
+        recs = []
+        for element in ET.fromstring(reply).iter():
+            if element.tag.rsplit('}', 1)[-1] == 'transceivers':
+                recs.append({child.tag.rsplit('}', 1)[-1]: (child.text or '').strip()
+                             for child in element if len(child) == 0})
+    return recs
+
+
+def fetch_records(host: str, port: int, user: str, pwd: str) -> List[Dict]:
+    """Registros de transceivers (NETCONF quando ativo; senao CLI | display json)"""
+    if NETCONF:
+        try:
+            return netconf_records(host, user, pwd)
+        except Exception as e:
+            print(f"AVISO: NETCONF indisponivel, coletando pela CLI - {str(e)}", file=sys.stderr)
+    raw = ssh_run(host, port, user, pwd, CMD_LIST)
+    with collector_stats.stage("parse"):
+        obj = json.loads(raw)
+    return obj.get('data', {}).get('dmos-base:status', {}).get('interface', {}).get('dmos-transceivers:transceivers', [])
 
 
 def build_alias_map(host: str, community: str) -> Dict[str, str]:
     idx_to_descr: Dict[str, str] = {}
     try:
-        out = subprocess.check_output([
+        out = collector_replay.capture('snmp', 'IF-MIB::ifDescr', lambda: subprocess.check_output([
             SNMPWALK, '-v2c', '-c', community, '-t', str(SNMP_TIMEOUT),
             '-r', str(SNMP_RETRIES), host, 'IF-MIB::ifDescr'
-        ], text=True, timeout=SNMP_TIMEOUT+1)
+        ], text=True, timeout=SNMP_TIMEOUT+1))
         for line in out.splitlines():
             m = re.match(r"IF-MIB::ifDescr\.(\d+) = STRING: (.+)", line)
             if m:
@@ -56,10 +106,10 @@ def build_alias_map(host: str, community: str) -> Dict[str, str]:
         pass
     alias_map: Dict[str, str] = {}
     try:
-        out = subprocess.check_output([
+        out = collector_replay.capture('snmp', 'IF-MIB::ifAlias', lambda: subprocess.check_output([
             SNMPWALK, '-v2c', '-c', community, '-t', str(SNMP_TIMEOUT),
             '-r', str(SNMP_RETRIES), host, 'IF-MIB::ifAlias'
-        ], text=True, timeout=SNMP_TIMEOUT+1)
+        ], text=True, timeout=SNMP_TIMEOUT+1))
         for line in out.splitlines():
             m = re.match(r"IF-MIB::ifAlias\.(\d+) = STRING: ?(.*)", line)
             if m and m.group(1) in idx_to_descr:
@@ -114,6 +164,15 @@ def build_json_tempvolt(recs: List[Dict], alias_map: Dict[str, str]) -> str:
     return json.dumps({'data': data}, ensure_ascii=False, separators=(',', ':'))
 
 
+def send_value(zbx: str, key: str, value) -> bool:
+    """Envia um valor individual via zabbix_sender"""
+    with collector_stats.stage("send"):
+        sent = zbx_sender.send_value(zbx, key, value)
+    if sent:
+        collector_stats.add_values()
+    return sent is not False
+
+
 def send_metric_data(recs: List[Dict], zbx: str) -> tuple:
     """Envia os dados de metricas coletadas para o Zabbix"""
     success_count = 0
@@ -127,11 +186,7 @@ def send_metric_data(recs: List[Dict], zbx: str) -> tuple:
         # Temperatura
         temp = r.get('temperature', '')
         if is_number(temp):
-            result = subprocess.run([
-                'zabbix_sender', '-z', '127.0.0.1', '-s', zbx,
-                '-k', f'temp[{iface}]', '-o', str(temp)
-            ], capture_output=True, check=False)
-            if result.returncode == 0:
+            if send_value(zbx, f'temp[{iface}]', temp):
                 success_count += 1
             else:
                 error_count += 1
@@ -139,11 +194,7 @@ def send_metric_data(recs: List[Dict], zbx: str) -> tuple:
         # Voltagem
         volt = r.get('vcc-3v3', '')
         if is_number(volt):
-            result = subprocess.run([
-                'zabbix_sender', '-z', '127.0.0.1', '-s', zbx,
-                '-k', f'voltage[{iface}]', '-o', str(volt)
-            ], capture_output=True, check=False)
-            if result.returncode == 0:
+            if send_value(zbx, f'voltage[{iface}]', volt):
                 success_count += 1
             else:
                 error_count += 1
@@ -154,14 +205,11 @@ def send_metric_data(recs: List[Dict], zbx: str) -> tuple:
             lanes = [1]
         
         for lane in lanes:
+            fleet_state.add_lane(iface, lane, r.get(f"rx{lane}-power"), r.get(f"tx{lane}-power"))
             # Corrente
             bias = r.get(f"tx{lane}-bias", '')
             if is_number(bias):
-                result = subprocess.run([
-                    'zabbix_sender', '-z', '127.0.0.1', '-s', zbx,
-                    '-k', f'current[{iface}:{lane}]', '-o', str(bias)
-                ], capture_output=True, check=False)
-                if result.returncode == 0:
+                if send_value(zbx, f'current[{iface}:{lane}]', bias):
                     success_count += 1
                 else:
                     error_count += 1
@@ -169,11 +217,7 @@ def send_metric_data(recs: List[Dict], zbx: str) -> tuple:
             # RX Power
             rx = r.get(f"rx{lane}-power", '')
             if is_number(rx):
-                result = subprocess.run([
-                    'zabbix_sender', '-z', '127.0.0.1', '-s', zbx,
-                    '-k', f'rxpower[{iface}:{lane}]', '-o', str(rx)
-                ], capture_output=True, check=False)
-                if result.returncode == 0:
+                if send_value(zbx, f'rxpower[{iface}:{lane}]', rx):
                     success_count += 1
                 else:
                     error_count += 1
@@ -181,11 +225,7 @@ def send_metric_data(recs: List[Dict], zbx: str) -> tuple:
             # TX Power
             tx = r.get(f"tx{lane}-power", '')
             if is_number(tx):
-                result = subprocess.run([
-                    'zabbix_sender', '-z', '127.0.0.1', '-s', zbx,
-                    '-k', f'txpower[{iface}:{lane}]', '-o', str(tx)
-                ], capture_output=True, check=False)
-                if result.returncode == 0:
+                if send_value(zbx, f'txpower[{iface}:{lane}]', tx):
                     success_count += 1
                 else:
                     error_count += 1
@@ -196,35 +236,30 @@ def send_metric_data(recs: List[Dict], zbx: str) -> tuple:
 def discovery_and_collect(host: str, port: int, user: str, pwd: str, zbx: str, community: str) -> None:
     """Executa discovery e coleta de dados em uma unica operacao otimizada"""
     try:
-        # Conecta uma unica vez via SSH e obtem os dados
-        raw = ssh_run(host, port, user, pwd, CMD_LIST)
+        collector_stats.begin(zbx, "datacom_sfp", benchmark_key="benchmark_discovery")
+        # Conecta uma unica vez (SSH ou NETCONF) e obtem os dados
         try:
-            obj = json.loads(raw)
+            recs = fetch_records(host, port, user, pwd)
         except json.JSONDecodeError:
             print("ERRO: Falha ao processar dados JSON do equipamento", file=sys.stderr)
             return
         
-        recs = obj.get('data', {}).get('dmos-base:status', {}).get('interface', {}).get('dmos-transceivers:transceivers', [])
         if not recs:
             print("ERRO: Nenhum transceiver encontrado no equipamento", file=sys.stderr)
             return
         
         # Obtem o mapeamento de alias uma unica vez via SNMP
-        alias_map = build_alias_map(host, community)
+        with collector_stats.stage("command"):
+            alias_map = build_alias_map(host, community)
         
         # Gera e envia os payloads de discovery
-        payload_lanes = build_json_lanes(recs, alias_map)
-        payload_tempvolt = build_json_tempvolt(recs, alias_map)
-        host_q = f'"{zbx}"'
-        lines = [
-            f"{host_q} {TRAPPER_LANES} {payload_lanes}",
-            f"{host_q} {TRAPPER_TEMPVOLT} {payload_tempvolt}"
-        ]
-        
-        # Envia discovery sem verbosidade
-        discovery_result = subprocess.run([
-            'zabbix_sender', '-z', '127.0.0.1', '-i', '-'
-        ], input="\n".join(lines).encode(), capture_output=True, check=False)
+        with collector_stats.stage("lld"):
+            payload_lanes = build_json_lanes(recs, alias_map)
+            payload_tempvolt = build_json_tempvolt(recs, alias_map)
+        # Envia discovery sem verbosidade (as duas LLDs em uma chamada)
+        with collector_stats.stage("send"):
+            discovery_result = zbx_sender.send_discovery(zbx, {TRAPPER_LANES: payload_lanes,
+                                                               TRAPPER_TEMPVOLT: payload_tempvolt})
         
         # Envia os dados de metricas coletadas
         success_count, error_count = send_metric_data(recs, zbx)
@@ -240,18 +275,20 @@ def discovery_and_collect(host: str, port: int, user: str, pwd: str, zbx: str, c
             
     except Exception as e:
         print(f"ERRO: Falha na execucao do processo - {str(e)}", file=sys.stderr)
+    finally:
+        fleet_state.save(zbx, "datacom_sfp")
+        collector_stats.finish()
 
 
 def collect(host: str, port: int, user: str, pwd: str, zbx: str, community: str) -> None:
     """Mantido para compatibilidade - executa apenas coleta de dados"""
     try:
-        raw = ssh_run(host, port, user, pwd, CMD_LIST)
+        collector_stats.begin(zbx, "datacom_sfp")
         try:
-            obj = json.loads(raw)
+            recs = fetch_records(host, port, user, pwd)
         except json.JSONDecodeError:
             print("ERRO: Falha ao processar dados JSON do equipamento", file=sys.stderr)
             return
-        recs = obj.get('data', {}).get('dmos-base:status', {}).get('interface', {}).get('dmos-transceivers:transceivers', [])
         if not recs:
             print("ERRO: Nenhum transceiver encontrado no equipamento", file=sys.stderr)
             return
@@ -266,10 +303,17 @@ def collect(host: str, port: int, user: str, pwd: str, zbx: str, community: str)
             
     except Exception as e:
         print(f"ERRO: Falha na execucao do processo - {str(e)}", file=sys.stderr)
+    finally:
+        fleet_state.save(zbx, "datacom_sfp")
+        collector_stats.finish()
 
-if __name__ == '__main__':
+def main():
+    global NETCONF
+    if 'netconf' in sys.argv[7:]:
+        del sys.argv[sys.argv.index('netconf', 7)]
+        NETCONF = True
     if len(sys.argv) < 7:
-        print("Usage: datacom_sfp.py <launch_discovery|collect> <host> <ssh_port> <ssh_user> <ssh_pass> <zbx_host> [<snmp_community>]", file=sys.stderr)
+        print("Usage: datacom_sfp.py <launch_discovery|collect> <host> <ssh_port> <ssh_user> <ssh_pass> <zbx_host> [<snmp_community>] [netconf]", file=sys.stderr)
         sys.exit(1)
     act = sys.argv[1]
     host_str = sys.argv[2]
@@ -288,4 +332,7 @@ if __name__ == '__main__':
         collect(host_str, port, usr, pwd, zbx_host, snmp_comm)
     else:
         print("Unknown action", file=sys.stderr)
-        sys.exit(2)
\ No newline at end of file
+        sys.exit(2)
+
+if __name__ == '__main__':
+    collector_output.run(main, "datacom_sfp")
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Avaliacao de limiares da frota (lanes opticas e peers BGP) no proxy
+
+Le os snapshots gravados pelos coletores (fleet_state.py), monta arrays NumPy com
+todas as lanes e peers da frota e avalia os limiares em uma unica passada vetorizada.
+Envia ao Zabbix apenas:
+  - eventos de violacao, no host do equipamento, somente quando a violacao comeca
+    ou termina (estado anterior em FLEET_STATE_DIR/_breaches.json)
+  - agregados da frota e por site, no host FLEET_EVAL_HOST
+
+Itens (host do equipamento):
+  fleet.breach                       texto: "<tipo> <interface>:<lane> <valor> <limite>" / "OK ..."
+Itens (host da frota):
+  fleet.lanes.total                  lanes avaliadas
+  fleet.lanes.rx_low                 lanes com rx abaixo do limiar
+  fleet.lanes.breach                 lanes com qualquer violacao (rx ou tx)
+  fleet.peers.total / fleet.peers.down    peers BGP / peers fora de Established
+  fleet.site.discovery               LLD dos sites ({#SITE})
+  fleet.site.rx_margin[<site>]       pior margem rx do site (dB; negativo = violacao)
+  fleet.site.tx_margin[<site>]       pior margem tx do site (dB)
+  fleet.site.peers_down[<site>]      peers fora de Established no site
+
+Limiares em FLEET_EVAL_CONFIG (JSON, padrao /etc/zabbix/fleet_thresholds.json), com
+os padroes de DEFAULTS para chaves ausentes. O site de cada host vem de "sites"
+(host -> site) ou do prefixo do hostname capturado por "site_pattern".
+
+Itens nos templates "CWS - HUAWEI - SFP - SNMP" (fleet.breach) e "CWS - FLEET"
+(host da frota). O cron roda pelo collector-cron, com FLEET_EVAL_HOST e
+FLEET_EVAL_CONFIG do ambiente do container.
+
+Uso (cron a cada minuto):
+  fleet_eval.py [--dry-run] [--config arquivo]
+"""
+
+import json
+import os
+import re
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import fleet_state
+import zbx_sender
+
+CONFIG_FILE = os.environ.get("FLEET_EVAL_CONFIG", "/etc/zabbix/fleet_thresholds.json")
+FLEET_HOST = os.environ.get("FLEET_EVAL_HOST", "zabbix-fleet")
+BREACH_FILE = os.path.join(fleet_state.STATE_DIR, "_breaches.json")
+
+DEFAULTS = {
+    "rx_low": -14.0,       # dBm
+    "rx_high": 2.0,
+    "tx_low": -8.0,
+    "tx_high": 4.0,
+    "max_age": 900,        # segundos; snapshots mais antigos sao ignorados
+    "site_pattern": r"^([A-Za-z0-9]+)",
+    "sites": {},
+    "fleet_host": None,
+}
+
+
+def load_config(path):
+    config = dict(DEFAULTS)
+    try:
+        with open(path) as f:
+            config.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    return config
+
+
+def site_of(host, config, pattern):
+    site = config["sites"].get(host)
+    if site:
+        return site
+    m = pattern.match(host)
+    return m.group(1) if m else host
+
+
+def build_arrays(snapshots):
+    """Achata os snapshots em listas paralelas de lanes e peers"""
+    lane_host, lane_name, rx, tx = [], [], [], []
+    peer_host, peer_up = [], []
+    hosts = {}
+    for snapshot in snapshots:
+        h = hosts.setdefault(snapshot["host"], len(hosts))
+        for interface, lane, rx_value, tx_value in snapshot.get("lanes", []):
+            lane_host.append(h)
+            lane_name.append(f"{interface}:{lane}")
+            rx.append(np.nan if rx_value is None else rx_value)
+            tx.append(np.nan if tx_value is None else tx_value)
+        for _, established in snapshot.get("peers", []):
+            peer_host.append(h)
+            peer_up.append(established)
+    return (list(hosts), np.array(lane_host, dtype=np.int64), lane_name,
+            np.array(rx, dtype=np.float64), np.array(tx, dtype=np.float64),
+            np.array(peer_host, dtype=np.int64), np.array(peer_up, dtype=np.int8))
+
+
+def site_worst(values, site_idx, nsites):
+    """Menor valor por site (NaN para sites sem valores)"""
+    worst = np.full(nsites, np.inf)
+    valid = ~np.isnan(values)
+    np.minimum.at(worst, site_idx[valid], values[valid])
+    worst[np.isinf(worst)] = np.nan
+    return worst
+
+
+def evaluate(snapshots, config):
+    """Retorna (breaches {(host, lane): texto}, aggregates {chave: valor}, sites)"""
+    hosts, lane_host, lane_name, rx, tx, peer_host, peer_up = build_arrays(snapshots)
+    pattern = re.compile(config["site_pattern"])
+    host_site = [site_of(h, config, pattern) for h in hosts]
+    sites = sorted(set(host_site))
+    site_idx = {site: s for s, site in enumerate(sites)}
+    host_site_idx = np.array([site_idx[site] for site in host_site], dtype=np.int64)
+    nsites = len(sites)
+
+    # Margens (dB ate o limiar mais proximo); negativo = violacao
+    with np.errstate(invalid="ignore"):
+        rx_margin = np.minimum(rx - config["rx_low"], config["rx_high"] - rx)
+        tx_margin = np.minimum(tx - config["tx_low"], config["tx_high"] - tx)
+        rx_low = rx < config["rx_low"]
+        rx_breach = rx_margin < 0
+        tx_breach = tx_margin < 0
+    lane_site = host_site_idx[lane_host]
+    peer_site = host_site_idx[peer_host]
+    peer_down = peer_up == 0
+
+    breaches = {}
+    for i in np.flatnonzero(rx_breach | tx_breach):
+        parts = []
+        if rx_breach[i]:
+            limit = config["rx_low"] if rx[i] < config["rx_low"] else config["rx_high"]
+            parts.append(f"rx {lane_name[i]} {rx[i]:.2f} limite {limit:.2f}")
+        if tx_breach[i]:
+            limit = config["tx_low"] if tx[i] < config["tx_low"] else config["tx_high"]
+            parts.append(f"tx {lane_name[i]} {tx[i]:.2f} limite {limit:.2f}")
+        breaches[(hosts[lane_host[i]], lane_name[i])] = "; ".join(parts)
+
+    aggregates = {
+        "fleet.lanes.total": int(len(rx)),
+        "fleet.lanes.rx_low": int(np.count_nonzero(rx_low)),
+        "fleet.lanes.breach": int(np.count_nonzero(rx_breach | tx_breach)),
+        "fleet.peers.total": int(len(peer_up)),
+        "fleet.peers.down": int(np.count_nonzero(peer_down)),
+    }
+    if nsites:
+        rx_worst = site_worst(rx_margin, lane_site, nsites)
+        tx_worst = site_worst(tx_margin, lane_site, nsites)
+        down = np.bincount(peer_site[peer_down], minlength=nsites)
+        for s, site in enumerate(sites):
+            if not np.isnan(rx_worst[s]):
+                aggregates[f"fleet.site.rx_margin[{site}]"] = round(float(rx_worst[s]), 2)
+            if not np.isnan(tx_worst[s]):
+                aggregates[f"fleet.site.tx_margin[{site}]"] = round(float(tx_worst[s]), 2)
+            aggregates[f"fleet.site.peers_down[{site}]"] = int(down[s])
+    return breaches, aggregates, sites
+
+
+def load_breaches():
+    try:
+        with open(BREACH_FILE) as f:
+            return {tuple(k.split("\t", 1)): v for k, v in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_breaches(breaches):
+    tmp = f"{BREACH_FILE}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump({f"{h}\t{n}": v for (h, n), v in breaches.items()}, f)
+        os.replace(tmp, BREACH_FILE)
+    except OSError:
+        pass
+
+
+def main():
+    dry_run = "--dry-run" in sys.argv
+    config_file = CONFIG_FILE
+    if "--config" in sys.argv:
+        idx = sys.argv.index("--config")
+        if idx + 1 < len(sys.argv):
+            config_file = sys.argv[idx + 1]
+
+    if np is None:
+        print("ERRO: NumPy nao instalado (pip3 install numpy)", file=sys.stderr)
+        return 1
+    try:
+        config = load_config(config_file)
+    except (OSError, ValueError) as e:
+        print(f"ERRO: Configuracao invalida {config_file} - {str(e)}", file=sys.stderr)
+        return 1
+    fleet_host = config["fleet_host"] or FLEET_HOST
+
+    snapshots = fleet_state.load_all(max_age=config["max_age"])
+    breaches, aggregates, sites = evaluate(snapshots, config)
+
+    # Eventos somente na mudanca de estado (inicio ou fim da violacao), um lote por host
+    previous = load_breaches()
+    events = {}
+    for (host, lane), text in sorted(breaches.items()):
+        if previous.get((host, lane)) is None:
+            events.setdefault(host, []).append(zbx_sender.format_line(host, "fleet.breach", text))
+    for (host, lane), text in sorted(previous.items()):
+        if (host, lane) not in breaches:
+            events.setdefault(host, []).append(zbx_sender.format_line(host, "fleet.breach", f"OK {lane}"))
+
+    # LLD em um envio proprio: prototipo novo ainda sem item nao derruba os agregados
+    discovery = [zbx_sender.format_line(
+        fleet_host, "fleet.site.discovery", json.dumps({"data": [{"{#SITE}": s} for s in sites]}))]
+    values = [zbx_sender.format_line(fleet_host, key, value) for key, value in aggregates.items()]
+
+    if dry_run:
+        print("\n".join([line for host in sorted(events) for line in events[host]] + discovery + values))
+        return 0
+    # Estado salvo so dos hosts cujos eventos foram aceitos; os demais reenviam na proxima
+    failed_hosts = {host for host, lines in events.items() if not zbx_sender.send_lines(lines, timeout=10)}
+    state = {k: v for k, v in breaches.items() if k[0] not in failed_hosts}
+    state.update({k: v for k, v in previous.items() if k[0] in failed_hosts})
+    save_breaches(state)
+    discovery_ok = zbx_sender.send_lines(discovery, timeout=10)
+    values_ok = zbx_sender.send_lines(values, timeout=10)
+
+    sent = sum(len(lines) for host, lines in events.items() if host not in failed_hosts)
+    summary = (f"{aggregates['fleet.lanes.total']} lanes e {aggregates['fleet.peers.total']} peers "
+               f"de {len(snapshots)} snapshots avaliados; {len(breaches)} violacoes, {sent} eventos enviados")
+    if failed_hosts or not discovery_ok or not values_ok:
+        failures = [f"eventos de {','.join(sorted(failed_hosts))}"] if failed_hosts else []
+        failures += [] if discovery_ok else ["fleet.site.discovery"]
+        failures += [] if values_ok else ["agregados"]
+        print(f"PARCIAL: {summary}; falha em {'; '.join(failures)}")
+        return 1
+    print(f"SUCESSO: {summary}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
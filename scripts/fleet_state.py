@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Snapshot por host das lanes opticas e peers BGP coletados
+
+Os coletores registram cada lane (rx/tx em dBm) e cada peer BGP (Established ou nao)
+durante a coleta; no fim da execucao save() grava o snapshot do host em
+FLEET_STATE_DIR (tmpfs, padrao /tmp/fleet_state) com escrita atomica. O avaliador
+fleet_eval.py le todos os snapshots e avalia os limiares da frota de uma vez.
+
+Arquivo: <host>__<script>.json - coletores diferentes do mesmo host nao se
+sobrescrevem. So biblioteca padrao: nao pesa na importacao dos coletores.
+"""
+
+import json
+import os
+import time
+
+STATE_DIR = os.environ.get("FLEET_STATE_DIR", "/tmp/fleet_state")
+
+# Dados da execucao corrente (uma execucao por processo)
+_lanes = []  # [interface, lane, rx, tx]
+_peers = []  # [peer, established]
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def add_lane(interface, lane, rx=None, tx=None):
+    """Registra uma lane optica (valores em dBm; None quando nao coletado)"""
+    rx = _number(rx)
+    tx = _number(tx)
+    if rx is None and tx is None:
+        return
+    _lanes.append([str(interface), str(lane), rx, tx])
+
+
+def add_peer(peer, established):
+    """Registra um peer BGP e se esta Established"""
+    _peers.append([str(peer), 1 if established else 0])
+
+
+def reset():
+    del _lanes[:]
+    del _peers[:]
+
+
+def _filename(hostname, script):
+    safe = "".join(c if c.isalnum() or c in "-._" else "_" for c in hostname)
+    return os.path.join(STATE_DIR, f"{safe}__{script}.json")
+
+
+def save(hostname, script):
+    """Grava o snapshot do host (somente se a execucao registrou lanes ou peers)"""
+    if not _lanes and not _peers:
+        return False
+    snapshot = {
+        "host": hostname,
+        "script": script,
+        "time": int(time.time()),
+        "lanes": _lanes,
+        "peers": _peers,
+    }
+    path = _filename(hostname, script)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp, path)
+        return True
+    except OSError:
+        return False
+    finally:
+        reset()
+
+
+def load_all(max_age=None):
+    """Le os snapshots de STATE_DIR (ignora os mais antigos que max_age segundos)"""
+    snapshots = []
+    now = time.time()
+    try:
+        names = sorted(os.listdir(STATE_DIR))
+    except OSError:
+        return snapshots
+    for name in names:
+        if not name.endswith(".json") or name.startswith("_"):
+            continue
+        try:
+            with open(os.path.join(STATE_DIR, name)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if max_age is not None and now - snapshot.get("time", 0) > max_age:
+            continue
+        snapshots.append(snapshot)
+    return snapshots
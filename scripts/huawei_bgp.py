@@ -4,21 +4,67 @@
 Huawei BGP collector - otimizado para executar discovery e coleta em uma unica operacao
 
 Usage:
-  huawei_bgp.py launch_discovery <host> <port> <user> <password> <zabbix_host>
-  huawei_bgp.py collect <host> <port> <user> <password> <zabbix_host>
+  huawei_bgp.py launch_discovery <host> <port> <user> <password> <zabbix_host> [incremental]
+  huawei_bgp.py collect <host> <port> <user> <password> <zabbix_host> [incremental]
 
 OTIMIZADO: launch_discovery agora executa discovery + coleta em uma unica operacao
 """
 
-import paramiko
+import os
 import sys
 import re
 import json
-import subprocess
+import shlex
+import time
+
+import collector_caps
+import collector_filters
+import collector_output
+import collector_ssh
+import collector_stats
+import fleet_state
+import zbx_sender
 
 # Cache simples para evitar comandos duplicados (mais seguro que conexao global)
 command_cache = {}
 
+# Modo incremental (BGP_INCREMENTAL=1 ou argumento "incremental"): estado, rotas
+# recebidas e Up/Down vem das tabelas compactas "display bgp [ipv6] peer" a cada
+# ciclo; o verbose (descricao, rotas anunciadas) so e lido para peers novos ou
+# alterados (por peer, ou completo acima de BGP_VERBOSE_MAX_PEERS) e a cada
+# BGP_VERBOSE_REFRESH segundos. Ultimo verbose de cada peer em BGP_STATE_DIR.
+INCREMENTAL = os.environ.get("BGP_INCREMENTAL", "0") == "1"
+VERBOSE_REFRESH = int(os.environ.get("BGP_VERBOSE_REFRESH", "3600"))
+VERBOSE_MAX_PEERS = int(os.environ.get("BGP_VERBOSE_MAX_PEERS", "10"))
+STATE_DIR = os.environ.get("BGP_STATE_DIR", "/tmp/bgp_state")
+
+# Estatisticas de rotas (discovery) e verbose dos peers (modo padrao)
+ROUTE_COMMANDS = [
+    ("display ipv6 routing-table statistics", "ipv6"),
+    ("display bgp ipv6 routing-table statistics", "bgp_ipv6"),
+    ("display ip routing-table statistics", "ipv4"),
+    ("display bgp routing-table statistics", "bgp_ipv4"),
+]
+PEER_COMMANDS = ["display bgp ipv6 peer verbose | no-more", "display bgp peer verbose | no-more"]
+# Vai no mesmo prefetch e valida o cache de capacidades (collector_caps) apos troca de software
+VERSION_COMMAND = "display version"
+
+# (familia, tabela compacta, verbose completo, verbose de um peer)
+FAMILIES = [
+    ("ipv6", "display bgp ipv6 peer | no-more", "display bgp ipv6 peer verbose | no-more",
+     "display bgp ipv6 peer {peer} verbose | no-more"),
+    ("ipv4", "display bgp peer | no-more", "display bgp peer verbose | no-more",
+     "display bgp peer {peer} verbose | no-more"),
+]
+
+# Linha da tabela: Peer V AS MsgRcvd MsgSent OutQ Up/Down State PrefRcv
+PEER_ROW_RE = re.compile(r"^\s*([0-9A-Fa-f:.]+)\s+4\s+\d+(?:\.\d+)?\s+\d+\s+\d+\s+\d+\s+(\S+)\s+(\S+)\s+(\d+)\s*$")
+# Endereco IPv6 longo: o VRP quebra a linha logo apos o endereco
+PEER_WRAP_RE = re.compile(r"^\s*([0-9A-Fa-f]*:[0-9A-Fa-f:.]*)\s*$")
+
+# Peers da execucao corrente no modo incremental (discovery e coleta leem os mesmos)
+_incremental = None
+
 def run_ssh_command(host, port, user, password, command):
     """Executa comando SSH com cache simples"""
     global command_cache
@@ -30,13 +76,9 @@ def run_ssh_command(host, port, user, password, command):
     
     # Executa comando com conexao individual (mais estavel)
     try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(host, port=int(port), username=user, password=password, 
-                   look_for_keys=False, allow_agent=False, timeout=30)
-        stdin, stdout, stderr = ssh.exec_command(command, timeout=60)
-        output = stdout.read().decode(errors='ignore')
-        ssh.close()
+        raw = collector_ssh.run_command(host, port, user, password, command,
+                                        timeout=30, command_timeout=60)
+        output = raw.decode(errors='ignore')
         
         # Armazena no cache para reutilizacao
         command_cache[cache_key] = output
@@ -45,33 +87,63 @@ def run_ssh_command(host, port, user, password, command):
     except Exception as e:
         raise Exception(f"Erro SSH em '{command}': {str(e)}")
 
+def prefetch_commands(host, port, user, password, commands):
+    """Preenche o cache executando os comandos em canais paralelos de uma unica sessao"""
+    pending = {f"{host}:{port}:{cmd}": cmd for cmd in commands if f"{host}:{port}:{cmd}" not in command_cache}
+    if not pending:
+        return
+    try:
+        transport = collector_ssh.open_transport(host, port, user, password, timeout=30)
+    except Exception:
+        return  # run_ssh_command tenta de novo com conexao individual
+    try:
+        results, _ = collector_ssh.exec_parallel(transport, pending, timeout=60)
+    finally:
+        transport.close()
+    for cache_key, raw in results.items():
+        command_cache[cache_key] = raw.decode(errors='ignore')
+
+def validate_caps(host, port):
+    """Invalida as capacidades aprendidas se o display version do prefetch mudou"""
+    collector_caps.validate(command_cache.get(f"{host}:{port}:{VERSION_COMMAND}"))
+
+def poll_commands(zabbix_host, discovery=False):
+    """Comandos independentes da proxima execucao (coleta combinada huawei_poll)"""
+    collector_caps.begin(zabbix_host)
+    commands = [VERSION_COMMAND] + ([cmd for cmd, _ in ROUTE_COMMANDS] if discovery else [])
+    if INCREMENTAL:
+        return commands + [table for _, table, _, _ in FAMILIES]
+    return commands + [collector_filters.command(cmd) for cmd in PEER_COMMANDS]
+
 def clear_cache():
     """Limpa cache de comandos"""
-    global command_cache
+    global command_cache, _incremental
     command_cache.clear()
+    _incremental = None
 
 def send_to_zabbix(zabbix_host, key, value, lld=False, use_shell_quotes=False):
     try:
+        # Com use_shell_quotes o shell removia as aspas da key: mesma key efetiva
         if use_shell_quotes:
+            key = shlex.split(key)[0]
+        with collector_stats.stage("send"):
             if lld:
-                cmd = f'zabbix_sender -z 127.0.0.1 -s "{zabbix_host}" -k {key} -o \'{value}\''
+                result = zbx_sender.send_discovery(zabbix_host, {key: value}, timeout=15)
+                sent = result.returncode == 0
             else:
-                cmd = f'zabbix_sender -z 127.0.0.1 -s "{zabbix_host}" -k {key} -o {value}'
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=15)
-        else:
-            cmd = ["zabbix_sender", "-z", "127.0.0.1", "-s", zabbix_host, "-k", key]
-            if lld:
-                cmd += ["-o", value]
-            else:
-                cmd += ["-o", str(value)]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
+                sent = zbx_sender.send_value(zabbix_host, key, value, timeout=15)
+        if sent:
+            collector_stats.add_values()
     except Exception as e:
         raise Exception(f"Erro Zabbix sender: {str(e)}")
 
+def peer_blocks(output):
+    """Blocos "BGP Peer is ..." do verbose (saida filtrada pode comecar direto no bloco)"""
+    return re.split(r"\n\s*BGP Peer is ", "\n" + output)[1:]
+
 def extract_peers(output):
     peers = []
-    peer_blocks = re.split(r"\n\s*BGP Peer is ", output)
-    for block in peer_blocks[1:]:
+    for block in peer_blocks(output):
         m = re.match(r"([^\s,]+)", block)
         if not m:
             continue
@@ -86,7 +158,10 @@ def extract_peers(output):
         })
     return peers
 
-def parse_uptime_to_hours(uptime_str):
+def parse_uptime_to_seconds(uptime_str):
+    m = re.match(r"^\s*(\d+):(\d+):(\d+)\s*$", uptime_str)
+    if m:
+        return int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3))
     days = hours = mins = secs = 0
     m = re.search(r"(\d+)d", uptime_str)
     if m: days = int(m.group(1))
@@ -96,44 +171,182 @@ def parse_uptime_to_hours(uptime_str):
     if m: mins = int(m.group(1))
     m = re.search(r"(\d+)s", uptime_str)
     if m: secs = int(m.group(1))
-    total_hours = days*24 + hours + (mins/60) + (secs/3600)
-    return round(total_hours, 2)
+    return days*86400 + hours*3600 + mins*60 + secs
+
+def parse_uptime_to_hours(uptime_str):
+    return round(parse_uptime_to_seconds(uptime_str) / 3600, 2)
 
 def bgp_state_to_num(state_str):
     mapping = {
-        "Idle": 1,
-        "Connect": 2,
-        "Active": 3,
-        "OpenSent": 4,
-        "OpenConfirm": 5,
-        "Established": 6
+        "idle": 1,
+        "connect": 2,
+        "active": 3,
+        "opensent": 4,
+        "openconfirm": 5,
+        "established": 6
     }
-    return mapping.get(state_str, 0)
+    return mapping.get(state_str.lower(), 0)
+
+def parse_peer_table(output):
+    """Tabela "display bgp [ipv6] peer": {peer: {state, updown, received}}; None se nao reconhecida"""
+    if collector_caps.is_error(output) or "PrefRcv" not in output:
+        return None
+    peers = {}
+    pending = ""
+    for line in output.splitlines():
+        wrapped = PEER_WRAP_RE.match(line)
+        if wrapped:
+            pending = wrapped.group(1)
+            continue
+        if pending:
+            line = f"{pending} {line.strip()}"
+            pending = ""
+        m = PEER_ROW_RE.match(line)
+        if m:
+            peers[m.group(1)] = {"state": m.group(3).split("(")[0], "updown": m.group(2),
+                                 "received": int(m.group(4))}
+    return peers
+
+def parse_peer_details(output):
+    """Descricao e rotas anunciadas de cada peer do verbose: {peer: {description, advertised}}"""
+    details = {}
+    for block in peer_blocks(output):
+        m = re.match(r"([^\s,]+)", block)
+        if not m:
+            continue
+        desc_m = re.search(r'Peer\'s description: "([^"]+)"', block)
+        adv_routes = re.search(r"Advertised total routes:\s*(\d+)", block)
+        details[m.group(1)] = {"description": desc_m.group(1) if desc_m else "",
+                               "advertised": adv_routes.group(1) if adv_routes else "0"}
+    return details
+
+def _up_since(info, now):
+    """Inicio da sessao e resolucao do Up/Down (2d21h so tem horas)"""
+    updown = info["updown"]
+    resolution = 1 if ":" in updown or "s" in updown else 60 if "m" in updown else 3600
+    return now - parse_uptime_to_seconds(updown), resolution
+
+def peer_changed(known, info, now):
+    """Peer novo, com outro estado ou reiniciado desde o ultimo ciclo"""
+    if known is None or known.get("state") != info["state"]:
+        return True
+    if info["state"] != "Established" or known.get("up_since") is None:
+        return False
+    up_since, resolution = _up_since(info, now)
+    return up_since - known["up_since"] > resolution + 60
+
+def _state_file(hostname):
+    safe = "".join(c if c.isalnum() or c in "-._" else "_" for c in hostname)
+    return os.path.join(STATE_DIR, f"{safe}.json")
+
+def load_peer_state(hostname):
+    try:
+        with open(_state_file(hostname)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    state.setdefault("refresh", {})
+    state.setdefault("peers", {})
+    return state
+
+def save_peer_state(hostname, state):
+    """Grava o ultimo verbose de cada peer (escrita atomica)"""
+    path = _state_file(hostname)
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+    except OSError:
+        pass
+
+def incremental_peers(host, port, user, password, zabbix_host):
+    """Peers do modo incremental; None se o equipamento nao aceita a tabela compacta
+
+    Cada peer: {peer, description, state, updown, received, advertised}.
+    """
+    global _incremental
+    if _incremental is not None:
+        return _incremental
+    run = lambda command: run_ssh_command(host, port, user, password, command)
+    prefetch_commands(host, port, user, password, [VERSION_COMMAND] + [table for _, table, _, _ in FAMILIES])
+    validate_caps(host, port)
+    state = load_peer_state(zabbix_host)
+    now = time.time()
+    rows = []
+    for family, table_cmd, verbose_cmd, peer_cmd in FAMILIES:
+        with collector_stats.stage("parse"):
+            table = parse_peer_table(run(table_cmd))
+        if table is None:
+            return None
+        known = state["peers"].get(family, {})
+        refresh = now - state["refresh"].get(family, 0) >= VERBOSE_REFRESH
+        changed = [peer for peer, info in table.items() if refresh or peer_changed(known.get(peer), info, now)]
+        details = {}
+        if changed and (refresh or len(changed) > VERBOSE_MAX_PEERS):
+            # Muitos peers alterados: um verbose completo custa menos que um comando por peer
+            output = collector_filters.run(verbose_cmd, run)
+            with collector_stats.stage("parse"):
+                details = parse_peer_details(output)
+            if details or not table:
+                state["refresh"][family] = now
+        elif changed:
+            commands = [peer_cmd.format(peer=peer) for peer in changed]
+            prefetch_commands(host, port, user, password, commands)
+            for command in commands:
+                try:
+                    output = run(command)
+                except Exception:
+                    continue  # peer fica sem detalhe e e lido de novo no proximo ciclo
+                with collector_stats.stage("parse"):
+                    details.update(parse_peer_details(output))
+
+        peers = {}
+        for peer, info in table.items():
+            detail = details.get(peer)
+            if detail is None:
+                # Sem detalhe novo (verbose falhou ou veio vazio): mantem o ultimo lido;
+                # so fica de fora o peer que nunca teve detalhe
+                detail = known.get(peer)
+                if detail is None:
+                    continue
+            up_since = _up_since(info, now)[0] if info["state"] == "Established" else None
+            row = {"description": detail["description"], "advertised": detail["advertised"],
+                   "state": info["state"], "up_since": up_since}
+            # Alterado e sem detalhe novo: grava o estado anterior para ser lido de novo
+            peers[peer] = known[peer] if peer in changed and peer not in details else row
+            rows.append({"peer": peer, **info, **row})
+        state["peers"][family] = peers
+    save_peer_state(zabbix_host, state)
+    _incremental = rows
+    return rows
 
 def launch_discovery_original(host, port, user, password, zabbix_host):
     """Funcao original de discovery que funcionava - com cache otimizado"""
     try:
-        cmds_routes = [
-            ("display ipv6 routing-table statistics", "ipv6"),
-            ("display bgp ipv6 routing-table statistics", "bgp_ipv6"),
-            ("display ip routing-table statistics", "ipv4"),
-            ("display bgp routing-table statistics", "bgp_ipv4")
-        ]
+        cmds_routes = ROUTE_COMMANDS
+        peer_cmds = PEER_COMMANDS
+        prefetch = [VERSION_COMMAND] + [cmd for cmd, _ in cmds_routes]
+        prefetch += [table for _, table, _, _ in FAMILIES] if INCREMENTAL else \
+            [collector_filters.command(cmd) for cmd in peer_cmds]
+        prefetch_commands(host, port, user, password, prefetch)
+        validate_caps(host, port)
         values = {}
         for cmd, tag in cmds_routes:
             output = run_ssh_command(host, port, user, password, cmd)
-            if tag == "ipv6":
-                m = re.search(r"Summary Prefixes\s*:\s*(\d+)", output)
-                if m: values["hwIPv6RibRoutes"] = int(m.group(1))
-            elif tag == "bgp_ipv6":
-                m = re.search(r"Total Number of Routes:\s*(\d+)", output)
-                if m: values["hwIPv6FibRoutes"] = int(m.group(1))
-            elif tag == "ipv4":
-                m = re.search(r"Summary Prefixes\s*:\s*(\d+)", output)
-                if m: values["hwIPv4RibRoutes"] = int(m.group(1))
-            elif tag == "bgp_ipv4":
-                m = re.search(r"Total Number of Routes:\s*(\d+)", output)
-                if m: values["hwIPv4FibRoutes"] = int(m.group(1))
+            with collector_stats.stage("parse"):
+                if tag == "ipv6":
+                    m = re.search(r"Summary Prefixes\s*:\s*(\d+)", output)
+                    if m: values["hwIPv6RibRoutes"] = int(m.group(1))
+                elif tag == "bgp_ipv6":
+                    m = re.search(r"Total Number of Routes:\s*(\d+)", output)
+                    if m: values["hwIPv6FibRoutes"] = int(m.group(1))
+                elif tag == "ipv4":
+                    m = re.search(r"Summary Prefixes\s*:\s*(\d+)", output)
+                    if m: values["hwIPv4RibRoutes"] = int(m.group(1))
+                elif tag == "bgp_ipv4":
+                    m = re.search(r"Total Number of Routes:\s*(\d+)", output)
+                    if m: values["hwIPv4FibRoutes"] = int(m.group(1))
         
         values["hwIPv4v6RibRoutes"] = values.get("hwIPv4RibRoutes",0) + values.get("hwIPv6RibRoutes",0)
         values["hwIPv4v6FibRoutes"] = values.get("hwIPv4FibRoutes",0) + values.get("hwIPv6FibRoutes",0)
@@ -141,11 +354,17 @@ def launch_discovery_original(host, port, user, password, zabbix_host):
         for key, val in values.items():
             send_to_zabbix(zabbix_host, key, val)
 
-        all_peers = []
-        for cmd in ["display bgp ipv6 peer verbose | no-more", "display bgp peer verbose | no-more"]:
-            output = run_ssh_command(host, port, user, password, cmd)
-            all_peers += extract_peers(output)
-        lld_json = json.dumps({"data": all_peers}, ensure_ascii=False)
+        rows = incremental_peers(host, port, user, password, zabbix_host) if INCREMENTAL else None
+        if rows is not None:
+            all_peers = [{"{#DESCRIPTION}": row["description"], "{#PEER}": row["peer"]} for row in rows]
+        else:
+            all_peers = []
+            for cmd in peer_cmds:
+                output = collector_filters.run(cmd, lambda command: run_ssh_command(host, port, user, password, command))
+                with collector_stats.stage("parse"):
+                    all_peers += extract_peers(output)
+        with collector_stats.stage("lld"):
+            lld_json = json.dumps({"data": all_peers}, ensure_ascii=False)
         send_to_zabbix(zabbix_host, "bgpSessions", lld_json, lld=True)
         
     except Exception as e:
@@ -154,42 +373,51 @@ def launch_discovery_original(host, port, user, password, zabbix_host):
 def collect_original(host, port, user, password, zabbix_host):
     """Funcao original de collect que funcionava - com cache otimizado"""
     try:
-        # Usa cache - comandos BGP ja executados no discovery
+        if INCREMENTAL and collect_incremental(host, port, user, password, zabbix_host):
+            return
+        # Usa cache - comandos BGP ja executados no discovery (ou obtidos agora em paralelo)
+        peer_cmds = PEER_COMMANDS
+        prefetch_commands(host, port, user, password,
+                          [VERSION_COMMAND] + [collector_filters.command(cmd) for cmd in peer_cmds])
+        validate_caps(host, port)
+        outputs = {cmd: collector_filters.run(cmd, lambda command: run_ssh_command(host, port, user, password, command))
+                   for cmd in peer_cmds}
         peers_discovered = []
-        for cmd in ["display bgp ipv6 peer verbose | no-more", "display bgp peer verbose | no-more"]:
-            output = run_ssh_command(host, port, user, password, cmd)  # Cache evita re-execucao
-            peers_discovered += extract_peers(output)
+        for cmd in peer_cmds:
+            output = outputs[cmd]  # Cache evita re-execucao
+            with collector_stats.stage("parse"):
+                peers_discovered += extract_peers(output)
         peer_set = set((p["{#DESCRIPTION}"], p["{#PEER}"]) for p in peers_discovered)
 
-        for cmd in ["display bgp ipv6 peer verbose | no-more", "display bgp peer verbose | no-more"]:
-            output = run_ssh_command(host, port, user, password, cmd)  # Cache evita re-execucao
-            peer_blocks = re.split(r"\n\s*BGP Peer is ", output)
-            for block in peer_blocks[1:]:
-                m = re.match(r"([^\s,]+)", block)
-                if not m:
-                    continue
-                peer_ip = m.group(1)
-                desc_m = re.search(r'Peer\'s description: "([^"]+)"', block)
-                if not desc_m:
-                    continue
-                description = desc_m.group(1)
-                if (description, peer_ip) not in peer_set:
-                    continue
+        for cmd in peer_cmds:
+            for block in peer_blocks(outputs[cmd]):
+                with collector_stats.stage("parse"):
+                    m = re.match(r"([^\s,]+)", block)
+                    if not m:
+                        continue
+                    peer_ip = m.group(1)
+                    desc_m = re.search(r'Peer\'s description: "([^"]+)"', block)
+                    if not desc_m:
+                        continue
+                    description = desc_m.group(1)
+                    if (description, peer_ip) not in peer_set:
+                        continue
 
-                state = re.search(r"BGP current state:\s*([^\s,]+)", block)
-                state_val = state.group(1) if state else ""
+                    state = re.search(r"BGP current state:\s*([^\s,]+)", block)
+                    state_val = state.group(1) if state else ""
 
-                uptime = re.search(r"Up for ([^,]+)", block)
-                uptime_val = uptime.group(1) if uptime else ""
+                    uptime = re.search(r"Up for ([^,]+)", block)
+                    uptime_val = uptime.group(1) if uptime else ""
 
-                recv_routes = re.search(r"Received total routes:\s*(\d+)", block)
-                recv_routes_val = recv_routes.group(1) if recv_routes else "0"
+                    recv_routes = re.search(r"Received total routes:\s*(\d+)", block)
+                    recv_routes_val = recv_routes.group(1) if recv_routes else "0"
 
-                adv_routes = re.search(r"Advertised total routes:\s*(\d+)", block)
-                adv_routes_val = adv_routes.group(1) if adv_routes else "0"
+                    adv_routes = re.search(r"Advertised total routes:\s*(\d+)", block)
+                    adv_routes_val = adv_routes.group(1) if adv_routes else "0"
 
-                uptime_hours = parse_uptime_to_hours(uptime_val) if uptime_val else 0
-                state_num = bgp_state_to_num(state_val) if state_val else 0
+                    uptime_hours = parse_uptime_to_hours(uptime_val) if uptime_val else 0
+                    state_num = bgp_state_to_num(state_val) if state_val else 0
+                    fleet_state.add_peer(f"{description} {peer_ip}", state_val == "Established")
 
                 send_to_zabbix(zabbix_host, f'bgpAdvRoutes["{description}",{peer_ip}]', adv_routes_val, use_shell_quotes=True)
                 send_to_zabbix(zabbix_host, f'BGPpeerRouter["{description}",{peer_ip}]', recv_routes_val, use_shell_quotes=True)
@@ -199,9 +427,29 @@ def collect_original(host, port, user, password, zabbix_host):
     except Exception as e:
         raise Exception(f"Erro em collect: {str(e)}")
 
+def collect_incremental(host, port, user, password, zabbix_host):
+    """Coleta pelo modo incremental; False se o equipamento nao aceita a tabela compacta"""
+    rows = incremental_peers(host, port, user, password, zabbix_host)
+    if rows is None:
+        return False
+    for row in rows:
+        description, peer_ip = row["description"], row["peer"]
+        if not description:
+            continue
+        established = row["state"] == "Established"
+        uptime_hours = parse_uptime_to_hours(row["updown"]) if established else 0
+        fleet_state.add_peer(f"{description} {peer_ip}", established)
+        send_to_zabbix(zabbix_host, f'bgpAdvRoutes["{description}",{peer_ip}]', row["advertised"], use_shell_quotes=True)
+        send_to_zabbix(zabbix_host, f'BGPpeerRouter["{description}",{peer_ip}]', row["received"], use_shell_quotes=True)
+        send_to_zabbix(zabbix_host, f'hwBgpPeerFsmEstablishedTime["{description}",{peer_ip}]', uptime_hours, use_shell_quotes=True)
+        send_to_zabbix(zabbix_host, f'hwBgpPeerState["{description}",{peer_ip}]', bgp_state_to_num(row["state"]), use_shell_quotes=True)
+    return True
+
 def launch_discovery_and_collect(host, port, user, password, zabbix_host):
     """Executa discovery e coleta - VERSAO ROBUSTA"""
     try:
+        collector_stats.begin(zabbix_host, "huawei_bgp")
+        collector_caps.begin(zabbix_host)
         # Limpa cache
         clear_cache()
         print("Iniciando discovery...")
@@ -219,21 +467,33 @@ def launch_discovery_and_collect(host, port, user, password, zabbix_host):
         print(f"ERRO: Falha na execucao do processo - {str(e)}", file=sys.stderr)
     finally:
         clear_cache()
+        collector_caps.save()
+        fleet_state.save(zabbix_host, "huawei_bgp")
+        collector_stats.finish()
 
 def collect(host, port, user, password, zabbix_host):
     """Funcao de collect para compatibilidade"""
     try:
+        collector_stats.begin(zabbix_host, "huawei_bgp")
+        collector_caps.begin(zabbix_host)
         collect_original(host, port, user, password, zabbix_host)
         print("SUCESSO: Coleta executada com sucesso!")
         
     except Exception as e:
         print(f"ERRO: Falha na execucao do processo - {str(e)}", file=sys.stderr)
+    finally:
+        collector_caps.save()
+        fleet_state.save(zabbix_host, "huawei_bgp")
+        collector_stats.finish()
 
-if __name__ == "__main__":
+def main():
+    global INCREMENTAL
     if len(sys.argv) < 7:
-        print("Usage: huawei_bgp.py <launch_discovery|collect> <host> <port> <user> <password> <zabbix_host>", file=sys.stderr)
+        print("Usage: huawei_bgp.py <launch_discovery|collect> <host> <port> <user> <password> <zabbix_host> [incremental]", file=sys.stderr)
         sys.exit(1)
     mode, host, port, user, password, zabbix_host = sys.argv[1:7]
+    if "incremental" in (arg.lower() for arg in sys.argv[7:]):
+        INCREMENTAL = True
     if mode == "launch_discovery":
         launch_discovery_and_collect(host, port, user, password, zabbix_host)
     elif mode == "collect":
@@ -241,4 +501,7 @@ if __name__ == "__main__":
     else:
         print("ERRO: Modo desconhecido. Use launch_discovery ou collect.", file=sys.stderr)
         sys.exit(2)
+
+if __name__ == "__main__":
+    collector_output.run(main, "huawei_bgp")
         
\ No newline at end of file
@@ -11,51 +11,81 @@ OTIMIZADO: launch_discovery agora executa discovery + coleta em uma unica operac
 """
 
 import sys
-import paramiko
 import re
 import logging
-import tempfile
-import subprocess
 import json
 
+import collector_items
+import collector_output
+import collector_ssh
+import collector_stats
+import collector_tiers
+import zbx_sender
+
 # Desabilita logs do Paramiko
 logging.getLogger("paramiko").setLevel(logging.CRITICAL)
 logging.basicConfig(level=logging.CRITICAL)
 logger = logging.getLogger(__name__)
 
+# Comandos independentes - executados em canais paralelos da mesma sessao SSH
+HEALTH_COMMANDS = {
+    'temperature': 'display temperature ipu | no-more',
+    'power': 'display power | no-more',
+    'cpu': 'display cpu-usage | no-more',
+    'memory': 'display memory-usage | no-more',
+    'version': 'display version | no-more',
+    'fan': 'display fan | no-more',
+    'power_supply': 'display power-supply information | no-more',
+    'health': 'display health | no-more'
+}
+
+# Prefixos das keys alimentadas por cada comando (poda por collector_items na coleta;
+# a saida de 'health' nao alimenta nenhuma key enviada)
+HEALTH_KEYS = {
+    'temperature': ('temperatureInfo',),
+    'power': ('powerInfo',),
+    'cpu': ('cpuUsage',),
+    'memory': ('memoryTotal', 'memoryUsed', 'memoryFree'),
+    'version': ('firmwareVersion', 'firmwareUptime'),
+    'fan': ('fanMean',),
+    'power_supply': ('total_power_usage',),
+    'health': (),
+}
+
+def poll_commands(hostname, discovery=False):
+    """Comandos independentes da proxima execucao (coleta combinada huawei_poll)"""
+    if discovery:
+        return list(HEALTH_COMMANDS.values())
+    collector_tiers.begin(hostname)
+    return [command for name, command in HEALTH_COMMANDS.items()
+            if collector_items.wants_prefix(hostname, *HEALTH_KEYS[name]) and collector_tiers.cached(command) is None]
+
 def ssh_command(ip, port, user, password, command):
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    client.connect(ip, port=int(port), username=user, password=password, look_for_keys=False)
-    stdin, stdout, stderr = client.exec_command(command)
-    output = stdout.read().decode('utf-8', errors='ignore')
-    client.close()
-    return output
+    raw = collector_ssh.run_command(ip, port, user, password, command, timeout=None)
+    return raw.decode('utf-8', errors='ignore')
 
 def ssh_multiple_commands(ip, port, user, password, commands):
-    """Executa múltiplos comandos em uma única sessão SSH"""
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    client.connect(ip, port=int(port), username=user, password=password, look_for_keys=False)
-    
+    """Executa múltiplos comandos em canais paralelos de uma única sessão SSH"""
+    transport = collector_ssh.open_transport(ip, port, user, password, timeout=None)
+    try:
+        raw_results, errors = collector_ssh.exec_parallel(transport, commands)
+    finally:
+        transport.close()
+
     results = {}
-    import time
-    
-    for cmd_name, command in commands.items():
-        try:
-            stdin, stdout, stderr = client.exec_command(command)
-            output = stdout.read().decode('utf-8', errors='ignore')
-            results[cmd_name] = output
-            
-            # Pequeno delay entre comandos para não sobrecarregar
-            time.sleep(0.5)
-            
-        except Exception as e:
-            results[cmd_name] = ""
-    
-    client.close()
+    for cmd_name in commands:
+        raw = raw_results.get(cmd_name, b"")
+        results[cmd_name] = raw.decode('utf-8', errors='ignore')
     return results
 
+def send_zabbix_value(hostname, key, value):
+    """Envia um valor individual para o Zabbix via zabbix_sender"""
+    with collector_stats.stage("send"):
+        sent = zbx_sender.send_value(hostname, key, value)
+    if sent:
+        collector_stats.add_values()
+    return sent is not False
+
 def parse_cpu(cpu_output):
     m = re.search(r"System cpu use rate is\s*:\s*(\d+)%", cpu_output)
     return int(m.group(1)) if m else -1
@@ -179,17 +209,8 @@ def parse_ipu_temperature_full(temperature_output):
     return result
 
 def launch_discovery(ip, port, user, password, hostname):
-    # Define todos os comandos necessários
-    commands = {
-        'temperature': 'display temperature ipu | no-more',
-        'power': 'display power | no-more',
-        'cpu': 'display cpu-usage | no-more',
-        'memory': 'display memory-usage | no-more',
-        'version': 'display version | no-more',
-        'fan': 'display fan | no-more',
-        'power_supply': 'display power-supply information | no-more',
-        'health': 'display health | no-more'
-    }
+    collector_stats.begin(hostname, "huawei_health")
+    commands = HEALTH_COMMANDS
     
     # Tenta executar todos os comandos em uma única sessão SSH
     try:
@@ -212,189 +233,169 @@ def launch_discovery(ip, port, user, password, hostname):
         results['health'] = ssh_command(ip, port, user, password, commands['health'])
     
     # ===== PROCESSAMENTO DE TEMPERATURA =====
-    full_sensors = parse_ipu_temperature_full(results['temperature'])
+    with collector_stats.stage("parse"):
+        full_sensors = parse_ipu_temperature_full(results['temperature'])
     
     # Cria lista para discovery do Zabbix - Temperatura
-    discovery_list = []
-    for entry in full_sensors:
-        discovery_list.append({
-            "{#SLOT}": entry["{#SLOT}"],
-            "{#SENSOR_NAME}": entry["{#SENSOR_NAME}"],
-            "{#I2C}": entry["{#I2C}"],
-            "{#ADDR}": entry["{#ADDR}"],
-            "{#CHL}": entry["{#CHL}"],
-        })
+    with collector_stats.stage("lld"):
+        discovery_list = []
+        for entry in full_sensors:
+            discovery_list.append({
+                "{#SLOT}": entry["{#SLOT}"],
+                "{#SENSOR_NAME}": entry["{#SENSOR_NAME}"],
+                "{#I2C}": entry["{#I2C}"],
+                "{#ADDR}": entry["{#ADDR}"],
+                "{#CHL}": entry["{#CHL}"],
+            })
+        discovery_json = json.dumps({"data": discovery_list})
     
     # Envia discovery de temperatura
-    discovery_json = json.dumps({"data": discovery_list})
-    cmd = [
-        "zabbix_sender", "-z", "127.0.0.1", "-s", hostname,
-        "-k", "temperatureInfo", "-o", discovery_json
-    ]
-    subprocess.run(cmd, capture_output=True)
+    send_zabbix_value(hostname, "temperatureInfo", discovery_json)
     
     # ===== PROCESSAMENTO DE POWER =====
-    power_info = parse_power_info(results['power'])
+    with collector_stats.stage("parse"):
+        power_info = parse_power_info(results['power'])
     
     if power_info:
-        power_discovery_json = json.dumps({"data": power_info})
-        cmd = [
-            "zabbix_sender", "-z", "127.0.0.1", "-s", hostname,
-            "-k", "powerInfo", "-o", power_discovery_json
-        ]
-        subprocess.run(cmd, capture_output=True)
+        with collector_stats.stage("lld"):
+            power_discovery_json = json.dumps({"data": power_info})
+        send_zabbix_value(hostname, "powerInfo", power_discovery_json)
     
     # ===== PROCESSAMENTO DE DADOS GERAIS =====
-    # CPU
-    cpu = parse_cpu(results['cpu'])
-    
-    # Memória
-    total_mem, used_mem, free_mem, used_mem_pct, free_mem_pct = parse_memory(results['memory'])
-    
-    # Versão e Uptime
-    version = parse_version(results['version'])
-    uptime = parse_uptime(results['version'])
-    
-    # Fan
-    fan_speed = parse_fan_speed(results['fan'])
-    
-    # Power Supply
-    total_power = parse_power_supply_info(results['power_supply'])
-    
-    # Health
-    health_cpu, health_mem_pct, health_mem_used, health_mem_total = parse_health_info(results['health'])
+    with collector_stats.stage("parse"):
+        # CPU
+        cpu = parse_cpu(results['cpu'])
+        
+        # Memória
+        total_mem, used_mem, free_mem, used_mem_pct, free_mem_pct = parse_memory(results['memory'])
+        
+        # Versão e Uptime
+        version = parse_version(results['version'])
+        uptime = parse_uptime(results['version'])
+        
+        # Fan
+        fan_speed = parse_fan_speed(results['fan'])
+        
+        # Power Supply
+        total_power = parse_power_supply_info(results['power_supply'])
+        
+        # Health
+        health_cpu, health_mem_pct, health_mem_used, health_mem_total = parse_health_info(results['health'])
     
     # ===== ENVIA DADOS DE TEMPERATURA =====
     for entry in full_sensors:
         key = f'temperatureInfo[{entry["{#SLOT}"]},{entry["{#SENSOR_NAME}"]},{entry["{#I2C}"]},{entry["{#ADDR}"]},{entry["{#CHL}"]}]'
         value = entry["TEMP"]
-        cmd = [
-            "zabbix_sender", "-z", "127.0.0.1", "-s", hostname,
-            "-k", key, "-o", value
-        ]
-        subprocess.run(cmd, capture_output=True)
+        send_zabbix_value(hostname, key, value)
     
     # ===== ENVIA DADOS GERAIS =====
     if cpu != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "cpuUsage", "-o", str(cpu)], capture_output=True)
+        send_zabbix_value(hostname, "cpuUsage", str(cpu))
     if total_mem != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "memoryTotal", "-o", str(total_mem)], capture_output=True)
+        send_zabbix_value(hostname, "memoryTotal", str(total_mem))
     if used_mem != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "memoryUsed", "-o", str(used_mem)], capture_output=True)
+        send_zabbix_value(hostname, "memoryUsed", str(used_mem))
     if free_mem != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "memoryFree", "-o", str(free_mem)], capture_output=True)
+        send_zabbix_value(hostname, "memoryFree", str(free_mem))
     if used_mem_pct != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "memoryUsedPercentage", "-o", str(used_mem_pct)], capture_output=True)
+        send_zabbix_value(hostname, "memoryUsedPercentage", str(used_mem_pct))
     if free_mem_pct != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "memoryFreePercentage", "-o", str(free_mem_pct)], capture_output=True)
+        send_zabbix_value(hostname, "memoryFreePercentage", str(free_mem_pct))
     if version != "unknown":
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "firmwareVersion", "-o", version], capture_output=True)
+        send_zabbix_value(hostname, "firmwareVersion", version)
     if uptime != "unknown":
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "firmwareUptime", "-o", uptime], capture_output=True)
+        send_zabbix_value(hostname, "firmwareUptime", uptime)
     
     # ===== ENVIA DADOS DE FAN =====
     if fan_speed != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "fanMean", "-o", str(fan_speed)], capture_output=True)
+        send_zabbix_value(hostname, "fanMean", str(fan_speed))
     
     # ===== ENVIA DADOS DE POWER =====
     if total_power != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "total_power_usage", "-o", str(total_power)], capture_output=True)
+        send_zabbix_value(hostname, "total_power_usage", str(total_power))
     
+    collector_stats.finish()
     print("Processo iniciado com sucesso!")
 
 def collect(ip, port, user, password, hostname):
-    logger.info("Coletando CPU...")
-    cmd_cpu = "display cpu-usage | no-more"
-    cpu_out = ssh_command(ip, port, user, password, cmd_cpu)
-    cpu = parse_cpu(cpu_out)
-
-    logger.info("Coletando memoria...")
-    cmd_memory = "display memory-usage | no-more"
-    memory_out = ssh_command(ip, port, user, password, cmd_memory)
-    total_mem, used_mem, free_mem, used_mem_pct, free_mem_pct = parse_memory(memory_out)
-
-    logger.info("Coletando versao e uptime...")
-    cmd_version = "display version | no-more"
-    version_out = ssh_command(ip, port, user, password, cmd_version)
-    version = parse_version(version_out)
-    uptime = parse_uptime(version_out)
-
-    logger.info("Coletando temperaturas IPU...")
-    command_temp = "display temperature ipu | no-more"
-    output_temp = ssh_command(ip, port, user, password, command_temp)
-    full_sensors = parse_ipu_temperature_full(output_temp)
-
-    # NOVOS COMANDOS - Fan/Ventiladores
-    logger.info("Coletando dados dos ventiladores...")
-    cmd_fan = "display fan | no-more"
-    fan_out = ssh_command(ip, port, user, password, cmd_fan)
-    fan_speed = parse_fan_speed(fan_out)
-
-    # NOVOS COMANDOS - Power/Energia
-    logger.info("Coletando dados de energia...")
-    cmd_power = "display power | no-more"
-    power_out = ssh_command(ip, port, user, password, cmd_power)
-    power_info = parse_power_info(power_out)
-
-    # NOVOS COMANDOS - Power Supply Info
-    logger.info("Coletando informações de power supply...")
-    cmd_power_supply = "display power-supply information | no-more"
-    power_supply_out = ssh_command(ip, port, user, password, cmd_power_supply)
-    total_power = parse_power_supply_info(power_supply_out)
-
-    # NOVOS COMANDOS - Health
-    logger.info("Coletando dados de saúde do sistema...")
-    cmd_health = "display health | no-more"
-    health_out = ssh_command(ip, port, user, password, cmd_health)
-    health_cpu, health_mem_pct, health_mem_used, health_mem_total = parse_health_info(health_out)
+    collector_stats.begin(hostname, "huawei_health")
+    logger.info("Coletando CPU, memoria, versao, temperaturas, ventiladores e energia...")
+    # Apenas comandos com item ativo no host (sem banco do proxy: todos)
+    commands = {name: command for name, command in HEALTH_COMMANDS.items()
+                if collector_items.wants_prefix(hostname, *HEALTH_KEYS[name])}
+    # Energia e ventiladores: saida em cache ate vencer a classe
+    collector_tiers.begin(hostname)
+    cached = {name: collector_tiers.cached(command) for name, command in commands.items()}
+    cached = {name: output for name, output in cached.items() if output is not None}
+    commands = {name: command for name, command in commands.items() if name not in cached}
+    try:
+        results = ssh_multiple_commands(ip, port, user, password, commands) if commands else {}
+    except Exception:
+        results = {}
+    # Comandos sem saida na sessao paralela sao repetidos em sessao propria
+    for cmd_name, command in commands.items():
+        if not results.get(cmd_name):
+            results[cmd_name] = ssh_command(ip, port, user, password, command)
+        collector_tiers.store(command, results[cmd_name])
+    collector_tiers.save()
+    results.update(cached)
+    for cmd_name in HEALTH_COMMANDS:
+        results.setdefault(cmd_name, "")
+
+    with collector_stats.stage("parse"):
+        cpu = parse_cpu(results['cpu'])
+        total_mem, used_mem, free_mem, used_mem_pct, free_mem_pct = parse_memory(results['memory'])
+        version = parse_version(results['version'])
+        uptime = parse_uptime(results['version'])
+        full_sensors = parse_ipu_temperature_full(results['temperature'])
+        fan_speed = parse_fan_speed(results['fan'])
+        power_info = parse_power_info(results['power'])
+        total_power = parse_power_supply_info(results['power_supply'])
+        health_cpu, health_mem_pct, health_mem_used, health_mem_total = parse_health_info(results['health'])
 
     # envia cada leitura individualmente para evitar erro de lote
     for entry in full_sensors:
         key = f'temperatureInfo[{entry["{#SLOT}"]},{entry["{#SENSOR_NAME}"]},{entry["{#I2C}"]},{entry["{#ADDR}"]},{entry["{#CHL}"]}]'
         value = entry["TEMP"]
-        cmd = [
-            "zabbix_sender", "-z", "127.0.0.1", "-s", hostname,
-            "-k", key, "-o", value
-        ]
         logger.info("Enviando: %s %s %s", hostname, key, value)
-        subprocess.run(cmd, capture_output=True)
+        send_zabbix_value(hostname, key, value)
 
     # envia tambem os dados gerais
     if cpu != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "cpuUsage", "-o", str(cpu)], capture_output=True)
+        send_zabbix_value(hostname, "cpuUsage", str(cpu))
     if total_mem != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "memoryTotal", "-o", str(total_mem)], capture_output=True)
+        send_zabbix_value(hostname, "memoryTotal", str(total_mem))
     if used_mem != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "memoryUsed", "-o", str(used_mem)], capture_output=True)
+        send_zabbix_value(hostname, "memoryUsed", str(used_mem))
     if free_mem != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "memoryFree", "-o", str(free_mem)], capture_output=True)
+        send_zabbix_value(hostname, "memoryFree", str(free_mem))
     if used_mem_pct != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "memoryUsedPercentage", "-o", str(used_mem_pct)], capture_output=True)
+        send_zabbix_value(hostname, "memoryUsedPercentage", str(used_mem_pct))
     if free_mem_pct != -1:
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "memoryFreePercentage", "-o", str(free_mem_pct)], capture_output=True)
+        send_zabbix_value(hostname, "memoryFreePercentage", str(free_mem_pct))
     if version != "unknown":
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "firmwareVersion", "-o", version], capture_output=True)
+        send_zabbix_value(hostname, "firmwareVersion", version)
     if uptime != "unknown":
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "firmwareUptime", "-o", uptime], capture_output=True)
+        send_zabbix_value(hostname, "firmwareUptime", uptime)
     
     # NOVOS DADOS - Fan
     if fan_speed != -1:
         logger.info("Enviando velocidade dos ventiladores: %s", fan_speed)
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "fanMean", "-o", str(fan_speed)], capture_output=True)
+        send_zabbix_value(hostname, "fanMean", str(fan_speed))
     
     # NOVOS DADOS - Power
     if total_power != -1:
         logger.info("Enviando consumo total de potência: %s", total_power)
-        subprocess.run(["zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "total_power_usage", "-o", str(total_power)], capture_output=True)
+        send_zabbix_value(hostname, "total_power_usage", str(total_power))
 
     # Envia discovery de power
     if power_info:
         logger.info("Enviando discovery de power: %s", len(power_info))
-        subprocess.run([
-            "zabbix_sender", "-z", "127.0.0.1", "-s", hostname,
-            "-k", "powerInfo", "-o", json.dumps({"data": power_info})
-        ], capture_output=True)
+        with collector_stats.stage("lld"):
+            power_discovery_json = json.dumps({"data": power_info})
+        send_zabbix_value(hostname, "powerInfo", power_discovery_json)
 
+    collector_stats.finish()
     print("Coleta concluida!")
 
 def main():
@@ -443,4 +444,4 @@ def main():
         print("Modo desconhecido")
 
 if __name__ == '__main__':
-    main()
+    collector_output.run(main, "huawei_health")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Huawei poll - coleta combinada de SFP, BGP e saude de um roteador em uma unica execucao
+
+Usage:
+  huawei_poll.py launch_discovery <ip> <port> <user> <password> <hostname> [dominios]
+  huawei_poll.py collect <ip> <port> <user> <password> <hostname> [dominios]
+
+dominios: lista separada por virgula entre sfp, bgp e health (padrao: todos)
+
+Substitui os itens EXTERNAL huawei_sfp.py, huawei_bgp.py e huawei_health.py do mesmo
+host: um interpretador, um login SSH (collector_ssh.shared_session) com os comandos
+independentes de todos os dominios em canais paralelos, os parsers de cada coletor
+e um unico lote do zabbix_sender (zbx_sender.defer). As keys e o auto-monitoramento
+de cada dominio (collector.*[<script>]) nao mudam; o da execucao combinada vai em
+collector.*[huawei_poll]. As LLDs do launch_discovery entram no mesmo lote.
+"""
+
+import sys
+
+import collector_output
+import collector_ssh
+import collector_stats
+import huawei_bgp
+import huawei_health
+import huawei_sfp
+import zbx_sender
+
+DOMAINS = {
+    "sfp": huawei_sfp,
+    "bgp": huawei_bgp,
+    "health": huawei_health,
+}
+
+
+def prefetch(ip, port, user, password, hostname, domains, discovery):
+    """Executa em canais paralelos os comandos independentes de todos os dominios"""
+    commands = []
+    for name in domains:
+        for command in DOMAINS[name].poll_commands(hostname, discovery):
+            if command not in commands:
+                commands.append(command)
+    try:
+        transport = collector_ssh.open_transport(ip, port, user, password, timeout=10)
+        collector_ssh.exec_parallel(transport, {command: command for command in commands}, timeout=60)
+    except Exception as e:
+        # Cada dominio tenta de novo os comandos que nao vieram aqui
+        print(f"AVISO: Falha no prefetch combinado - {str(e)}", file=sys.stderr)
+
+
+def poll(mode, ip, port, user, password, hostname, domains):
+    run = collector_stats.begin(hostname, "huawei_poll")
+    zbx_sender.defer()
+    failed = []
+    with collector_ssh.shared_session():
+        prefetch(ip, port, user, password, hostname, domains, mode == "launch_discovery")
+        for name in domains:
+            module = DOMAINS[name]
+            print(f"[{name}]")
+            try:
+                if mode == "launch_discovery":
+                    if module is huawei_health:
+                        module.launch_discovery(ip, port, user, password, hostname)
+                    else:
+                        module.launch_discovery_and_collect(ip, port, user, password, hostname)
+                else:
+                    module.collect(ip, port, user, password, hostname)
+            except Exception as e:
+                failed.append(name)
+                print(f"ERRO: Falha no dominio {name} - {str(e)}", file=sys.stderr)
+
+    # Valores de todos os dominios + auto-monitoramento em um unico lote
+    collector_stats.resume(run)
+    lines = zbx_sender.take_deferred()
+    collector_stats.add_values(len(lines))
+    sent = collector_stats.finish(lines)
+    if not sent:
+        print(f"ERRO: Falha no envio do lote combinado ({len(lines)} valores)", file=sys.stderr)
+    elif failed:
+        print(f"PARCIAL: {len(lines)} valores enviados em um lote; falha em {','.join(failed)}")
+    else:
+        print(f"SUCESSO: {len(lines)} valores de {','.join(domains)} enviados em um lote")
+
+
+def main():
+    if len(sys.argv) < 7:
+        print("Uso: huawei_poll.py <launch_discovery|collect> <ip> <port> <user> <password> <hostname> [sfp,bgp,health]", file=sys.stderr)
+        sys.exit(1)
+    mode, ip, port, user, password, hostname = sys.argv[1:7]
+    if mode not in ("launch_discovery", "collect"):
+        print("ERRO: Modo desconhecido. Use launch_discovery ou collect.", file=sys.stderr)
+        sys.exit(2)
+    if port.startswith('{$') or user.startswith('{$') or password.startswith('{$'):
+        print("ERRO: Macros SSH nao resolvidas. Verifique a configuracao do host no Zabbix.", file=sys.stderr)
+        sys.exit(1)
+    domains = [d.strip() for d in (sys.argv[7] if len(sys.argv) > 7 else ",".join(DOMAINS)).split(",") if d.strip()]
+    unknown = [d for d in domains if d not in DOMAINS]
+    if unknown or not domains:
+        print(f"ERRO: Dominio desconhecido: {','.join(unknown)}. Use {','.join(DOMAINS)}.", file=sys.stderr)
+        sys.exit(1)
+    poll(mode, ip, port, user, password, hostname, domains)
+
+
+if __name__ == "__main__":
+    collector_output.run(main, "huawei_poll")
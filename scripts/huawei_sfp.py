@@ -13,14 +13,26 @@ PERFORMANCE: Sequencial otimizado sem debug - versao final para producao
 
 import sys
 import re
-import subprocess
-import paramiko
 import json
 import time
 
+import collector_interfaces
+import collector_output
+import collector_ssh
+import collector_stats
+import fleet_state
+import zbx_sender
+
+# Interfaces coletadas por padrao (sobrescrito por COLLECTOR_IF_RULES)
+RULE_INTERFACES = {"name": r"^100GE", "require_alias": True}
+
 # Cache simples para evitar comandos duplicados
 command_cache = {}
 
+def poll_commands(hostname, discovery=False):
+    """Comandos independentes da proxima execucao (coleta combinada huawei_poll)"""
+    return ["display interface description | no-more"]
+
 def ssh_command_with_cache(ip, port, user, password, command):
     """Executa comando SSH com cache - OTIMIZADO PARA PRODUCAO"""
     global command_cache
@@ -32,17 +44,9 @@ def ssh_command_with_cache(ip, port, user, password, command):
     
     # Executa comando com timeouts otimizados
     try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(ip, port=port, username=user, password=password, 
-                   look_for_keys=False, timeout=10)  # Otimizado
-        stdin, stdout, stderr = ssh.exec_command(command, timeout=20)  # Otimizado
-        raw = stdout.read()
-        try:
-            output = raw.decode("utf-8")
-        except UnicodeDecodeError:
-            output = raw.decode("latin1")
-        ssh.close()
+        raw = collector_ssh.run_command(ip, port, user, password, command,
+                                        timeout=10, command_timeout=20)  # Otimizado
+        output = collector_ssh.decode_output(raw)
         
         # Armazena no cache
         command_cache[cache_key] = output
@@ -58,27 +62,23 @@ def clear_cache():
 
 def send_zabbix_metric(hostname, key, value, timeout=5):
     """Envia metrica individual para Zabbix - OTIMIZADO"""
-    try:
-        result = subprocess.run([
-            "zabbix_sender", "-z", "127.0.0.1", "-s", hostname, 
-            "-k", key, "-o", str(value)
-        ], capture_output=True, timeout=timeout, text=True)
-        return result.returncode == 0
-    except Exception:
-        return False
+    with collector_stats.stage("send"):
+        sent = zbx_sender.send_value(hostname, key, value, timeout=timeout)
+    if sent:
+        collector_stats.add_values()
+    return sent is not False
 
-def get_interfaces(ip, port, user, password):
+def get_interfaces(ip, port, user, password, hostname=None):
     """Funcao original para obter interfaces - com cache otimizado"""
     output = ssh_command_with_cache(ip, port, user, password, "display interface description | no-more")
     
-    interfaces = {}
-    for line in output.splitlines():
-        m = re.match(r"(\S+)\s+\S+\s+\S+\s+(.*)", line.strip())
-        if m:
-            ifname = m.group(1)
-            ifalias = m.group(2).strip()
-            if ifname.startswith("100GE") and ifalias:
-                interfaces[ifname] = ifalias
+    rows = []
+    with collector_stats.stage("parse"):
+        for line in output.splitlines():
+            m = re.match(r"(\S+)\s+(\S+)\s+\S+\s+(.*)", line.strip())
+            if m:
+                rows.append((m.group(1), m.group(2), m.group(3).strip()))
+        interfaces = collector_interfaces.select(hostname, "huawei_sfp", rows, RULE_INTERFACES)
     
     return interfaces
 
@@ -110,39 +110,36 @@ def parse_optical_output(output):
 
 def launch_discovery_original(ip, port, user, password, hostname):
     """Funcao original de discovery que funcionava - OTIMIZADO"""
-    interfaces = get_interfaces(ip, port, user, password)
+    interfaces = get_interfaces(ip, port, user, password, hostname)
     discovery_gbic = []
     discovery_tempvolt = []
     
-    for ifname, ifalias in interfaces.items():
-        for lane in range(4):
-            discovery_gbic.append({
+    with collector_stats.stage("lld"):
+        for ifname, ifalias in interfaces.items():
+            for lane in range(4):
+                discovery_gbic.append({
+                    "{#IFNAME}": ifname,
+                    "{#IFALIAS}": ifalias,
+                    "{#GBIC_LANE}": f"Lane {lane}"
+                })
+            discovery_tempvolt.append({
                 "{#IFNAME}": ifname,
-                "{#IFALIAS}": ifalias,
-                "{#GBIC_LANE}": f"Lane {lane}"
+                "{#IFALIAS}": ifalias
             })
-        discovery_tempvolt.append({
-            "{#IFNAME}": ifname,
-            "{#IFALIAS}": ifalias
-        })
-    
-    # Discovery otimizado
-    subprocess.run([
-        "zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "discovery_gbic", 
-        "-o", json.dumps({"data": discovery_gbic})
-    ], capture_output=True, timeout=8)
+        payload_gbic = json.dumps({"data": discovery_gbic})
+        payload_tempvolt = json.dumps({"data": discovery_tempvolt})
     
-    subprocess.run([
-        "zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "discovery_gbic_temp_volt", 
-        "-o", json.dumps({"data": discovery_tempvolt})
-    ], capture_output=True, timeout=8)
+    # Discovery otimizado (as duas LLDs em uma chamada)
+    with collector_stats.stage("send"):
+        zbx_sender.send_discovery(hostname, {"discovery_gbic": payload_gbic,
+                                             "discovery_gbic_temp_volt": payload_tempvolt})
 
 def collect_original_optimized(ip, port, user, password, hostname):
     """Funcao original de collect OTIMIZADA - versao final"""
     start_time = time.time()
     
     # Reutiliza interfaces do cache se ja foram obtidas no discovery
-    interfaces = get_interfaces(ip, port, user, password)
+    interfaces = get_interfaces(ip, port, user, password, hostname)
     
     success_count = 0
     error_count = 0
@@ -153,7 +150,10 @@ def collect_original_optimized(ip, port, user, password, hostname):
             command = f"display optical-module extend information interface {ifname} | no-more"
             output = ssh_command_with_cache(ip, port, user, password, command)
             
-            values = parse_optical_output(output)
+            with collector_stats.stage("parse"):
+                values = parse_optical_output(output)
+                for i in range(4):
+                    fleet_state.add_lane(ifname, f"Lane {i}", values.get(f"rxpower_{i}"), values.get(f"txpower_{i}"))
 
             # Temp e volt (sem lane)
             if "temp" in values:
@@ -191,6 +191,7 @@ def launch_discovery_and_collect(ip, port, user, password, hostname):
     """Executa discovery e coleta OTIMIZADO - versao final para producao"""
     try:
         start_time = time.time()
+        collector_stats.begin(hostname, "huawei_sfp", benchmark_key="benchmark_discovery")
         
         # Limpa cache
         clear_cache()
@@ -215,10 +216,13 @@ def launch_discovery_and_collect(ip, port, user, password, hostname):
         print(f"ERRO: Falha na execucao do processo - {str(e)}", file=sys.stderr)
     finally:
         clear_cache()
+        fleet_state.save(hostname, "huawei_sfp")
+        collector_stats.finish()
 
 def collect(ip, port, user, password, hostname):
     """Funcao de collect para compatibilidade - OTIMIZADA"""
     try:
+        collector_stats.begin(hostname, "huawei_sfp")
         clear_cache()
         
         success_count, error_count, elapsed = collect_original_optimized(ip, port, user, password, hostname)
@@ -234,6 +238,8 @@ def collect(ip, port, user, password, hostname):
         print(f"ERRO: Falha na execucao do processo - {str(e)}", file=sys.stderr)
     finally:
         clear_cache()
+        fleet_state.save(hostname, "huawei_sfp")
+        collector_stats.finish()
 
 def main():
     if len(sys.argv) < 2:
@@ -258,4 +264,4 @@ def main():
         sys.exit(2)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    collector_output.run(main, "huawei_sfp")
\ No newline at end of file
@@ -4,23 +4,63 @@
 Huawei Switch SFP collector - adaptado para switches da linha CE/S series
 
 Usage:
-  huawei_sw_sfp.py launch_discovery <ip> <port> <user> <password> <hostname>
-  huawei_sw_sfp.py collect <ip> <port> <user> <password> <hostname>
+  huawei_sw_sfp.py launch_discovery <ip> <port> <user> <password> <hostname> [debug] [summary]
+  huawei_sw_sfp.py collect <ip> <port> <user> <password> <hostname> [debug] [summary]
 
 OTIMIZADO: Para switches Huawei CE/S series com comandos específicos para BGP, hardware e SFP
 PERFORMANCE: Sequencial otimizado sem debug - versao final para producao
 """
 
 import sys
+import os
 import re
-import subprocess
-import paramiko
 import json
 import time
 import signal
 
+import collector_caps
+import collector_filters
+import collector_interfaces
+import collector_items
+import collector_output
+import collector_ssh
+import collector_stats
+import collector_tiers
+import fleet_state
+import zbx_sender
+
 # Removido sistema de cache - execução direta
 
+# Interfaces coletadas por padrao (sobrescrito por COLLECTOR_IF_RULES); o caminho
+# de comando combinado do launch_discovery nao inclui GigabitEthernet
+RULE_INTERFACES = {"name": "XGE|100GE|25GE|40GE|GigabitEthernet", "phy": ["up"]}
+RULE_INTERFACES_COMBINED = {"name": "XGE|100GE|25GE|40GE", "phy": ["up"]}
+
+# Variantes do comando de transceiver por interface (a que funciona no equipamento
+# fica em collector_caps, invalidada pela mudanca do display version)
+TRANSCEIVER_COMMANDS = (
+    "display transceiver verbose interface {ifname}",
+    "display transceiver interface {ifname}",
+)
+
+# Modo resumo das interfaces multi-lane (SFP_LANE_SUMMARY=1 ou argumento "summary"):
+# envia SFP_LANE_STATS (min/max/avg/spread; max = min + spread) por interface e metrica;
+# os valores por lane so vao a cada SFP_LANE_DETAIL_INTERVAL segundos ou enquanto o
+# spread passar do limite da metrica
+LANE_SUMMARY = os.environ.get("SFP_LANE_SUMMARY", "0") == "1"
+LANE_STATS = [s.strip() for s in os.environ.get("SFP_LANE_STATS", "min,avg,spread").split(",") if s.strip()]
+LANE_DETAIL_INTERVAL = int(os.environ.get("SFP_LANE_DETAIL_INTERVAL", "3600"))
+LANE_STATE_DIR = os.environ.get("SFP_LANE_STATE_DIR", "/tmp/sfp_lane_state")
+LANE_KEYS = {"bias_current": "currML", "tx_power": "txpowerML", "rx_power": "rxpowerML"}
+LANE_SPREAD = {
+    "bias_current": float(os.environ.get("SFP_LANE_SPREAD_MA", "10")),
+    "tx_power": float(os.environ.get("SFP_LANE_SPREAD_DB", "3")),
+    "rx_power": float(os.environ.get("SFP_LANE_SPREAD_DB", "3")),
+}
+
+# interface -> epoch do ultimo envio por lane (carregado de LANE_STATE_DIR/<host>.json)
+_lane_detail = None
+
 def timeout_handler(signum, frame):
     """Handler para timeout geral"""
     raise TimeoutError("Script timeout - execução excedeu 30 segundos")
@@ -39,10 +79,7 @@ def ssh_execute_commands_batch(ip, port, user, password, commands, debug=False):
         if debug:
             print(f"DEBUG: Executando batch de {len(commands)} comandos SSH")
         
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(ip, port=port, username=user, password=password, 
-                   look_for_keys=False, timeout=5)
+        ssh = collector_ssh.open_transport(ip, port, user, password, timeout=5)
         
         # Constrói comando completo com screen-length no início
         full_command = "screen-length 0 temporary\n" + "\n".join(commands)
@@ -50,17 +87,13 @@ def ssh_execute_commands_batch(ip, port, user, password, commands, debug=False):
         if debug:
             print(f"DEBUG: Executando comando combinado: {full_command[:200]}...")
         
-        _, stdout, stderr = ssh.exec_command(full_command, timeout=25)
-        raw_output = stdout.read()
-        error_output = stderr.read().decode('utf-8', errors='ignore')
+        raw_output, raw_error = collector_ssh.exec_command(ssh, full_command, timeout=25, with_stderr=True)
+        error_output = raw_error.decode('utf-8', errors='ignore')
         
         if debug and error_output:
             print(f"DEBUG: SSH stderr: {error_output[:200]}")
         
-        try:
-            full_output = raw_output.decode("utf-8")
-        except UnicodeDecodeError:
-            full_output = raw_output.decode("latin1")
+        full_output = collector_ssh.decode_output(raw_output)
         
         ssh.close()
         
@@ -102,26 +135,48 @@ def ssh_execute_commands_batch(ip, port, user, password, commands, debug=False):
             print(f"DEBUG: Erro SSH batch: {str(e)}")
         raise Exception(f"Erro SSH em batch: {str(e)}")
 
+# Saidas obtidas antecipadamente em canais paralelos (comando -> saida)
+_command_cache = {}
+
+def prefetch_commands(ip, port, user, password, commands, debug=False):
+    """Executa comandos independentes em canais paralelos de uma unica sessao SSH"""
+    pending = {command: f"screen-length 0 temporary; {command}"
+               for command in commands if command not in _command_cache}
+    if not pending:
+        return
+    ssh = None
+    try:
+        ssh = collector_ssh.open_transport(ip, port, user, password, timeout=3, banner_timeout=5)
+        results, errors = collector_ssh.exec_parallel(ssh, pending, timeout=8)
+    except Exception as e:
+        # Comandos nao obtidos aqui sao executados individualmente depois
+        if debug:
+            print(f"DEBUG: Erro SSH no prefetch paralelo: {str(e)}")
+        return
+    finally:
+        if ssh:
+            ssh.close()
+    for command, raw in results.items():
+        _command_cache[command] = collector_ssh.decode_output(raw)
+    if debug:
+        print(f"DEBUG: Prefetch paralelo: {len(results)} comandos, {len(errors)} falhas")
+        for command, error in errors.items():
+            print(f"DEBUG: Prefetch falhou em '{command}': {str(error)}")
+
 def ssh_command_simple(ip, port, user, password, command, debug=False):
-    """Executa comando SSH simples sem cache"""
+    """Executa comando SSH simples (usa a saida do prefetch quando disponivel)"""
+    if command in _command_cache:
+        return _command_cache[command]
     ssh = None
     try:
         if debug:
             print(f"DEBUG: Executando comando SSH: '{command}'")
         
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(ip, port=port, username=user, password=password, 
-                   look_for_keys=False, timeout=3, banner_timeout=5)
+        ssh = collector_ssh.open_transport(ip, port, user, password, timeout=3, banner_timeout=5)
         
         full_command = f"screen-length 0 temporary; {command}"
-        _, stdout, stderr = ssh.exec_command(full_command, timeout=8)
-        raw = stdout.read()
-        
-        try:
-            output = raw.decode("utf-8")
-        except UnicodeDecodeError:
-            output = raw.decode("latin1")
+        raw = collector_ssh.exec_command(ssh, full_command, timeout=8)
+        output = collector_ssh.decode_output(raw)
         
         ssh.close()
         return output
@@ -137,23 +192,21 @@ def ssh_command_simple(ip, port, user, password, command, debug=False):
         raise Exception(f"Erro SSH em '{command}': {str(e)}")
 
 def clear_cache():
-    """Função mantida para compatibilidade - não faz nada"""
-    pass
+    """Limpa as saidas obtidas no prefetch"""
+    _command_cache.clear()
 
 def send_zabbix_metric(hostname, key, value, timeout=3):
     """Envia metrica individual para Zabbix - OTIMIZADO"""
-    try:
-        result = subprocess.run([
-            "zabbix_sender", "-z", "127.0.0.1", "-s", hostname, 
-            "-k", key, "-o", str(value)
-        ], capture_output=True, timeout=timeout, text=True)
-        return result.returncode == 0
-    except Exception:
-        return False
+    with collector_stats.stage("send"):
+        sent = zbx_sender.send_value(hostname, key, value, timeout=timeout)
+    if sent:
+        collector_stats.add_values()
+    return sent is not False
 
 def get_bgp_peers_ipv4(ip, port, user, password, debug=False):
     """Obtem peers BGP IPv4"""
-    output = ssh_command_simple(ip, port, user, password, "display bgp peer verbose", debug)
+    output = collector_filters.run("display bgp peer verbose",
+                                   lambda command: ssh_command_simple(ip, port, user, password, command, debug))
     
     peers = {}
     current_peer = None
@@ -197,7 +250,8 @@ def get_bgp_peers_ipv4(ip, port, user, password, debug=False):
 
 def get_bgp_peers_ipv6(ip, port, user, password, debug=False):
     """Obtem peers BGP IPv6"""
-    output = ssh_command_simple(ip, port, user, password, "display bgp ipv6 peer verbose", debug)
+    output = collector_filters.run("display bgp ipv6 peer verbose",
+                                   lambda command: ssh_command_simple(ip, port, user, password, command, debug))
     
     peers = {}
     current_peer = None
@@ -352,11 +406,12 @@ def get_version_info(ip, port, user, password, debug=False):
     
     return version_data
 
-def get_interfaces(ip, port, user, password):
+def get_interfaces(ip, port, user, password, hostname=None):
     """Obtem interfaces com descrição"""
-    output = ssh_command_simple(ip, port, user, password, "display interface description")
+    output = collector_filters.run("display interface description",
+                                   lambda command: ssh_command_simple(ip, port, user, password, command))
     
-    interfaces = {}
+    rows = []
     for line in output.splitlines():
         line = line.strip()
         # Ignora linhas de cabeçalho e informações
@@ -375,32 +430,24 @@ def get_interfaces(ip, port, user, password):
             proto_status = parts[2]
             # Descrição pode ter espaços, junta tudo depois da 3ª coluna
             ifalias = " ".join(parts[3:]) if len(parts) > 3 else ""
-            
-            # Inclui apenas interfaces físicas com SFP/transceivers
-            if any(x in ifname for x in ["XGE", "100GE", "25GE", "40GE", "GigabitEthernet"]):
-                # Só inclui interfaces que estão UP fisicamente (têm transceiver)
-                if phy_status == "up":
-                    interfaces[ifname] = ifalias if ifalias else "No Description"
+            rows.append((ifname, phy_status, ifalias))
     
-    return interfaces
+    # Por padrao apenas interfaces físicas com SFP/transceivers e UP fisicamente
+    selected = collector_interfaces.select(hostname, "huawei_sw_sfp", rows, RULE_INTERFACES)
+    return {ifname: ifalias or "No Description" for ifname, ifalias in selected.items()}
 
 def get_transceiver_info(ip, port, user, password, interface, debug=False):
     """Obtem informações detalhadas do transceiver para uma interface específica"""
-    try:
-        # Tenta primeiro comando verbose
-        output = ssh_command_simple(ip, port, user, password, f"display transceiver verbose interface {interface}", debug)
-    except Exception as e:
+    # Variante aprendida primeiro; as demais so quando ela falha no equipamento
+    output = collector_caps.choose(
+        "transceiver", TRANSCEIVER_COMMANDS,
+        lambda command: collector_filters.run(
+            command, lambda variant: ssh_command_simple(ip, port, user, password, variant, debug)),
+        ifname=interface)
+    if output is None:
         if debug:
-            print(f"DEBUG: Comando verbose falhou para {interface}: {str(e)}")
-        try:
-            # Fallback para comando simples
-            output = ssh_command_simple(ip, port, user, password, f"display transceiver interface {interface}", debug)
-            if debug:
-                print(f"DEBUG: Usando comando simples para {interface}")
-        except Exception as e2:
-            if debug:
-                print(f"DEBUG: Ambos comandos falharam para {interface}: {str(e2)}")
-            return {}
+            print(f"DEBUG: Nenhuma variante do comando de transceiver funcionou para {interface}")
+        return {}
     
     transceiver_data = {}
     
@@ -614,67 +661,151 @@ def parse_transceiver_output(output, interface, debug=False):
     
     return transceiver_data
 
+def transceiver_section(full_output, ifname):
+    """Trecho do display transceiver verbose de uma interface (None se ausente)"""
+    header = f"{ifname} transceiver information:"
+    start_idx = full_output.find(header)
+    if start_idx == -1:
+        return None
+    # Fim da seção: inicio da linha do proximo cabecalho (ou fim da saida)
+    next_header = full_output.find(" transceiver information:", start_idx + len(header))
+    if next_header == -1:
+        return full_output[start_idx:]
+    return full_output[start_idx:full_output.rfind("\n", start_idx, next_header) + 1 or next_header]
+
+def add_fleet_lanes(interface, transceiver_data):
+    """Registra rx/tx das lanes da interface no snapshot da frota (fleet_state)"""
+    if "rx_power" in transceiver_data or "tx_power" in transceiver_data:
+        fleet_state.add_lane(interface, "0", transceiver_data.get("rx_power"), transceiver_data.get("tx_power"))
+        return
+    lane = 0
+    while f"rx_power_lane_{lane}" in transceiver_data or f"tx_power_lane_{lane}" in transceiver_data:
+        fleet_state.add_lane(interface, str(lane), transceiver_data.get(f"rx_power_lane_{lane}"),
+                             transceiver_data.get(f"tx_power_lane_{lane}"))
+        lane += 1
+
+def lane_summary(transceiver_data):
+    """Resumo das lanes por metrica: {metrica: {min, max, avg, spread}}"""
+    summary = {}
+    for base in LANE_KEYS:
+        values = []
+        lane = 0
+        while f"{base}_lane_{lane}" in transceiver_data:
+            try:
+                values.append(float(transceiver_data[f"{base}_lane_{lane}"]))
+            except ValueError:
+                pass
+            lane += 1
+        if values:
+            low, high = min(values), max(values)
+            summary[base] = {
+                "min": round(low, 2),
+                "max": round(high, 2),
+                "avg": round(sum(values) / len(values), 2),
+                "spread": round(high - low, 2),
+            }
+    return summary
+
+def summary_values(ifname, summary, sfp_keys=False):
+    """Pares (key, valor) do resumo: <metrica>ML.<stat>[<interface>] (keys do
+    launch_discovery) ou, com sfp_keys, interface.sfp.<metrica>.<stat>[<interface>]
+    (keys do collect)"""
+    values = []
+    for base, stats in summary.items():
+        name = f"interface.sfp.{base}" if sfp_keys else LANE_KEYS[base]
+        for stat in LANE_STATS:
+            if stat in stats:
+                values.append((f"{name}.{stat}[{ifname}]", stats[stat]))
+    return values
+
+def _lane_state_file(hostname):
+    safe = "".join(c if c.isalnum() or c in "-._" else "_" for c in hostname)
+    return os.path.join(LANE_STATE_DIR, f"{safe}.json")
+
+def lane_detail_due(hostname, ifname, summary):
+    """Indica se os valores por lane da interface devem ser enviados nesta execucao"""
+    global _lane_detail
+    if _lane_detail is None:
+        try:
+            with open(_lane_state_file(hostname)) as f:
+                _lane_detail = json.load(f)
+        except (OSError, ValueError):
+            _lane_detail = {}
+    # Lane divergente: detalhe em toda execucao, sem alterar o agendamento
+    if any(stats["spread"] > LANE_SPREAD[base] for base, stats in summary.items()):
+        return True
+    now = int(time.time())
+    if now - _lane_detail.get(ifname, 0) >= LANE_DETAIL_INTERVAL:
+        _lane_detail[ifname] = now
+        return True
+    return False
+
+def save_lane_detail(hostname):
+    """Grava o horario do ultimo envio por lane de cada interface"""
+    global _lane_detail
+    if _lane_detail is None:
+        return
+    path = _lane_state_file(hostname)
+    try:
+        os.makedirs(LANE_STATE_DIR, exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(_lane_detail, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        pass
+    _lane_detail = None
+
 def launch_discovery_original(ip, port, user, password, hostname):
     """Discovery para switches Huawei"""
-    interfaces = get_interfaces(ip, port, user, password)
-    bgp_peers_v4 = get_bgp_peers_ipv4(ip, port, user, password)
-    bgp_peers_v6 = get_bgp_peers_ipv6(ip, port, user, password)
-    
-    # Discovery de interfaces SFP - separa single e multi-lane
-    discovery_single = []
-    discovery_multi = []
+    with collector_stats.stage("parse"):
+        interfaces = get_interfaces(ip, port, user, password, hostname)
+        bgp_peers_v4 = get_bgp_peers_ipv4(ip, port, user, password)
+        bgp_peers_v6 = get_bgp_peers_ipv6(ip, port, user, password)
     
-    for ifname, ifalias in interfaces.items():
-        if "100GE" in ifname:
-            # Multi-lane interface - adiciona com lane 0 por padrão
-            discovery_multi.append({
-                "{#IFNAME}": ifname,
-                "{#IFALIAS}": ifalias,
-                "{#GBIC_LANE}": "0"
+    with collector_stats.stage("lld"):
+        # Discovery de interfaces SFP - separa single e multi-lane
+        discovery_single = []
+        discovery_multi = []
+        
+        for ifname, ifalias in interfaces.items():
+            if "100GE" in ifname:
+                # Multi-lane interface - adiciona com lane 0 por padrão
+                discovery_multi.append({
+                    "{#IFNAME}": ifname,
+                    "{#IFALIAS}": ifalias,
+                    "{#GBIC_LANE}": "0"
+                })
+            else:
+                # Single-lane interface
+                discovery_single.append({
+                    "{#IFNAME}": ifname,
+                    "{#IFALIAS}": ifalias
+                })
+        
+        # Discovery de peers BGP IPv4
+        discovery_bgp_v4 = []
+        for peer_ip in bgp_peers_v4.keys():
+            discovery_bgp_v4.append({
+                "{#BGP_PEER}": peer_ip
             })
-        else:
-            # Single-lane interface
-            discovery_single.append({
-                "{#IFNAME}": ifname,
-                "{#IFALIAS}": ifalias
+        
+        # Discovery de peers BGP IPv6
+        discovery_bgp_v6 = []
+        for peer_ip in bgp_peers_v6.keys():
+            discovery_bgp_v6.append({
+                "{#BGP_PEER_V6}": peer_ip
             })
     
-    # Discovery de peers BGP IPv4
-    discovery_bgp_v4 = []
-    for peer_ip in bgp_peers_v4.keys():
-        discovery_bgp_v4.append({
-            "{#BGP_PEER}": peer_ip
-        })
-    
-    # Discovery de peers BGP IPv6
-    discovery_bgp_v6 = []
-    for peer_ip in bgp_peers_v6.keys():
-        discovery_bgp_v6.append({
-            "{#BGP_PEER_V6}": peer_ip
-        })
-    
-    # Envia discoveries SFP
+    # Envia discoveries SFP e BGP em uma chamada
+    discoveries = {}
     if discovery_single:
-        subprocess.run([
-            "zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "discovery_gbic_single", 
-            "-o", json.dumps({"data": discovery_single})
-        ], capture_output=True, timeout=8)
-        
+        discoveries["discovery_gbic_single"] = json.dumps({"data": discovery_single})
     if discovery_multi:
-        subprocess.run([
-            "zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "discovery_gbic_multi", 
-            "-o", json.dumps({"data": discovery_multi})
-        ], capture_output=True, timeout=8)
-    
-    subprocess.run([
-        "zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "discovery_bgp_peers", 
-        "-o", json.dumps({"data": discovery_bgp_v4})
-    ], capture_output=True, timeout=8)
-    
-    subprocess.run([
-        "zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "discovery_bgp_peers_v6", 
-        "-o", json.dumps({"data": discovery_bgp_v6})
-    ], capture_output=True, timeout=8)
+        discoveries["discovery_gbic_multi"] = json.dumps({"data": discovery_multi})
+    discoveries["discovery_bgp_peers"] = json.dumps({"data": discovery_bgp_v4})
+    discoveries["discovery_bgp_peers_v6"] = json.dumps({"data": discovery_bgp_v6})
+    with collector_stats.stage("send"):
+        zbx_sender.send_discovery(hostname, discoveries)
 
 def collect_original_optimized(ip, port, user, password, hostname, debug=False):
     """Coleta otimizada para switches Huawei"""
@@ -684,11 +815,55 @@ def collect_original_optimized(ip, port, user, password, hostname, debug=False):
     error_count = 0
     
     try:
+        # Apenas grupos com item ativo no host (collector_items; sem banco coleta tudo)
+        wants = lambda *prefixes: collector_items.wants_prefix(hostname, *prefixes)
+        want_bgp_v4 = wants(*(f"bgp.peer.{metric}[" for metric in ("remote_as", "state", "state_num", "received_routes")))
+        want_bgp_v6 = wants("bgp.peer.v6.")
+        want_power = wants("system.power.")
+        want_fan = wants("system.fan_")
+        want_version = wants("system.software_", "system.device_model", "system.uptime", "system.bootrom_version")
+        want_sfp = wants("interface.sfp.")
+        commands = [
+            ("display bgp peer verbose", want_bgp_v4),
+            ("display bgp ipv6 peer verbose", want_bgp_v6),
+            ("display power", want_power),
+            ("display power manage power-information", want_power),
+            ("display fan", want_fan),
+            # display version tambem valida o cache de capacidades (collector_caps)
+            ("display version", want_version or want_sfp),
+            ("display interface description", want_sfp),
+        ]
+        if debug:
+            print(f"DEBUG: Comandos sem item ativo: {[cmd for cmd, wanted in commands if not wanted]}")
+
+        # Comandos independentes em canais paralelos de uma unica sessao (com os
+        # filtros VRP aceitos pelo equipamento, collector_filters); energia e ventiladores
+        # vem do cache da classe enquanto o intervalo nao vence (collector_tiers)
+        collector_caps.begin(hostname)
+        collector_tiers.begin(hostname)
+        pending = []
+        for command in (collector_filters.command(cmd) for cmd, wanted in commands if wanted):
+            output = collector_tiers.cached(command)
+            if output is None:
+                pending.append(command)
+            else:
+                _command_cache[command] = output
+        if debug:
+            print(f"DEBUG: Comandos servidos do cache de classes: {list(_command_cache)}")
+        prefetch_commands(ip, port, user, password, pending, debug)
+        for command in pending:
+            collector_tiers.store(command, _command_cache.get(command))
+        collector_tiers.save()
+        collector_caps.validate(_command_cache.get("display version"))
+
         # Coleta BGP IPv4
         if debug:
             print("DEBUG: Coletando BGP IPv4 peers...")
-        bgp_peers_v4 = get_bgp_peers_ipv4(ip, port, user, password, debug)
+        with collector_stats.stage("parse"):
+            bgp_peers_v4 = get_bgp_peers_ipv4(ip, port, user, password, debug) if want_bgp_v4 else {}
         for peer, data in bgp_peers_v4.items():
+            if "state" in data:
+                fleet_state.add_peer(peer, data["state"] == "Established")
             for metric, value in data.items():
                 key = f"bgp.peer.{metric}[{peer}]"
                 if send_zabbix_metric(hostname, key, value):
@@ -701,8 +876,11 @@ def collect_original_optimized(ip, port, user, password, hostname, debug=False):
         # Coleta BGP IPv6
         if debug:
             print("DEBUG: Coletando BGP IPv6 peers...")
-        bgp_peers_v6 = get_bgp_peers_ipv6(ip, port, user, password, debug)
+        with collector_stats.stage("parse"):
+            bgp_peers_v6 = get_bgp_peers_ipv6(ip, port, user, password, debug) if want_bgp_v6 else {}
         for peer, data in bgp_peers_v6.items():
+            if "state" in data:
+                fleet_state.add_peer(peer, data["state"] == "Established")
             for metric, value in data.items():
                 key = f"bgp.peer.v6.{metric}[{peer}]"
                 if send_zabbix_metric(hostname, key, value):
@@ -715,7 +893,8 @@ def collect_original_optimized(ip, port, user, password, hostname, debug=False):
         # Coleta informações de energia
         if debug:
             print("DEBUG: Coletando informações de energia...")
-        power_data = get_power_info(ip, port, user, password, debug)
+        with collector_stats.stage("parse"):
+            power_data = get_power_info(ip, port, user, password, debug) if want_power else {}
         for metric, value in power_data.items():
             if send_zabbix_metric(hostname, f"system.power.{metric}", value):
                 success_count += 1
@@ -725,7 +904,8 @@ def collect_original_optimized(ip, port, user, password, hostname, debug=False):
         # Coleta informações dos ventiladores
         if debug:
             print("DEBUG: Coletando informações dos ventiladores...")
-        fan_data = get_fan_info(ip, port, user, password, debug)
+        with collector_stats.stage("parse"):
+            fan_data = get_fan_info(ip, port, user, password, debug) if want_fan else {}
         for metric, value in fan_data.items():
             if send_zabbix_metric(hostname, f"system.{metric}", value):
                 success_count += 1
@@ -735,7 +915,8 @@ def collect_original_optimized(ip, port, user, password, hostname, debug=False):
         # Coleta informações de versão/sistema
         if debug:
             print("DEBUG: Coletando informações de versão...")
-        version_data = get_version_info(ip, port, user, password, debug)
+        with collector_stats.stage("parse"):
+            version_data = get_version_info(ip, port, user, password, debug) if want_version else {}
         for metric, value in version_data.items():
             if send_zabbix_metric(hostname, f"system.{metric}", value):
                 success_count += 1
@@ -745,11 +926,33 @@ def collect_original_optimized(ip, port, user, password, hostname, debug=False):
         # Coleta SFP/Transceivers
         if debug:
             print("DEBUG: Coletando SFP/Transceivers...")
-        interfaces = get_interfaces(ip, port, user, password)
+        with collector_stats.stage("parse"):
+            interfaces = get_interfaces(ip, port, user, password, hostname) if want_sfp else {}
+            interfaces = {ifname: alias for ifname, alias in interfaces.items()
+                          if collector_items.wants_param(hostname, ifname)}
+        transceiver_command = collector_caps.command("transceiver", TRANSCEIVER_COMMANDS)
+        if transceiver_command is None:
+            if debug:
+                print("DEBUG: Equipamento sem suporte ao comando de transceiver (collector_caps)")
+            interfaces = {}
+        prefetch_commands(ip, port, user, password,
+                          [collector_filters.command(transceiver_command.format(ifname=ifname))
+                           for ifname in interfaces], debug)
         for ifname in interfaces.keys():
             try:
-                transceiver_data = get_transceiver_info(ip, port, user, password, ifname, debug)
+                with collector_stats.stage("parse"):
+                    transceiver_data = get_transceiver_info(ip, port, user, password, ifname, debug)
+                    add_fleet_lanes(ifname, transceiver_data)
+                    summary = lane_summary(transceiver_data) if LANE_SUMMARY else {}
+                send_lanes = not summary or lane_detail_due(hostname, ifname, summary)
+                for key, value in summary_values(ifname, summary, sfp_keys=True):
+                    if send_zabbix_metric(hostname, key, value):
+                        success_count += 1
+                    else:
+                        error_count += 1
                 for metric, value in transceiver_data.items():
+                    if "_lane_" in metric and not send_lanes:
+                        continue
                     key = f"interface.sfp.{metric}[{ifname}]"
                     if send_zabbix_metric(hostname, key, value):
                         success_count += 1
@@ -772,6 +975,7 @@ def launch_discovery_and_collect(ip, port, user, password, hostname, debug=False
     """Executa discovery e coleta SUPER SIMPLES - APENAS 3 COMANDOS"""
     try:
         start_time = time.time()
+        stats = collector_stats.begin(hostname, "huawei_sw_sfp", benchmark_key="benchmark_discovery")
         
         if debug:
             print("DEBUG: Iniciando coleta SFP simplificada...")
@@ -791,10 +995,7 @@ def launch_discovery_and_collect(ip, port, user, password, hostname, debug=False
         # Executa tudo em uma única sessão
         ssh = None
         try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(ip, port=port, username=user, password=password, 
-                       look_for_keys=False, timeout=3, banner_timeout=5)
+            ssh = collector_ssh.open_transport(ip, port, user, password, timeout=3, banner_timeout=5)
             
             # Comando combinado exatamente como você pediu
             full_command = """screen-length 0 temporary
@@ -804,13 +1005,8 @@ display transceiver verbose"""
             if debug:
                 print("DEBUG: Executando comando combinado...")
             
-            _, stdout, stderr = ssh.exec_command(full_command, timeout=15)
-            raw_output = stdout.read()
-            
-            try:
-                full_output = raw_output.decode("utf-8")
-            except UnicodeDecodeError:
-                full_output = raw_output.decode("latin1")
+            raw_output = collector_ssh.exec_command(ssh, full_command, timeout=15)
+            full_output = collector_ssh.decode_output(raw_output)
             
             ssh.close()
             
@@ -818,130 +1014,123 @@ display transceiver verbose"""
                 print(f"DEBUG: Comando executado. Output size: {len(full_output)} chars")
                 print(f"DEBUG: Primeiras 1000 chars: {full_output[:1000]}")
             
-            # Parse interfaces da saída combinada
-            interfaces = {}
-            lines = full_output.splitlines()
+            with collector_stats.stage("parse"):
+                # Parse interfaces da saída combinada
+                rows = []
+                lines = full_output.splitlines()
             
-            # Procura pela seção de interfaces (após display interface description)
-            interface_section = False
-            for line in lines:
-                line = line.strip()
-                
-                if "display interface description" in line:
-                    interface_section = True
-                    continue
-                elif "display transceiver verbose" in line:
-                    interface_section = False
-                    break
+                # Procura pela seção de interfaces (após display interface description)
+                interface_section = False
+                for line in lines:
+                    line = line.strip()
                 
-                if interface_section:
-                    # Ignora linhas de cabeçalho
-                    if line.startswith("PHY:") or line.startswith("*down:") or line.startswith("#down:"):
+                    if "display interface description" in line:
+                        interface_section = True
                         continue
-                    if line.startswith("(") or line.startswith("Interface"):
-                        continue
-                    if not line or line.endswith(">"):
-                        continue
-                        
-                    # Parse das linhas de interface
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        ifname = parts[0]
-                        phy_status = parts[1] 
-                        ifalias = " ".join(parts[3:]) if len(parts) > 3 else "No Description"
+                    elif "display transceiver verbose" in line:
+                        interface_section = False
+                        break
+                
+                    if interface_section:
+                        # Ignora linhas de cabeçalho
+                        if line.startswith("PHY:") or line.startswith("*down:") or line.startswith("#down:"):
+                            continue
+                        if line.startswith("(") or line.startswith("Interface"):
+                            continue
+                        if not line or line.endswith(">"):
+                            continue
                         
-                        # Inclui apenas interfaces físicas com SFP UP
-                        if any(x in ifname for x in ["XGE", "100GE", "25GE", "40GE"]) and phy_status == "up":
-                            interfaces[ifname] = ifalias
+                        # Parse das linhas de interface
+                        parts = line.split()
+                        if len(parts) >= 3:
+                            ifname = parts[0]
+                            phy_status = parts[1] 
+                            ifalias = " ".join(parts[3:]) if len(parts) > 3 else ""
+                            rows.append((ifname, phy_status, ifalias))
+            
+                # Por padrao apenas interfaces físicas com SFP UP
+                selected = collector_interfaces.select(hostname, "huawei_sw_sfp", rows, RULE_INTERFACES_COMBINED)
+                interfaces = {ifname: ifalias or "No Description" for ifname, ifalias in selected.items()}
             
             if debug:
                 print(f"DEBUG: Interfaces encontradas: {len(interfaces)} - {list(interfaces.keys())}")
             
-            # Processa discovery baseado nos dados reais dos transceivers
-            discovery_single = []
-            discovery_multi = []
+            with collector_stats.stage("lld"):
+                # Processa discovery baseado nos dados reais dos transceivers
+                discovery_single = []
+                discovery_multi = []
+                discovery_summary = []
             
-            # Primeiro passo: coleta dados dos transceivers para discovery preciso
-            for ifname, ifalias in interfaces.items():
-                try:
-                    # Procura pela seção desta interface na saída do transceiver verbose
-                    interface_pattern = f"{ifname} transceiver information:"
-                    start_idx = full_output.find(interface_pattern)
+                # Primeiro passo: coleta dados dos transceivers para discovery preciso
+                for ifname, ifalias in interfaces.items():
+                    try:
+                        # Procura pela seção desta interface na saída do transceiver verbose
+                        interface_output = transceiver_section(full_output, ifname)
                     
-                    if start_idx != -1:
-                        # Encontra o fim da seção
-                        next_interface = full_output.find(" transceiver information:", start_idx + 1)
-                        if next_interface == -1:
-                            interface_output = full_output[start_idx:]
-                        else:
-                            interface_output = full_output[start_idx:next_interface]
-                        
-                        # Parse para identificar lanes
-                        transceiver_data = parse_transceiver_output(interface_output, ifname, debug)
+                        if interface_output is not None:
+                            # Parse para identificar lanes
+                            with collector_stats.stage("parse"):
+                                transceiver_data = parse_transceiver_output(interface_output, ifname, debug)
                         
-                        if "100GE" in ifname:
-                            # Multi-lane: descobre quantas lanes existem
-                            lanes_found = set()
-                            for metric in transceiver_data.keys():
-                                if "_lane_" in metric:
-                                    lane_num = metric.split("_")[-1]
-                                    lanes_found.add(lane_num)
+                            if "100GE" in ifname:
+                                # Multi-lane: descobre quantas lanes existem
+                                lanes_found = set()
+                                for metric in transceiver_data.keys():
+                                    if "_lane_" in metric:
+                                        lane_num = metric.split("_")[-1]
+                                        lanes_found.add(lane_num)
                             
-                            # Cria discovery para cada lane encontrada
-                            for lane in sorted(lanes_found):
-                                discovery_multi.append({
-                                    "{#IFNAME}": ifname,
-                                    "{#IFALIAS}": ifalias,
-                                    "{#GBIC_LANE}": lane
-                                })
+                                # Cria discovery para cada lane encontrada
+                                for lane in sorted(lanes_found):
+                                    discovery_multi.append({
+                                        "{#IFNAME}": ifname,
+                                        "{#IFALIAS}": ifalias,
+                                        "{#GBIC_LANE}": lane
+                                    })
+                                if LANE_SUMMARY and lanes_found:
+                                    discovery_summary.append({
+                                        "{#IFNAME}": ifname,
+                                        "{#IFALIAS}": ifalias
+                                    })
+                            else:
+                                # Single-lane
+                                if transceiver_data:  # Só adiciona se encontrou dados
+                                    discovery_single.append({
+                                        "{#IFNAME}": ifname,
+                                        "{#IFALIAS}": ifalias
+                                    })
+                    except Exception as ex:
+                        if debug:
+                            print(f"DEBUG: Erro no discovery de {ifname}: {str(ex)}")
+                        # Fallback: adiciona baseado no nome da interface
+                        if "100GE" in ifname:
+                            discovery_multi.append({
+                                "{#IFNAME}": ifname,
+                                "{#IFALIAS}": ifalias,
+                                "{#GBIC_LANE}": "0"
+                            })
                         else:
-                            # Single-lane
-                            if transceiver_data:  # Só adiciona se encontrou dados
-                                discovery_single.append({
-                                    "{#IFNAME}": ifname,
-                                    "{#IFALIAS}": ifalias
-                                })
-                except Exception as ex:
-                    if debug:
-                        print(f"DEBUG: Erro no discovery de {ifname}: {str(ex)}")
-                    # Fallback: adiciona baseado no nome da interface
-                    if "100GE" in ifname:
-                        discovery_multi.append({
-                            "{#IFNAME}": ifname,
-                            "{#IFALIAS}": ifalias,
-                            "{#GBIC_LANE}": "0"
-                        })
-                    else:
-                        discovery_single.append({
-                            "{#IFNAME}": ifname,
-                            "{#IFALIAS}": ifalias
-                        })
+                            discovery_single.append({
+                                "{#IFNAME}": ifname,
+                                "{#IFALIAS}": ifalias
+                            })
             
             if debug:
                 print(f"DEBUG: Single-lane discovery: {len(discovery_single)} interfaces")
                 print(f"DEBUG: Multi-lane discovery: {len(discovery_multi)} interfaces")
             
-            # Envia discovery para single-lane
+            # Envia os discoveries single-lane, multi-lane e resumo em uma chamada
+            discoveries = {}
             if discovery_single:
-                discovery_result = subprocess.run([
-                    "zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "discovery_gbic_single", 
-                    "-o", json.dumps({"data": discovery_single})
-                ], capture_output=True, timeout=5, text=True)
-                
-                if debug:
-                    print(f"DEBUG: Single-lane discovery result: {discovery_result.returncode}")
-                    if discovery_result.stderr:
-                        print(f"DEBUG: Single-lane discovery stderr: {discovery_result.stderr}")
-            
-            # Envia discovery para multi-lane
+                discoveries["discovery_gbic_single"] = json.dumps({"data": discovery_single})
             if discovery_multi:
-                discovery_result = subprocess.run([
-                    "zabbix_sender", "-z", "127.0.0.1", "-s", hostname, "-k", "discovery_gbic_multi", 
-                    "-o", json.dumps({"data": discovery_multi})
-                ], capture_output=True, timeout=5, text=True)
-            
-            # Debug do último discovery executado
-            if 'discovery_result' in locals():
+                discoveries["discovery_gbic_multi"] = json.dumps({"data": discovery_multi})
+            if discovery_summary:
+                discoveries["discovery_gbic_summary"] = json.dumps({"data": discovery_summary})
+            if discoveries:
+                with collector_stats.stage("send"):
+                    discovery_result = zbx_sender.send_discovery(hostname, discoveries, timeout=5)
+                
                 if debug:
                     print(f"DEBUG: Discovery sender result: {discovery_result.returncode}")
                     print(f"DEBUG: Discovery sender stdout: {discovery_result.stdout}")
@@ -953,10 +1142,12 @@ display transceiver verbose"""
                 if debug:
                     print("DEBUG: Nenhum discovery foi executado")
             
-            # Aguarda um pouco para o Zabbix processar o discovery
-            if debug:
-                print("DEBUG: Aguardando processamento do discovery...")
-            time.sleep(2)
+            # Aguarda um pouco para o Zabbix processar o discovery (nada a esperar
+            # quando os envios vao em lote unico/documento JSON)
+            if not zbx_sender.deferring():
+                if debug:
+                    print("DEBUG: Aguardando processamento do discovery...")
+                time.sleep(2)
             
             # Parse dados dos transceivers da saída combinada
             success_count = 0
@@ -967,27 +1158,30 @@ display transceiver verbose"""
             for ifname in interfaces.keys():
                 try:
                     # Procura pela seção desta interface na saída do transceiver verbose
-                    interface_pattern = f"{ifname} transceiver information:"
-                    start_idx = full_output.find(interface_pattern)
+                    interface_output = transceiver_section(full_output, ifname)
                     
-                    if start_idx != -1:
-                        # Encontra o fim da seção (próxima interface ou fim)
-                        next_interface = full_output.find(" transceiver information:", start_idx + 1)
-                        if next_interface == -1:
-                            interface_output = full_output[start_idx:]
-                        else:
-                            interface_output = full_output[start_idx:next_interface]
-                        
+                    if interface_output is not None:
                         # Parse dos dados SFP
-                        transceiver_data = parse_transceiver_output(interface_output, ifname, debug)
+                        with collector_stats.stage("parse"):
+                            transceiver_data = parse_transceiver_output(interface_output, ifname, debug)
+                            add_fleet_lanes(ifname, transceiver_data)
                         
                         if debug:
                             print(f"DEBUG: Interface {ifname} - coletadas {len(transceiver_data)} métricas")
                         
                         # Envia métricas com as chaves corretas baseadas no tipo de interface
                         if "100GE" in ifname:
+                            # Modo resumo: min/max/avg/spread por metrica; lanes so quando devido
+                            summary = lane_summary(transceiver_data) if LANE_SUMMARY else {}
+                            send_lanes = not summary or lane_detail_due(hostname, ifname, summary)
+                            summary_batch = summary_values(ifname, summary)
+                            metrics_batch.extend(zbx_sender.format_line(hostname, key, value)
+                                                 for key, value in summary_batch)
+                            success_count += len(summary_batch)
                             # Multi-lane interface - usa chaves ML com lane numbers
                             for metric, value in transceiver_data.items():
+                                if "_lane_" in metric and not send_lanes:
+                                    continue
                                 if metric.endswith("_lane_0") or metric.endswith("_lane_1") or metric.endswith("_lane_2") or metric.endswith("_lane_3"):
                                     # Extrai número da lane
                                     lane_num = metric.split("_")[-1]
@@ -1002,15 +1196,15 @@ display transceiver verbose"""
                                     else:
                                         continue
                                         
-                                    metrics_batch.append(f"{hostname} {key} {value}")
+                                    metrics_batch.append(zbx_sender.format_line(hostname, key, value))
                                     success_count += 1
                                 elif metric == "temperature":
                                     key = f"tempML[{ifname},0]"
-                                    metrics_batch.append(f"{hostname} {key} {value}")
+                                    metrics_batch.append(zbx_sender.format_line(hostname, key, value))
                                     success_count += 1
                                 elif metric == "voltage":
                                     key = f"voltML[{ifname},0]"
-                                    metrics_batch.append(f"{hostname} {key} {value}")
+                                    metrics_batch.append(zbx_sender.format_line(hostname, key, value))
                                     success_count += 1
                         else:
                             # Single-lane interface - usa chaves simples
@@ -1028,7 +1222,7 @@ display transceiver verbose"""
                                 else:
                                     continue
                                     
-                                metrics_batch.append(f"{hostname} {key} {value}")
+                                metrics_batch.append(zbx_sender.format_line(hostname, key, value))
                                 success_count += 1
                     else:
                         if debug:
@@ -1040,18 +1234,19 @@ display transceiver verbose"""
                         print(f"DEBUG: Erro processando {ifname}: {str(ex)}")
                     error_count += 1
             
-            # Envia todas as métricas em lote
+            # Envia todas as métricas em lote; o auto-monitoramento vai depois (finish), com
+            # collector.values contando so as metricas aceitas pelo trapper
             if metrics_batch:
                 try:
-                    batch_data = "\n".join(metrics_batch)
-                    process = subprocess.run([
-                        "zabbix_sender", "-z", "127.0.0.1", "-i", "-"
-                    ], input=batch_data, capture_output=True, timeout=5, text=True)
-                    if process.returncode != 0:
-                        if debug:
-                            print(f"DEBUG: Zabbix sender falhou: {process.stderr}")
-                        error_count += len(metrics_batch)
-                        success_count = 0
+                    with collector_stats.stage("send"):
+                        processed, failed, skipped = zbx_sender.send_batch(metrics_batch, timeout=5)
+                    stats.add_values(processed)
+                    if debug and (failed or skipped):
+                        print(f"DEBUG: Zabbix sender: {processed} processados, {failed} falharam, {skipped} ignorados")
+                    # Apenas os valores recusados contam como falha; os ignorados (key
+                    # inexistente ou sem item ativo) nao contam como falha nem sucesso
+                    error_count += failed
+                    success_count = processed
                 except Exception as e:
                     if debug:
                         print(f"DEBUG: Erro enviando métricas: {str(e)}")
@@ -1074,6 +1269,8 @@ display transceiver verbose"""
             print(f"Metricas SFP: {success_count} processadas em {elapsed:.1f}s")
         else:
             print(f"PARCIAL: {error_count} falhas de {success_count + error_count} metricas SFP em {elapsed:.1f}s")
+        if debug:
+            print(f"DEBUG: {stats.summary()}")
         
     except Exception as e:
         print(f"ERRO: Falha na execucao do processo - {str(e)}", file=sys.stderr)
@@ -1082,10 +1279,15 @@ display transceiver verbose"""
             traceback.print_exc()
     finally:
         clear_cache()
+        collector_caps.save()
+        fleet_state.save(hostname, "huawei_sw_sfp")
+        save_lane_detail(hostname)
+        collector_stats.finish()
 
 def collect(ip, port, user, password, hostname, debug=False):
     """Funcao de collect para compatibilidade - OTIMIZADA"""
     try:
+        stats = collector_stats.begin(hostname, "huawei_sw_sfp")
         clear_cache()
         
         success_count, error_count, elapsed = collect_original_optimized(ip, port, user, password, hostname, debug)
@@ -1096,6 +1298,8 @@ def collect(ip, port, user, password, hostname, debug=False):
             print(f"Metricas: {success_count} processadas em {elapsed:.1f}s")
         else:
             print(f"PARCIAL: {error_count} falhas de {total} metricas total em {elapsed:.1f}s")
+        if debug:
+            print(f"DEBUG: {stats.summary()}")
         
     except Exception as e:
         print(f"ERRO: Falha na execucao do processo - {str(e)}", file=sys.stderr)
@@ -1104,23 +1308,30 @@ def collect(ip, port, user, password, hostname, debug=False):
             traceback.print_exc()
     finally:
         clear_cache()
+        collector_caps.save()
+        fleet_state.save(hostname, "huawei_sw_sfp")
+        save_lane_detail(hostname)
+        collector_stats.finish()
 
 def main():
+    global LANE_SUMMARY
     # Define timeout geral de 30 segundos
     set_timeout(30)
     
     try:
         if len(sys.argv) < 2:
-            print("Uso: huawei_sw_sfp.py <launch_discovery|collect> <ip> <port> <user> <password> <hostname> [debug]", file=sys.stderr)
+            print("Uso: huawei_sw_sfp.py <launch_discovery|collect> <ip> <port> <user> <password> <hostname> [debug] [summary]", file=sys.stderr)
             sys.exit(1)
         
         # Verifica se debug foi habilitado
         debug = len(sys.argv) > 7 and sys.argv[7].lower() == "debug"
+        if "summary" in (arg.lower() for arg in sys.argv[7:]):
+            LANE_SUMMARY = True
         
         mode = sys.argv[1]
         if mode == "launch_discovery":
             if len(sys.argv) < 7:
-                print("Uso: huawei_sw_sfp.py launch_discovery <ip> <port> <user> <password> <hostname> [debug]", file=sys.stderr)
+                print("Uso: huawei_sw_sfp.py launch_discovery <ip> <port> <user> <password> <hostname> [debug] [summary]", file=sys.stderr)
                 sys.exit(1)
             _, _, ip, port, user, password, hostname = sys.argv[:7]
             
@@ -1138,7 +1349,7 @@ def main():
             launch_discovery_and_collect(ip, port_int, user, password, hostname, debug)
         elif mode == "collect":
             if len(sys.argv) < 7:
-                print("Uso: huawei_sw_sfp.py collect <ip> <port> <user> <password> <hostname> [debug]", file=sys.stderr)
+                print("Uso: huawei_sw_sfp.py collect <ip> <port> <user> <password> <hostname> [debug] [summary]", file=sys.stderr)
                 sys.exit(1)
             _, _, ip, port, user, password, hostname = sys.argv[:7]
             
@@ -1166,4 +1377,4 @@ def main():
         signal.alarm(0)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    collector_output.run(main, "huawei_sw_sfp")
\ No newline at end of file
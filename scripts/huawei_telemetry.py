@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Receptor de telemetria Huawei (gRPC dial-out) - coleta por push de optica e BGP
+
+O equipamento abre a conexao e publica as amostras (servico
+huawei_dialout.gRPCDataservice/dataPublish); nenhum comando de CLI e executado.
+As amostras viram as mesmas keys dos coletores SSH e vao para o trapper em lotes
+a cada TELEMETRY_FLUSH segundos (padrao 10), com o horario da amostra
+(zabbix_sender -T -N): amostragem de 10 s no equipamento chega com 10 s de
+resolucao no Zabbix.
+
+  optica  sensor com "optical"/"transceiver" no caminho
+          curr/txpower/rxpower/temp/volt[<if>] e, com lanes,
+          currML/txpowerML/rxpowerML[<if>,<lane>], tempML/voltML[<if>,0]
+  BGP     sensor com "bgp" no caminho
+          hwBgpPeerState, BGPpeerRouter, bgpAdvRoutes, hwBgpPeerFsmEstablishedTime[<desc>,<peer>]
+
+O conteudo precisa vir em JSON (encoding json na destination-group/subscription):
+o envelope Telemetry e decodificado aqui (protobuf sem codigo gerado), mas o
+conteudo GPB de cada sensor exigiria o .proto do modelo. Os campos sao localizados
+pelo nome (rx-power, rxPower, bias-current, peer-addr, state...), em qualquer nivel.
+
+Host no Zabbix: TELEMETRY_HOSTS (JSON {"<node_id ou IP>": "<host>"}, padrao
+/etc/zabbix/telemetry_hosts.json), senao o host cuja interface tem o IP de origem
+(banco do proxy), senao o node_id_str do equipamento. Keys sem item ativo no host
+(collector_items) sao descartadas; a descricao do peer BGP vem do proprio sensor
+ou das keys ja existentes no host (itens ativos ou ultimo resultado do huawei_bgp).
+
+Sem resposta do trapper os valores vao para o spool (collector_spool) com o
+horario original. Requer grpcio (pip install grpcio).
+
+Uso:
+  huawei_telemetry.py [--addr 0.0.0.0] [--port 57400]
+"""
+
+import ipaddress
+import json
+import logging
+import os
+import re
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent import futures
+
+import collector_items
+import collector_output
+import collector_spool
+import huawei_bgp
+import zbx_sender
+
+ADDR = os.environ.get("TELEMETRY_ADDR", "0.0.0.0")
+PORT = int(os.environ.get("TELEMETRY_PORT", "57400"))
+FLUSH = float(os.environ.get("TELEMETRY_FLUSH", "10"))
+HOSTS_FILE = os.environ.get("TELEMETRY_HOSTS", "/etc/zabbix/telemetry_hosts.json")
+MAX_PENDING = int(os.environ.get("TELEMETRY_MAX_PENDING", "200000"))
+WORKERS = int(os.environ.get("TELEMETRY_WORKERS", "16"))
+
+SERVICE = "huawei_dialout.gRPCDataservice"
+METHOD = "dataPublish"
+CHUNK = 1000
+
+QUERY_HOST_BY_IP = (
+    "SELECT h.host FROM hosts h JOIN interface i ON i.hostid = h.hostid "
+    "WHERE h.status = 0 AND i.ip = ? ORDER BY i.main DESC LIMIT 1"
+)
+
+# Nomes de campo normalizados (minusculas, sem - e _) -> metrica
+NAME_FIELDS = ("ifname", "interfacename", "name", "portname", "ifdescr")
+OPTICAL_FIELDS = {
+    "rxpower": "rx_power", "rxpwr": "rx_power", "inputpower": "rx_power",
+    "txpower": "tx_power", "txpwr": "tx_power", "outputpower": "tx_power",
+    "biascurrent": "bias_current", "bias": "bias_current", "txbias": "bias_current",
+    "temperature": "temperature", "temp": "temperature",
+    "voltage": "voltage", "volt": "voltage", "vcc": "voltage",
+}
+LANE_FIELDS = ("laneid", "lane", "laneindex", "index", "id", "channel")
+PEER_FIELDS = ("peeraddr", "peeraddress", "peerip", "remoteaddress", "address")
+BGP_FIELDS = {
+    "state": "state", "peerstate": "state", "status": "state", "fsmstate": "state",
+    "description": "description", "peerdescription": "description", "desc": "description",
+    "receivedtotalroutes": "received", "rcvroutes": "received", "receivedroutes": "received",
+    "receivetotalroutes": "received", "prefixrcv": "received", "rcvprefixcount": "received",
+    "advertisedtotalroutes": "advertised", "advroutes": "advertised", "advertisedroutes": "advertised",
+    "uptime": "uptime", "updowntime": "uptime", "establishedtime": "uptime",
+}
+OPTICAL_KEYS = {"bias_current": "curr", "tx_power": "txpower", "rx_power": "rxpower",
+                "temperature": "temp", "voltage": "volt"}
+LANE_KEYS = {"bias_current": "currML", "tx_power": "txpowerML", "rx_power": "rxpowerML"}
+BGP_KEY_RE = re.compile(r"^hwBgpPeerState\[(.+),([^,\]]+)\]$")
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+
+# --- protobuf (formato de fio) ------------------------------------------------
+
+def _varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def pb_fields(buf):
+    """Campos (numero, valor) de uma mensagem protobuf: varint -> int, len -> bytes"""
+    pos = 0
+    while pos < len(buf):
+        tag, pos = _varint(buf, pos)
+        number, wire = tag >> 3, tag & 7
+        if wire == 0:
+            value, pos = _varint(buf, pos)
+        elif wire == 1:
+            value, pos = int.from_bytes(buf[pos:pos + 8], "little"), pos + 8
+        elif wire == 2:
+            size, pos = _varint(buf, pos)
+            value, pos = bytes(buf[pos:pos + size]), pos + size
+        elif wire == 5:
+            value, pos = int.from_bytes(buf[pos:pos + 4], "little"), pos + 4
+        else:
+            raise ValueError(f"wire type {wire} nao suportado")
+        yield number, value
+
+
+def decode_service_args(buf):
+    """serviceArgs do dial-out: {req_id, data (Telemetry GPB), data_json, errors}"""
+    args = {}
+    for number, value in pb_fields(buf):
+        if number == 1:
+            args["req_id"] = value
+        elif number == 2:
+            args["data"] = value
+        elif number == 3:
+            args["errors"] = value.decode("utf-8", "replace")
+        elif number == 4:
+            args["data_json"] = value.decode("utf-8", "replace")
+    return args
+
+
+def decode_telemetry(buf):
+    """Envelope huawei_telemetry.Telemetry (campos usados aqui)"""
+    strings = {1: "node_id_str", 2: "subscription_id_str", 3: "sensor_path", 10: "except_desc",
+               13: "proto_path", 14: "data_str", 15: "ne_id"}
+    ints = {4: "collection_id", 5: "collection_start_time", 6: "msg_timestamp", 11: "encoding"}
+    msg = {"rows": []}
+    for number, value in pb_fields(buf):
+        if number in strings and isinstance(value, bytes):
+            msg[strings[number]] = value.decode("utf-8", "replace")
+        elif number in ints and isinstance(value, int):
+            msg[ints[number]] = value
+        elif number == 7 and isinstance(value, bytes):
+            # TelemetryGPBTable: row (1) = TelemetryRowGPB {timestamp (1), content (11)}
+            for row_number, row in pb_fields(value):
+                if row_number != 1:
+                    continue
+                entry = {}
+                for field, data in pb_fields(row):
+                    if field == 1:
+                        entry["timestamp"] = data
+                    elif field == 11:
+                        entry["content"] = data
+                msg["rows"].append(entry)
+    return msg
+
+
+# --- conteudo JSON -> keys ----------------------------------------------------
+
+def _norm(name):
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+def _json(value):
+    """Objeto JSON de uma string/bytes (None se nao for JSON)"""
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "replace")
+    if not isinstance(value, str) or not value.lstrip().startswith(("{", "[")):
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+def _number(value):
+    """'-2.35', -2.35, '-2.35 dBm' -> '-2.35' (None se nao numerico)"""
+    if isinstance(value, bool):
+        return None
+    text = str(value).split()[0] if str(value).split() else ""
+    try:
+        float(text)
+    except ValueError:
+        return None
+    return text
+
+
+def records(node, name=None):
+    """(nome herdado, dict) de cada objeto do JSON; strings JSON sao abertas"""
+    if isinstance(node, (str, bytes)):
+        node = _json(node)
+    if isinstance(node, dict):
+        fields = {_norm(k): v for k, v in node.items()}
+        for field in NAME_FIELDS:
+            if isinstance(fields.get(field), str) and fields[field]:
+                name = fields[field]
+                break
+        yield name, node
+        for key, value in node.items():
+            # Objetos por lane sao lidos pelo objeto da interface (_lanes)
+            if isinstance(value, (dict, list, str, bytes)) and "lane" not in _norm(key):
+                yield from records(value, name)
+    elif isinstance(node, list):
+        for item in node:
+            yield from records(item, name)
+
+
+def _lanes(node):
+    """{lane: {metrica: valor}} de listas de valores ou de objetos por lane"""
+    lanes = {}
+    for key, value in node.items():
+        metric = OPTICAL_FIELDS.get(_norm(key))
+        if metric and isinstance(value, list) and len(value) > 1:
+            for lane, item in enumerate(value):
+                number = _number(item)
+                if number is not None:
+                    lanes.setdefault(lane, {})[metric] = number
+        elif "lane" in _norm(key) and isinstance(value, (dict, list)):
+            # "lanes": [...] ou "lanes": {"lane": [...]}
+            if isinstance(value, dict):
+                value = next((v for v in value.values() if isinstance(v, list)), [])
+            for position, item in enumerate(value):
+                if not isinstance(item, dict):
+                    continue
+                fields = {_norm(k): v for k, v in item.items()}
+                lane = next((int(fields[f]) for f in LANE_FIELDS if str(fields.get(f, "")).isdigit()), position)
+                for field, raw in fields.items():
+                    number = _number(raw) if field in OPTICAL_FIELDS else None
+                    if number is not None:
+                        lanes.setdefault(lane, {})[OPTICAL_FIELDS[field]] = number
+    # Lanes numeradas a partir de 1 no modelo: keys usam 0..N-1 como a CLI
+    if lanes and min(lanes) == 1:
+        lanes = {lane - 1: values for lane, values in lanes.items()}
+    return lanes
+
+
+def optical_values(content):
+    """{key: valor} das interfaces opticas do conteudo"""
+    values = {}
+    for ifname, node in records(content):
+        if not ifname:
+            continue
+        metrics = {}
+        for key, value in node.items():
+            metric = OPTICAL_FIELDS.get(_norm(key))
+            number = _number(value) if metric and not isinstance(value, (dict, list)) else None
+            if number is not None:
+                metrics[metric] = number
+        lanes = _lanes(node)
+        if not metrics and not lanes:
+            continue
+        for metric, number in metrics.items():
+            if metric in LANE_KEYS and lanes:
+                continue
+            values[f"{OPTICAL_KEYS[metric]}[{ifname}]"] = number
+            if lanes and metric in ("temperature", "voltage"):
+                values[f"{OPTICAL_KEYS[metric]}ML[{ifname},0]"] = number
+        for lane, lane_metrics in lanes.items():
+            for metric, number in lane_metrics.items():
+                if metric in LANE_KEYS:
+                    values[f"{LANE_KEYS[metric]}[{ifname},{lane}]"] = number
+    return values
+
+
+def _peer_id(peer):
+    """Endereco normalizado (2001:DB8:0::1 e 2001:db8::1 sao o mesmo peer)"""
+    try:
+        return str(ipaddress.ip_address(peer))
+    except ValueError:
+        return peer.lower()
+
+
+def peer_labels(hostname):
+    """{peer: (desc, peer)} das keys BGP existentes no host (itens ativos ou ultimo resultado)"""
+    keys = set(collector_items.active_keys(hostname) or ())
+    try:
+        path = os.path.join(collector_output.RESULTS_DIR, collector_output.safe_name(hostname))
+        for name in os.listdir(path):
+            with open(os.path.join(path, name)) as f:
+                keys.update(json.load(f).get("values") or {})
+    except (OSError, ValueError):
+        pass
+    labels = {}
+    for key in keys:
+        match = BGP_KEY_RE.match(key)
+        if match:
+            labels[_peer_id(match.group(2))] = (match.group(1), match.group(2))
+    return labels
+
+
+def bgp_values(content, labels):
+    """{key: valor} dos peers BGP do conteudo (peers sem descricao conhecida ficam de fora)"""
+    values = {}
+    for _, node in records(content):
+        fields = {}
+        peer = None
+        for key, value in node.items():
+            norm = _norm(key)
+            if norm in PEER_FIELDS and isinstance(value, str) and value:
+                peer = value
+            elif norm in BGP_FIELDS and not isinstance(value, (dict, list)):
+                fields[BGP_FIELDS[norm]] = value
+        if not peer or "state" not in fields:
+            continue
+        if fields.get("description"):
+            label = (fields["description"], peer.upper() if ":" in peer else peer)
+        else:
+            label = labels.get(_peer_id(peer))
+            if label is None:
+                continue
+        suffix = f"[{label[0]},{label[1]}]"
+        state = str(fields["state"])
+        state_num = huawei_bgp.bgp_state_to_num(state) or _number(state) or 0
+        values[f"hwBgpPeerState{suffix}"] = str(state_num)
+        if "received" in fields:
+            values[f"BGPpeerRouter{suffix}"] = _number(fields["received"]) or "0"
+        if "advertised" in fields:
+            values[f"bgpAdvRoutes{suffix}"] = _number(fields["advertised"]) or "0"
+        if "uptime" in fields:
+            uptime = fields["uptime"]
+            seconds = _number(uptime)
+            hours = round(float(seconds) / 3600, 2) if seconds is not None else huawei_bgp.parse_uptime_to_hours(str(uptime))
+            values[f"hwBgpPeerFsmEstablishedTime{suffix}"] = str(hours)
+    return values
+
+
+# --- host, lote e envio -------------------------------------------------------
+
+class Receiver:
+    """Converte as mensagens publicadas em valores e envia em lotes"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = []  # (clock_ns, linha -i)
+        self.host_map = {}
+        self.by_ip = {}
+        self.labels = {}
+        self.hosts_loaded = 0.0
+        self.warned = set()
+        self.counts = {"messages": 0, "values": 0, "dropped": 0, "sent": 0, "failed": 0}
+
+    def host_for(self, node_id, peer_ip):
+        now = time.time()
+        if now - self.hosts_loaded > collector_items.TTL:
+            self.hosts_loaded = now
+            collector_items.reset()
+            self.by_ip = {}
+            self.labels = {}
+            try:
+                with open(HOSTS_FILE) as f:
+                    self.host_map = json.load(f)
+            except FileNotFoundError:
+                self.host_map = {}
+            except (OSError, ValueError) as e:
+                logging.warning(f"Mapa de hosts ignorado ({HOSTS_FILE}): {e}")
+                self.host_map = {}
+        for ident in (node_id, peer_ip):
+            if ident and ident in self.host_map:
+                return self.host_map[ident]
+        if peer_ip:
+            if peer_ip not in self.by_ip:
+                self.by_ip[peer_ip] = self._host_by_ip(peer_ip)
+            if self.by_ip[peer_ip]:
+                return self.by_ip[peer_ip]
+        return node_id or peer_ip
+
+    def _host_by_ip(self, ip):
+        if not collector_items.ENABLED:
+            return None
+        try:
+            conn = sqlite3.connect(f"file:{collector_items.DB_PATH}?mode=ro", uri=True, timeout=5)
+            try:
+                row = conn.execute(QUERY_HOST_BY_IP, (ip,)).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def handle(self, payload, peer_ip=None):
+        """Processa um serviceArgs publicado; retorna a quantidade de valores aceitos"""
+        args = decode_service_args(payload)
+        if args.get("errors"):
+            logging.warning(f"{peer_ip}: erro reportado pelo equipamento: {args['errors']}")
+        if "data" in args:
+            msg = decode_telemetry(args["data"])
+        elif "data_json" in args:
+            msg = _json(args["data_json"]) or {}
+            msg = {k: v for k, v in msg.items() if isinstance(k, str)}
+            msg.setdefault("rows", [])
+            msg["data_str"] = args["data_json"]
+        else:
+            return 0
+        path = msg.get("sensor_path") or ""
+        contents = [msg["data_str"]] if msg.get("data_str") else []
+        contents += [row["content"] for row in msg["rows"] if _json(row.get("content"))]
+        if not contents:
+            if msg["rows"] and path not in self.warned:
+                self.warned.add(path)
+                logging.warning(f"{peer_ip} {path}: conteudo GPB ignorado, configure encoding json")
+            return 0
+
+        hostname = self.host_for(msg.get("node_id_str"), peer_ip)
+        values = {}
+        for content in contents:
+            if "optical" in path.lower() or "transceiver" in path.lower():
+                values.update(optical_values(content))
+            elif "bgp" in path.lower():
+                if hostname not in self.labels:
+                    self.labels[hostname] = peer_labels(hostname)
+                values.update(bgp_values(content, self.labels[hostname]))
+        # Horario da amostra (ms); relogio do equipamento muito fora usa o horario local
+        stamp = int(msg.get("msg_timestamp") or msg.get("collection_start_time") or 0)
+        clock_ns = stamp * 1000000 if abs(stamp / 1000.0 - time.time()) < 86400 else time.time_ns()
+
+        lines = [zbx_sender.format_line(hostname, key, value) for key, value in values.items()
+                 if collector_items.wants(hostname, key)]
+        with self.lock:
+            self.counts["messages"] += 1
+            self.counts["values"] += len(lines)
+            self.counts["dropped"] += len(values) - len(lines)
+            room = MAX_PENDING - len(self.pending)
+            if len(lines) > room:
+                self.counts["dropped"] += len(lines) - max(room, 0)
+                lines = lines[:max(room, 0)]
+            self.pending.extend((clock_ns, line) for line in lines)
+        return len(lines)
+
+    def flush(self):
+        """Envia o lote acumulado com o horario de cada amostra (-T -N)"""
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for start in range(0, len(pending), CHUNK):
+            chunk = pending[start:start + CHUNK]
+            timed = []
+            for clock_ns, line in chunk:
+                host, key, value = zbx_sender.split_line(line)
+                clock, ns = divmod(clock_ns, 1000000000)
+                timed.append(f"{host} {key} {clock} {ns} {value}")
+            try:
+                result = subprocess.run([*zbx_sender.sender_command(), "-T", "-N", "-i", "-"],
+                                        input="\n".join(timed), capture_output=True, timeout=30, text=True)
+            except Exception:
+                result = None
+            if result is None or zbx_sender.trapper_unreachable(result):
+                for clock_ns, line in chunk:
+                    collector_spool.add([line], clock_ns)
+                collector_spool.flush()
+                self.counts["failed"] += len(chunk)
+                continue
+            counts = zbx_sender.parse_response(result.stdout) or (len(chunk), 0)
+            self.counts["sent"] += counts[0]
+            self.counts["failed"] += counts[1]
+        return len(pending)
+
+
+def serve(receiver, addr, port):
+    """Servidor gRPC do dial-out (grpcio, sem codigo gerado: mensagens em bytes)"""
+    import grpc
+
+    def publish(requests, context):
+        peer = context.peer()
+        match = re.match(r"^ipv[46]:\[?([^\]]+?)\]?:\d+$", peer)
+        peer_ip = match.group(1) if match else None
+        for payload in requests:
+            try:
+                receiver.handle(payload, peer_ip)
+            except Exception as e:
+                logging.warning(f"{peer_ip}: mensagem ignorada - {e}")
+        return iter(())
+
+    handler = grpc.method_handlers_generic_handler(SERVICE, {
+        METHOD: grpc.stream_stream_rpc_method_handler(publish),
+    })
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=WORKERS),
+                         options=[("grpc.max_receive_message_length", 64 * 1024 * 1024)])
+    server.add_generic_rpc_handlers((handler,))
+    server.add_insecure_port(f"{addr}:{port}")
+    server.start()
+    return server
+
+
+def main():
+    addr, port = ADDR, PORT
+    argv = sys.argv[1:]
+    for i, arg in enumerate(argv):
+        if arg == "--addr" and i + 1 < len(argv):
+            addr = argv[i + 1]
+        elif arg == "--port" and i + 1 < len(argv):
+            port = int(argv[i + 1])
+    try:
+        import grpc  # noqa: F401
+    except ImportError:
+        print("ERRO: grpcio nao instalado (pip install grpcio)", file=sys.stderr)
+        return 1
+
+    receiver = Receiver()
+    server = serve(receiver, addr, port)
+    logging.info(f"Telemetria dial-out em {addr}:{port} (lotes a cada {FLUSH:g}s)")
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    last_report = time.monotonic()
+    try:
+        while not stop:
+            time.sleep(FLUSH)
+            receiver.flush()
+            if time.monotonic() - last_report >= 60:
+                last_report = time.monotonic()
+                logging.info("Mensagens: {messages}, valores: {values}, enviados: {sent}, "
+                             "falhas: {failed}, descartados: {dropped}".format(**receiver.counts))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop(2)
+        receiver.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Envio de valores para o trapper local via zabbix_sender
+
+Funcoes compartilhadas pelos coletores para montar linhas no formato de entrada
+do zabbix_sender (-i) e enviar varios valores em uma unica chamada.
+
+Valores que nao chegam porque o trapper nao respondeu vao para o spool em disco
+(collector_spool) e sao reenviados com o clock original quando ele volta.
+
+Retorno do trapper: send_batch soma processed/failed das respostas. O trapper nao
+informa quais valores falharam, entao a busca e feita entre execucoes: um lote
+com falhas parciais e dividido ao meio e, na proxima coleta, cada metade vai em
+uma chamada separada (sem reenviar valores ja aceitos). Uma key que falha sozinha
+COLLECTOR_UNKNOWN_AFTER vezes (padrao 3) e marcada como inexistente e deixa de ser
+enviada por COLLECTOR_UNKNOWN_TTL segundos (padrao 3600). Estado por host/coletor
+em COLLECTOR_KEYS_DIR (padrao /tmp/collector_keys).
+
+Valores de keys sem item trapper ativo no host (banco do proxy, collector_items)
+tambem nao sao enviados.
+
+Apos defer() os envios (inclusive as LLDs de send_discovery) sao acumulados e
+retirados com take_deferred(): lote unico da coleta combinada huawei_poll e
+documento JSON do modo de saida para item mestre (collector_output). defer() pode
+ser aninhado; o take_deferred() interno devolve as linhas e o envio seguinte cai
+no nivel de fora.
+"""
+
+import json
+import os
+import re
+import subprocess
+import time
+
+import collector_items
+import collector_replay
+import collector_spool
+
+# Destino do zabbix_sender (trapper local por padrao; sobrescrito por ambiente
+# para apontar os coletores para o emulador bench/trapper_sim.py)
+ZABBIX_SERVER = os.environ.get("ZBX_SENDER_SERVER", "127.0.0.1")
+ZABBIX_PORT = os.environ.get("ZBX_SENDER_PORT", "10051")
+
+KEYS_DIR = os.environ.get("COLLECTOR_KEYS_DIR", "/tmp/collector_keys")
+UNKNOWN_AFTER = int(os.environ.get("COLLECTOR_UNKNOWN_AFTER", "3"))
+UNKNOWN_TTL = int(os.environ.get("COLLECTOR_UNKNOWN_TTL", "3600"))
+
+RESPONSE_RE = re.compile(r"processed:\s*(\d+);\s*failed:\s*(\d+)")
+
+# Estado de retorno do trapper da execucao corrente (host/coletor de collector_stats)
+_feedback = None
+# Niveis de defer() abertos (cada um com as linhas acumuladas)
+_deferred = []
+# Linhas entregues ao zabbix_sender nesta execucao (resultados de collector_output)
+_sent = []
+
+
+def sender_command():
+    """Inicio da linha de comando do zabbix_sender com o destino configurado"""
+    sink = collector_replay.sink()
+    if sink:
+        # Replay: mesmos argumentos, valores gravados no arquivo do sink
+        return ["sh", os.path.join(os.path.dirname(os.path.abspath(__file__)), "collector_sink.sh"), sink]
+    return ["zabbix_sender", "-z", ZABBIX_SERVER, "-p", ZABBIX_PORT]
+
+
+def _quote(field):
+    """Aplica aspas no campo quando necessario (formato do zabbix_sender -i)"""
+    field = str(field)
+    if field and not any(c in field for c in ' \t"\\'):
+        return field
+    return '"' + field.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def format_line(hostname, key, value):
+    """Monta uma linha '<host> <key> <value>' para o zabbix_sender -i"""
+    return f"{_quote(hostname)} {_quote(key)} {_quote(value)}"
+
+
+def split_line(line):
+    """Separa host e key (campos brutos, com ou sem aspas) do valor de uma linha -i"""
+    fields = []
+    pos = 0
+    for _ in range(2):
+        if line.startswith('"', pos):
+            end = pos + 1
+            while end < len(line) and line[end] != '"':
+                end += 2 if line[end] == "\\" else 1
+            end += 1
+        else:
+            end = line.find(" ", pos)
+            if end == -1:
+                return None
+        fields.append(line[pos:end])
+        pos = end + 1
+    return fields[0], fields[1], line[pos:]
+
+
+def _unquote(field):
+    if field.startswith('"') and field.endswith('"') and len(field) > 1:
+        return re.sub(r'\\(.)', r'\1', field[1:-1])
+    return field
+
+
+def line_key(line):
+    """Key (sem aspas) de uma linha -i"""
+    fields = split_line(line)
+    return _unquote(fields[1]) if fields else None
+
+
+def parse_response(output):
+    """Soma processed/failed das respostas do trapper (None se nao houve resposta)"""
+    if isinstance(output, bytes):
+        output = output.decode("utf-8", "replace")
+    counts = RESPONSE_RE.findall(output or "")
+    if not counts:
+        return None
+    return sum(int(p) for p, _ in counts), sum(int(f) for _, f in counts)
+
+
+def _feedback_state():
+    """Estado do host/coletor corrente (None fora de uma execucao de coletor)"""
+    global _feedback
+    import collector_stats
+
+    stats = collector_stats.current()
+    if stats is None or collector_replay.replaying():
+        return None
+    ident = (stats.hostname, stats.script)
+    if _feedback is None or _feedback["id"] != ident:
+        safe = "".join(c if c.isalnum() or c in "-._" else "_" for c in stats.hostname)
+        path = os.path.join(KEYS_DIR, f"{safe}__{stats.script}.json")
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        _feedback = {"id": ident, "path": path, "suspect": data.get("suspect", []),
+                     "fails": data.get("fails", {}), "unknown": data.get("unknown", {})}
+        # Chaves marcadas ha mais de UNKNOWN_TTL voltam a ser enviadas (uma falha remarca)
+        now = time.time()
+        for key, since in list(_feedback["unknown"].items()):
+            if now - since > UNKNOWN_TTL:
+                del _feedback["unknown"][key]
+                _feedback["fails"][key] = UNKNOWN_AFTER - 1
+    return _feedback
+
+
+def _save_feedback(state):
+    try:
+        os.makedirs(KEYS_DIR, exist_ok=True)
+        with open(f"{state['path']}.tmp", "w") as f:
+            json.dump({k: state[k] for k in ("suspect", "fails", "unknown")}, f)
+        os.replace(f"{state['path']}.tmp", state["path"])
+    except OSError:
+        pass
+
+
+def unknown_keys():
+    """Keys marcadas como inexistentes no host/coletor corrente"""
+    state = _feedback_state()
+    return set(state["unknown"]) if state else set()
+
+
+def _record_result(state, keys, processed, failed):
+    """Atualiza suspeitas/contagens com o resultado de uma chamada
+
+    Lote de varias keys sem nenhum valor aceito, sem outro valor do host aceito na
+    execucao, e inconclusivo: costuma ser condicao do host (itens da LLD do mesmo
+    envio ainda nao criados, host em sincronizacao de configuracao, itens
+    desabilitados) e nao conta falha por key.
+    """
+    if state is None:
+        return
+    group = sorted(set(keys))
+    if processed == 0 and len(group) > 1 and not state.get("host_ok"):
+        return
+    changed = False
+    if group in state["suspect"]:
+        state["suspect"].remove(group)
+        changed = True
+    if failed == 0:
+        for key in group:
+            if state["fails"].pop(key, None) is not None:
+                changed = True
+    elif len(group) == 1 or failed >= len(group):
+        # Todas as keys do grupo falharam: conta falha de cada uma
+        now = int(time.time())
+        for key in group:
+            state["fails"][key] = state["fails"].get(key, 0) + 1
+            if state["fails"][key] >= UNKNOWN_AFTER:
+                state["unknown"][key] = now
+        if len(group) > 1:
+            state["suspect"].append(group)
+        changed = True
+    else:
+        # Falha parcial: na proxima execucao cada metade vai em uma chamada propria
+        half = len(group) // 2
+        state["suspect"].extend([group[:half], group[half:]])
+        changed = True
+    if changed:
+        _save_feedback(state)
+
+
+def _partition(lines, state):
+    """Agrupa as linhas em [lote normal] + um lote por grupo suspeito"""
+    if not state or not state["suspect"]:
+        return [lines]
+    group_of = {}
+    for index, group in enumerate(state["suspect"]):
+        for key in group:
+            group_of[key] = index
+    batches = {}
+    normal = []
+    for line in lines:
+        index = group_of.get(line_key(line))
+        if index is None:
+            normal.append(line)
+        else:
+            batches.setdefault(index, []).append(line)
+    return [b for b in [normal] + [batches[i] for i in sorted(batches)] if b]
+
+
+def trapper_unreachable(result):
+    """Falha sem resposta do trapper (o zabbix_sender nao recebeu processed/failed)
+
+    Valores recusados pelo trapper (item inexistente) nao entram no spool: reenviar
+    nao resolveria.
+    """
+    if result.returncode == 0:
+        return False
+    output = result.stdout
+    if isinstance(output, bytes):
+        output = output.decode("utf-8", "replace")
+    return "processed:" not in (output or "")
+
+
+def spool(lines):
+    """Guarda linhas no formato -i para reenvio posterior (clock atual)"""
+    if not collector_replay.replaying():
+        collector_spool.add(lines)
+
+
+def spool_value(hostname, key, value):
+    """Guarda um valor individual (-s/-k/-o) para reenvio posterior"""
+    spool([format_line(hostname, key, value)])
+
+
+def defer():
+    """Passa a acumular os envios em um lote unico, retirado com take_deferred()"""
+    _deferred.append([])
+
+
+def deferring():
+    """True se os envios estao sendo acumulados (defer() ativo)"""
+    return bool(_deferred)
+
+
+def take_deferred():
+    """Linhas acumuladas desde o ultimo defer(), que e encerrado"""
+    return _deferred.pop() if _deferred else []
+
+
+def sent_lines():
+    """Linhas entregues ao zabbix_sender desde o inicio da execucao"""
+    return list(_sent)
+
+
+def send_discovery(hostname, payloads, timeout=8):
+    """Envia os JSON de LLD {key: payload} em uma chamada; retorna o CompletedProcess
+
+    Uma LLD vai com -s/-k/-o, varias com -i. Com defer() ativo as linhas entram no
+    lote acumulado (retorno com codigo 0).
+    """
+    lines = [format_line(hostname, key, payload) for key, payload in payloads.items()]
+    if _deferred:
+        _deferred[-1].extend(lines)
+        return subprocess.CompletedProcess([], 0, "", "")
+    _sent.extend(lines)
+    if len(payloads) == 1:
+        (key, payload), = payloads.items()
+        return subprocess.run([*sender_command(), "-s", hostname, "-k", key, "-o", payload],
+                              capture_output=True, timeout=timeout, text=True)
+    return subprocess.run([*sender_command(), "-i", "-"], input="\n".join(lines),
+                          capture_output=True, timeout=timeout, text=True)
+
+
+def send_batch(lines, timeout=5):
+    """Envia linhas -i e retorna (processed, failed, ignoradas)
+
+    Linhas de keys marcadas como inexistentes ou sem item ativo no host
+    (collector_items) sao descartadas (ignoradas); grupos
+    suspeitos vao em chamadas separadas. Sem resposta do trapper as linhas vao para o
+    spool e contam como failed.
+    """
+    state = _feedback_state()
+    unknown = state["unknown"] if state else {}
+    kept = []
+    for line in lines:
+        fields = split_line(line)
+        if fields:
+            key = _unquote(fields[1])
+            # Key marcada como inexistente ou sem item ativo no banco do proxy
+            if key in unknown or not collector_items.wants(_unquote(fields[0]), key):
+                continue
+        kept.append(line)
+    skipped = len(lines) - len(kept)
+    lines = kept
+    if skipped:
+        import collector_stats
+        collector_stats.add_skipped(skipped)
+    if _deferred:
+        # Lote acumulado: contam como aceitas, o resultado real vem no envio unico
+        _deferred[-1].extend(lines)
+        return len(lines), 0, skipped
+    _sent.extend(lines)
+    processed = failed = 0
+    answered = []  # (lote, (processed, failed)) com resposta do trapper
+    for batch in _partition(lines, state) if lines else []:
+        try:
+            result = subprocess.run([
+                *sender_command(), "-i", "-"
+            ], input="\n".join(batch), capture_output=True, timeout=timeout, text=True)
+        except Exception:
+            spool(batch)
+            failed += len(batch)
+            continue
+        counts = parse_response(result.stdout)
+        if counts is None:
+            if trapper_unreachable(result):
+                spool(batch)
+            counts = (len(batch), 0) if result.returncode == 0 else (0, len(batch))
+        else:
+            answered.append((batch, counts))
+        processed += counts[0]
+        failed += counts[1]
+    if state is None:
+        return processed, failed, skipped
+    # Algum valor do host aceito nesta execucao: lotes inteiros recusados sao conclusivos
+    if any(counts[0] for _, counts in answered):
+        state["host_ok"] = True
+    for batch, counts in answered:
+        if counts[1] or state["suspect"] or state["fails"]:
+            _record_result(state, [line_key(line) for line in batch], *counts)
+    return processed, failed, skipped
+
+
+def send_lines(lines, timeout=5):
+    """Envia um lote de linhas; True se nenhum valor falhou"""
+    if not lines:
+        return True
+    _, failed, _ = send_batch(lines, timeout)
+    return failed == 0
+
+
+def send_value(hostname, key, value, timeout=5):
+    """Envia um valor individual; retorna True (aceito), False (falhou) ou None (key ignorada)"""
+    processed, failed, skipped = send_batch([format_line(hostname, key, value)], timeout)
+    if skipped:
+        return None
+    return failed == 0